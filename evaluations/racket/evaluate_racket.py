@@ -210,6 +210,7 @@ result = InvariantLearner(
     do_generate_more_inputs=False,
     mexpr_expansion_limit=1,
     max_nonterminals_in_mexpr=9,
+    max_string_disjunction_width=5,
     exclude_nonterminals={
         "<maybe_wss_names>",
         "<wss_exprs>",
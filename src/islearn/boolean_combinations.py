@@ -0,0 +1,201 @@
+import itertools
+import math
+from typing import Sequence, Tuple, Generator, List, Callable, Dict
+
+IndexCombination = Tuple[int, ...]
+Negations = Tuple[bool, ...]
+
+
+class CombinationEngine:
+    """
+    Scores Boolean combinations of truth table rows. The table is kept as a bit matrix:
+    One integer bit set per row, where bit i is set iff the row's formula holds for input i.
+    Combinations are scored with big-int AND/OR operations and popcounts; a combination
+    is only reported (and thus, a formula only built by the caller) if it passes the
+    thresholds and strictly improves over all its participants.
+
+    If `prune_subsumed` is True, rows are indexed by their bit sets. Rows with identical
+    columns are scored once via a representative, and combinations containing two rows
+    one of whose true sets contains the other's are skipped: For disjunctions (and,
+    dually, for conjunctions with nested false sets), the smaller row does not contribute
+    anything, such that the combination is either rejected or has the same columns as
+    the combination without that row. The number of combinations that were not scored
+    is counted in `num_pruned`.
+    """
+
+    def __init__(self, rows: Sequence[int], num_columns: int, prune_subsumed: bool = True):
+        self.rows: List[int] = list(rows)
+        self.num_columns = num_columns
+        self.mask = (1 << num_columns) - 1
+        self.counts: List[int] = [row.bit_count() for row in self.rows]
+        self.prune_subsumed = prune_subsumed
+
+        self.num_scored = 0
+        self.num_pruned = 0
+
+        self.classes: Dict[int, List[int]] = {}
+        if prune_subsumed:
+            for idx, row in enumerate(self.rows):
+                self.classes.setdefault(row, []).append(idx)
+            self.representatives: List[int] = [members[0] for members in self.classes.values()]
+        else:
+            self.representatives: List[int] = list(range(len(self.rows)))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def ratio(self, idx: int, negated: bool = False) -> float:
+        count = self.counts[idx]
+        return (self.num_columns - count if negated else count) / self.num_columns
+
+    def comparable(self, idx_1: int, idx_2: int) -> bool:
+        """True iff the true set of one of the rows contains the true set of the other one."""
+        intersection = self.rows[idx_1] & self.rows[idx_2]
+        return intersection == self.rows[idx_1] or intersection == self.rows[idx_2]
+
+    def disjunctions(
+            self,
+            level: int,
+            min_ratio: float,
+            max_num_negations: int = 0) -> List[Tuple[IndexCombination, Negations]]:
+        """
+        Returns all combinations of `level` rows (and negations of up to `max_num_negations`
+        of them) whose disjunction holds for at least a ratio of `min_ratio` of all columns,
+        and for strictly more columns than each participant. The order of results is that of
+        `itertools.combinations` and, within one combination, of `itertools.product` over
+        the negation flags.
+        """
+
+        negation_vectors: List[Negations] = [
+            negations for negations in itertools.product((False, True), repeat=level)
+            if sum(negations) <= max_num_negations]
+
+        result: List[Tuple[IndexCombination, Negations]] = []
+        num_scored = 0
+
+        # With negations, subsumption between two rows only carries over to the
+        # combination if both rows are negated or both are not negated.
+        for indices, positive_bits in self.__combinations(level, int.__or__, not max_num_negations):
+            for negations in negation_vectors:
+                if (self.prune_subsumed and max_num_negations and
+                        any(negations[i] == negations[j] and self.comparable(indices[i], indices[j])
+                            for i, j in itertools.combinations(range(level), 2))):
+                    continue
+
+                num_scored += 1
+
+                # To ensure that only "meaningful" properties are negated, the un-negated properties
+                # should hold for at least 20% of all inputs; but at most for 80%, since otherwise,
+                # the negation is overly specific.
+                if any(not .2 <= self.ratio(idx) <= .8 for idx, negate in zip(indices, negations) if negate):
+                    continue
+
+                if not any(negations):
+                    bits = positive_bits
+                else:
+                    bits = 0
+                    for idx, negate in zip(indices, negations):
+                        bits |= self.rows[idx] ^ self.mask if negate else self.rows[idx]
+
+                count = bits.bit_count()
+                if count / self.num_columns < min_ratio:
+                    continue
+
+                if not all(
+                        count > (self.num_columns - self.counts[idx] if negate else self.counts[idx])
+                        for idx, negate in zip(indices, negations)):
+                    continue
+
+                result.extend(self.__expand(indices, negations))
+
+        self.__count(level, len(negation_vectors), num_scored)
+        return sorted(result)
+
+    def conjunctions(
+            self,
+            level: int,
+            min_inverse_ratio: float) -> List[IndexCombination]:
+        """
+        Returns all combinations of `level` rows whose conjunction is false for at least a
+        ratio of `min_inverse_ratio` of all columns, and for strictly more columns than
+        each participant. This is used to improve specificity on negative inputs.
+        """
+
+        result: List[IndexCombination] = []
+        num_scored = 0
+
+        for indices, bits in self.__combinations(level, int.__and__, True):
+            num_scored += 1
+
+            count = bits.bit_count()
+            if 1 - count / self.num_columns < min_inverse_ratio:
+                continue
+
+            if not all(count < self.counts[idx] for idx in indices):
+                continue
+
+            result.extend(indices for indices, _ in self.__expand(indices, tuple(False for _ in indices)))
+
+        self.__count(level, 1, num_scored)
+        return sorted(result)
+
+    def __count(self, level: int, num_negation_vectors: int, num_scored: int) -> None:
+        self.num_scored += num_scored
+        self.num_pruned += math.comb(len(self.rows), level) * num_negation_vectors - num_scored
+
+    def __expand(
+            self,
+            indices: IndexCombination,
+            negations: Negations) -> List[Tuple[IndexCombination, Negations]]:
+        """Expands a combination of representatives to all combinations of their class members."""
+        if not self.prune_subsumed:
+            return [(indices, negations)]
+
+        result: List[Tuple[IndexCombination, Negations]] = []
+        for members in itertools.product(*[self.classes[self.rows[idx]] for idx in indices]):
+            members_with_negations = sorted(zip(members, negations))
+            result.append((
+                tuple(member for member, _ in members_with_negations),
+                tuple(negate for _, negate in members_with_negations)))
+
+        return result
+
+    def __combinations(
+            self,
+            level: int,
+            operator: Callable[[int, int], int],
+            prune_comparable: bool) -> Generator[Tuple[IndexCombination, int], None, None]:
+        """
+        Enumerates combinations of representatives in lexicographic order together with the
+        combined bit set of the addressed rows. Combined bit sets of common prefixes are shared.
+        If `prune_comparable` is set, prefixes containing comparable rows are not extended.
+        """
+
+        candidates = self.representatives
+        if level < 1 or level > len(candidates):
+            return
+
+        prune_comparable = prune_comparable and self.prune_subsumed
+
+        def extend(
+                prefix: IndexCombination,
+                last_position: int,
+                prefix_bits: int) -> Generator[Tuple[IndexCombination, int], None, None]:
+            remaining = level - len(prefix)
+            for position in range(last_position + 1, len(candidates) - remaining + 1):
+                idx = candidates[position]
+                if prune_comparable and any(self.comparable(other_idx, idx) for other_idx in prefix):
+                    continue
+
+                bits = operator(prefix_bits, self.rows[idx])
+                if remaining == 1:
+                    yield prefix + (idx,), bits
+                else:
+                    yield from extend(prefix + (idx,), position, bits)
+
+        for first_position in range(len(candidates) - level + 1):
+            first_idx = candidates[first_position]
+            if level == 1:
+                yield (first_idx,), self.rows[first_idx]
+            else:
+                yield from extend((first_idx,), first_position, self.rows[first_idx])
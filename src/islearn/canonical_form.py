@@ -0,0 +1,135 @@
+from typing import Dict, List, Iterable
+
+import z3
+from isla import language
+
+# Binary z3 operators whose arguments can be swapped without changing the result.
+COMMUTATIVE_Z3_OPERATORS = {
+    z3.Z3_OP_EQ, z3.Z3_OP_DISTINCT, z3.Z3_OP_AND, z3.Z3_OP_OR, z3.Z3_OP_ADD, z3.Z3_OP_MUL,
+}
+
+# Comparisons that are rewritten to their mirrored counterparts (e.g., `(> a b)` to `(< b a)`).
+MIRRORED_Z3_OPERATORS = {
+    z3.Z3_OP_GT: "<", z3.Z3_OP_GE: "<=",
+}
+
+
+def canonical_key(formula: language.Formula) -> str:
+    """
+    A structural key of `formula` which is equal for formulas that only differ in the names of
+    their bound variables (alpha-equivalence), the order or repetition of the arguments of
+    conjunctions and disjunctions, the order of the arguments of commutative SMT operators,
+    or the direction of SMT comparisons. Formulas with equal keys are thus equivalent.
+    Bound variables are named by their binding depth, such that variables of sibling quantifiers
+    get the same names independently of the order of the siblings.
+    """
+    return _key(formula, {var: f"free:{var.name}" for var in formula.free_variables()}, 0)
+
+
+def add_representatives(
+        representatives: Dict[str, language.Formula],
+        formulas: Iterable[language.Formula]) -> int:
+    """Adds `formulas` to `representatives`, which maps canonical keys (see `canonical_key`) to
+    the formula with the smallest string representation among the formulas with that key. Returns
+    the number of added formulas which collapsed with a formula of the same key."""
+    num_collapsed = 0
+    for formula in formulas:
+        key = canonical_key(formula)
+        representative = representatives.get(key)
+        if representative is None:
+            representatives[key] = formula
+            continue
+
+        num_collapsed += 1
+        if str(formula) < str(representative):
+            representatives[key] = formula
+
+    return num_collapsed
+
+
+def _key(formula: language.Formula, names: Dict[language.Variable, str], depth: int) -> str:
+    if isinstance(formula, language.SMTFormula):
+        return _smt_key(
+            formula.formula,
+            {var.name: names[var] for var in formula.free_variables() if var in names} |
+            {var.name: f"tree:{tree.id}" for var, tree in formula.substitutions.items()})
+
+    if isinstance(formula, language.NumericQuantifiedFormula):
+        inner_names = names | {formula.bound_variable: f"var:{depth}"}
+        return (f"({type(formula).__name__} {formula.bound_variable.n_type} "
+                f"{_key(formula.inner_formula, inner_names, depth + 1)})")
+
+    if isinstance(formula, language.QuantifiedFormula):
+        bound_variables = [formula.bound_variable] + (
+            [] if formula.bind_expression is None
+            else [var for var in formula.bind_expression.bound_variables()
+                  if var != formula.bound_variable])
+        inner_names = names | {var: f"var:{depth + idx}" for idx, var in enumerate(bound_variables)}
+
+        bind_expression_key = "" if formula.bind_expression is None else " ".join(
+            _bound_element_key(elem, inner_names) for elem in formula.bind_expression.bound_elements)
+
+        return (f"({type(formula).__name__} {formula.bound_variable.n_type} "
+                f"[{bind_expression_key}] {_arg_key(formula.in_variable, names)} "
+                f"{_key(formula.inner_formula, inner_names, depth + len(bound_variables))})")
+
+    if isinstance(formula, (language.StructuralPredicateFormula, language.SemanticPredicateFormula)):
+        return f"({formula.predicate.name} {' '.join(_arg_key(arg, names) for arg in formula.args)})"
+
+    if isinstance(formula, language.NegatedFormula):
+        return f"(not {_key(formula.args[0], names, depth)})"
+
+    if isinstance(formula, (language.ConjunctiveFormula, language.DisjunctiveFormula)):
+        combinator = type(formula)
+        args: List[language.Formula] = []
+        stack = list(formula.args)
+        while stack:
+            arg = stack.pop(0)
+            if isinstance(arg, combinator):
+                stack[:0] = arg.args
+            else:
+                args.append(arg)
+
+        arg_keys = sorted({_key(arg, names, depth) for arg in args})
+        if len(arg_keys) == 1:
+            return arg_keys[0]
+        operator = "and" if combinator is language.ConjunctiveFormula else "or"
+        return f"({operator} {' '.join(arg_keys)})"
+
+    # Unknown formula types are only equal to themselves.
+    return f"(formula:{id(formula)})"
+
+
+def _arg_key(arg: language.Variable | language.DerivationTree | str, names: Dict[language.Variable, str]) -> str:
+    if isinstance(arg, str):
+        return repr(arg)
+    if isinstance(arg, language.DerivationTree):
+        return f"tree:{arg.id}"
+    return names.get(arg, f"free:{arg.name}")
+
+
+def _bound_element_key(
+        elem: language.BoundVariable | List[language.BoundVariable],
+        names: Dict[language.Variable, str]) -> str:
+    if isinstance(elem, list):
+        return "[" + " ".join(_bound_element_key(list_elem, names) for list_elem in elem) + "]"
+    if isinstance(elem, language.DummyVariable):
+        return repr(elem.n_type)
+    return f"{{{elem.n_type} {names.get(elem, elem.name)}}}"
+
+
+def _smt_key(expr: z3.ExprRef, names: Dict[str, str]) -> str:
+    if z3.is_const(expr) and expr.decl().kind() == z3.Z3_OP_UNINTERPRETED:
+        return names.get(expr.decl().name(), f"free:{expr.decl().name()}")
+
+    if not z3.is_app(expr) or expr.num_args() == 0:
+        return expr.sexpr()
+
+    kind = expr.decl().kind()
+    children = [_smt_key(child, names) for child in expr.children()]
+    if kind in MIRRORED_Z3_OPERATORS and len(children) == 2:
+        return f"({MIRRORED_Z3_OPERATORS[kind]} {children[1]} {children[0]})"
+    if kind in COMMUTATIVE_Z3_OPERATORS:
+        children.sort()
+
+    return f"({expr.decl().name()} {' '.join(children)})"
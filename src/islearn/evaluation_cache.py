@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from isla import language
+from isla.type_defs import Grammar
+
+logger = logging.getLogger("evaluation_cache")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EvaluationCache:
+    """
+    A persistent cache of the results of evaluating formulas on inputs, stored in an SQLite
+    database in `cache_dir`. Results are addressed by the hashes of the grammar, the unparsed
+    formula, and the input string; thus, they can be reused across learner runs and for
+    extended input sets. New results are buffered and written in batches of `batch_size`.
+    """
+
+    FILE_NAME = "evaluations.sqlite"
+
+    def __init__(self, grammar: Grammar, cache_dir: str, batch_size: int = 1000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, EvaluationCache.FILE_NAME)
+        self.grammar_hash = _digest(json.dumps(grammar, sort_keys=True))
+        self.batch_size = batch_size
+
+        self.hits = 0
+        self.misses = 0
+
+        self.__formula_hashes: Dict[language.Formula, str] = {}
+        self.__input_hashes: Dict[language.DerivationTree, str] = {}
+        self.__pending: List[Tuple[str, str, str, int]] = []
+
+        self.__connection: Optional[sqlite3.Connection] = sqlite3.connect(self.path)
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations ("
+            "grammar TEXT NOT NULL, formula TEXT NOT NULL, input TEXT NOT NULL, result INTEGER NOT NULL, "
+            "PRIMARY KEY (grammar, formula, input)) WITHOUT ROWID")
+        self.__connection.commit()
+
+    def lookup(self, formula: language.Formula, inputs: Sequence[language.DerivationTree]) -> Tuple[int, int]:
+        """
+        Returns a pair of bit sets for the cached results of `formula` on `inputs`: The first one
+        has bit i set iff the formula is known to hold for input i, the second one iff any result
+        is known for input i.
+        """
+
+        assert self.__connection is not None, "Evaluation cache has been closed"
+
+        cached_results: Dict[str, int] = dict(self.__connection.execute(
+            "SELECT input, result FROM evaluations WHERE grammar = ? AND formula = ?",
+            (self.grammar_hash, self.__formula_hash(formula))).fetchall())
+
+        bits = 0
+        known = 0
+        if cached_results:
+            for idx, inp in enumerate(inputs):
+                result = cached_results.get(self.__input_hash(inp))
+                if result is None:
+                    continue
+
+                known |= 1 << idx
+                if result:
+                    bits |= 1 << idx
+
+        num_known = known.bit_count()
+        self.hits += num_known
+        self.misses += len(inputs) - num_known
+
+        return bits, known
+
+    def add(
+            self,
+            formula: language.Formula,
+            inputs: Sequence[language.DerivationTree],
+            bits: int,
+            evaluated: int) -> None:
+        """Adds the results in `bits` for all inputs whose bit is set in `evaluated`."""
+        if not evaluated:
+            return
+
+        formula_hash = self.__formula_hash(formula)
+        for idx, inp in enumerate(inputs):
+            if evaluated >> idx & 1:
+                self.__pending.append((self.grammar_hash, formula_hash, self.__input_hash(inp), bits >> idx & 1))
+
+        if len(self.__pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.__pending:
+            return
+
+        assert self.__connection is not None, "Evaluation cache has been closed"
+        self.__connection.executemany(
+            "INSERT OR REPLACE INTO evaluations (grammar, formula, input, result) VALUES (?, ?, ?, ?)",
+            self.__pending)
+        self.__connection.commit()
+
+        logger.debug("Stored %d evaluation results in %s", len(self.__pending), self.path)
+        self.__pending = []
+
+    def hit_rate(self) -> float:
+        if not self.hits + self.misses:
+            return 0.0
+
+        return self.hits / (self.hits + self.misses)
+
+    def close(self) -> None:
+        if self.__connection is None:
+            return
+
+        self.flush()
+        self.__connection.close()
+        self.__connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __formula_hash(self, formula: language.Formula) -> str:
+        result = self.__formula_hashes.get(formula)
+        if result is None:
+            result = _digest(language.ISLaUnparser(formula).unparse())
+            self.__formula_hashes[formula] = result
+
+        return result
+
+    def __input_hash(self, inp: language.DerivationTree) -> str:
+        result = self.__input_hashes.get(inp)
+        if result is None:
+            result = _digest(str(inp))
+            self.__input_hashes[inp] = result
+
+        return result
@@ -0,0 +1,305 @@
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Sequence, List, Optional, Tuple, Iterable
+
+from grammar_graph import gg
+from isla import language
+from isla.type_defs import Grammar
+from pathos import multiprocessing as pmp
+
+from islearn.formula_compiler import evaluate_formula, QuantifierMatches, quantifier_skeleton
+from islearn.helpers import make_formulas_picklable, make_trees_picklable
+from islearn.tree_index import TreeIndex
+
+logger = logging.getLogger("evaluation_pool")
+
+# State of a worker process, set once by `_initialize_worker` when the process is spawned.
+_worker_graph: Optional[gg.GrammarGraph] = None
+_worker_corpora: Dict[str, Sequence[language.DerivationTree]] = {}
+_worker_tree_indices: Dict[str, List[TreeIndex]] = {}
+# Corpora added to the pool after the worker was spawned (see `EvaluationPool.add_corpus`),
+# loaded on first use and held for the most recently used ones only.
+_worker_added_corpora: 'OrderedDict[str, Tuple[List[language.DerivationTree], List[TreeIndex]]]' = OrderedDict()
+_MAX_ADDED_CORPORA_PER_WORKER = 4
+
+
+def _initialize_worker(grammar: Grammar, corpora: Dict[str, Sequence[language.DerivationTree]]) -> None:
+    global _worker_graph, _worker_corpora, _worker_tree_indices
+    _worker_graph = gg.GrammarGraph.from_grammar(grammar)
+    _worker_corpora = corpora
+    _worker_tree_indices = {name: [TreeIndex(inp) for inp in inputs] for name, inputs in corpora.items()}
+
+
+def evaluate_formula_on_inputs(
+        formula: language.Formula,
+        inputs: Sequence[language.DerivationTree],
+        graph: gg.GrammarGraph,
+        lazy: bool = False,
+        result_threshold: float = .9,
+        max_true_results: Optional[int] = None,
+        columns: Optional[Sequence[int]] = None,
+        tree_indices: Optional[Sequence[TreeIndex]] = None) -> int:
+    """
+    Evaluates `formula` on all `inputs` and returns the results as a bit set (bit i is set
+    iff the formula holds for input i). If lazy is True, evaluation stops as soon as
+    result_threshold can no longer be reached. If max_true_results is set, evaluation
+    stops as soon as the formula held for more than that many inputs. In both cases,
+    the remaining results count as negative. If columns is set, only the inputs at these
+    indices are evaluated, in the given order. Formulas are evaluated by their compiled
+    evaluation plans (see `islearn.formula_compiler`) on the `tree_indices` of the inputs,
+    if passed, or on indices created on the fly.
+    """
+
+    return evaluate_formula_on_columns(
+        formula, inputs, graph, lazy, result_threshold, max_true_results, columns,
+        tree_indices=tree_indices)[0]
+
+
+def evaluate_formula_on_columns(
+        formula: language.Formula,
+        inputs: Sequence[language.DerivationTree],
+        graph: gg.GrammarGraph,
+        lazy: bool = False,
+        result_threshold: float = .9,
+        max_true_results: Optional[int] = None,
+        columns: Optional[Sequence[int]] = None,
+        num_known_true: int = 0,
+        num_known_negative: int = 0,
+        tree_indices: Optional[Sequence[TreeIndex]] = None,
+        quantifier_matches: Optional[Sequence[QuantifierMatches]] = None) -> Tuple[int, int]:
+    """
+    Like `evaluate_formula_on_inputs`, but returns a pair of the result bit set and the bit
+    set of the inputs that actually were evaluated. Results for inputs outside `columns`
+    that are already known (e.g., from a cache) are passed as `num_known_true` and
+    `num_known_negative` and count toward the thresholds. If `quantifier_matches` is set,
+    it holds one dictionary of quantifier matches per input, which are shared with the other
+    formulas evaluated with the same dictionaries.
+    """
+
+    bits = 0
+    evaluated = 0
+    true_results = num_known_true
+    negative_results = num_known_negative
+    for idx in range(len(inputs)) if columns is None else columns:
+        if lazy and negative_results > len(inputs) * (1 - result_threshold):
+            break
+
+        if max_true_results is not None and true_results > max_true_results:
+            break
+
+        evaluated |= 1 << idx
+        tree_index = None if tree_indices is None else tree_indices[idx]
+        matches = None if quantifier_matches is None else quantifier_matches[idx]
+        if evaluate_formula(formula, inputs[idx], graph, tree_index, matches).is_true():
+            bits |= 1 << idx
+            true_results += 1
+        else:
+            negative_results += 1
+
+    return bits, evaluated
+
+
+# A formula together with the columns to evaluate it on (None for all) and the numbers
+# of known positive and negative results on other columns.
+EvaluationTask = Tuple[language.Formula, Optional[Sequence[int]], int, int]
+
+
+def evaluate_tasks_by_skeleton(
+        tasks: Sequence[EvaluationTask],
+        inputs: Sequence[language.DerivationTree],
+        graph: gg.GrammarGraph,
+        lazy: bool = False,
+        result_threshold: float = .9,
+        max_true_results: Optional[int] = None,
+        tree_indices: Optional[Sequence[TreeIndex]] = None,
+        matches_by_skeleton: Optional[Dict[Tuple[str, ...], List[QuantifierMatches]]] = None
+) -> List[Tuple[int, int]]:
+    """
+    Evaluates the formulas of `tasks` (see `evaluate_formula_on_columns`) grouped by their
+    quantifier skeletons. All formulas of a group share, per input, the matches of their
+    quantifiers, such that these are computed once per group instead of once per formula.
+    To share matches across several calls, pass the same `matches_by_skeleton` dictionary.
+    Results are returned in the order of `tasks`.
+    """
+
+    if tree_indices is None:
+        tree_indices = [TreeIndex(inp) for inp in inputs]
+    if matches_by_skeleton is None:
+        matches_by_skeleton = {}
+
+    results: List[Tuple[int, int]] = []
+    for formula, columns, num_known_true, num_known_negative in tasks:
+        quantifier_matches = matches_by_skeleton.setdefault(
+            quantifier_skeleton(formula), [{} for _ in inputs])
+        results.append(evaluate_formula_on_columns(
+            formula, inputs, graph, lazy, result_threshold, max_true_results,
+            columns, num_known_true, num_known_negative, tree_indices, quantifier_matches))
+
+    return results
+
+
+def _worker_corpus(
+        corpus_name: str,
+        corpus_file: Optional[str]) -> Tuple[Sequence[language.DerivationTree], Sequence[TreeIndex]]:
+    if corpus_file is None:
+        return _worker_corpora[corpus_name], _worker_tree_indices[corpus_name]
+
+    result = _worker_added_corpora.get(corpus_name)
+    if result is None:
+        with open(corpus_file, "rb") as f:
+            inputs = pickle.load(f)
+        result = (inputs, [TreeIndex(inp) for inp in inputs])
+        _worker_added_corpora[corpus_name] = result
+        if len(_worker_added_corpora) > _MAX_ADDED_CORPORA_PER_WORKER:
+            _worker_added_corpora.popitem(last=False)
+
+    _worker_added_corpora.move_to_end(corpus_name)
+    return result
+
+
+def _evaluate_batch(
+        task: Tuple[str, Optional[str], Sequence[EvaluationTask], bool, float, Optional[int]]
+) -> List[Tuple[int, int]]:
+    corpus_name, corpus_file, formula_tasks, lazy, result_threshold, max_true_results = task
+    assert _worker_graph is not None, "Worker has not been initialized"
+    inputs, tree_indices = _worker_corpus(corpus_name, corpus_file)
+    return evaluate_tasks_by_skeleton(
+        formula_tasks, inputs, _worker_graph, lazy, result_threshold, max_true_results, tree_indices)
+
+
+class EvaluationPool:
+    """
+    A long-lived pool of worker processes evaluating formulas on fixed input corpora.
+    Grammar, grammar graph, and the (named) corpora are transferred to each worker once
+    when it is spawned; a task only ships a batch of formulas and returns one compact
+    result bit set per formula. Corpora can be added later (`add_corpus`) without restarting
+    the workers; these are written to a temporary file, which each worker reads once.
+    """
+
+    def __init__(
+            self,
+            grammar: Grammar,
+            corpora: Dict[str, Sequence[language.DerivationTree]],
+            processes: Optional[int] = None,
+            batch_size: int = 16):
+        self.grammar = grammar
+        self.corpora: Dict[str, List[language.DerivationTree]] = {
+            name: list(inputs) for name, inputs in corpora.items()}
+        self.processes = processes or pmp.cpu_count()
+        self.batch_size = batch_size
+
+        # Files of corpora added after the workers were spawned, by corpus name
+        self.__corpus_files: Dict[str, str] = {}
+        self.__corpus_dir: Optional[str] = None
+        self.__num_added_corpora = 0
+
+        make_formulas_picklable()
+        self.__pool = pmp.Pool(
+            processes=self.processes,
+            initializer=_initialize_worker,
+            initargs=(grammar, dict(self.corpora)))
+
+        logger.debug(
+            "Started evaluation pool with %d workers and corpora of sizes %s",
+            self.processes,
+            ", ".join(f"{name}: {len(inputs)}" for name, inputs in self.corpora.items()))
+
+    def corpus_of(self, inputs: Sequence[language.DerivationTree]) -> Optional[str]:
+        """Returns the name of the corpus holding exactly the given inputs, if any."""
+        return next((
+            name for name, corpus in self.corpora.items()
+            if len(corpus) == len(inputs) and all(a is b for a, b in zip(corpus, inputs))),
+            None)
+
+    def add_corpus(self, inputs: Sequence[language.DerivationTree]) -> str:
+        """Makes `inputs` available to the workers and returns the name of the new corpus. Names
+        are not reused, such that workers can keep the corpus as long as they need it."""
+        assert self.__pool is not None, "Evaluation pool has been closed"
+
+        if self.__corpus_dir is None:
+            self.__corpus_dir = tempfile.mkdtemp(prefix="islearn-corpora-")
+
+        name = f"added-{self.__num_added_corpora}"
+        self.__num_added_corpora += 1
+        path = os.path.join(self.__corpus_dir, f"{name}.pickle")
+
+        make_trees_picklable()
+        inputs = list(inputs)
+        with open(path, "wb") as f:
+            pickle.dump(inputs, f)
+
+        self.corpora[name] = inputs
+        self.__corpus_files[name] = path
+        return name
+
+    def remove_corpus(self, name: str) -> None:
+        """Removes a corpus added by `add_corpus`."""
+        del self.corpora[name]
+        os.remove(self.__corpus_files.pop(name))
+
+    def evaluate(
+            self,
+            formulas: Iterable[language.Formula],
+            corpus_name: str,
+            lazy: bool = False,
+            result_threshold: float = .9,
+            max_true_results: Optional[int] = None,
+            columns: Optional[Sequence[int]] = None) -> List[int]:
+        """Returns, in the order of `formulas`, the result bit sets for the given corpus.
+        See `evaluate_formula_on_inputs` for the meaning of the remaining parameters."""
+        return [
+            bits for bits, _ in self.evaluate_tasks(
+                [(formula, columns, 0, 0) for formula in formulas],
+                corpus_name, lazy, result_threshold, max_true_results)]
+
+    def evaluate_tasks(
+            self,
+            tasks: Iterable[EvaluationTask],
+            corpus_name: str,
+            lazy: bool = False,
+            result_threshold: float = .9,
+            max_true_results: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Returns, in the order of `tasks`, pairs of result bit sets and bit sets of evaluated
+        inputs. See `evaluate_formula_on_columns` for the meaning of the parameters."""
+        assert self.__pool is not None, "Evaluation pool has been closed"
+        assert corpus_name in self.corpora
+
+        # Tasks with the same quantifier skeleton are put into the same batches, such that
+        # workers can share quantifier matches between them.
+        tasks = list(tasks)
+        order = sorted(range(len(tasks)), key=lambda idx: quantifier_skeleton(tasks[idx][0]))
+        sorted_tasks = [tasks[idx] for idx in order]
+        batches = [
+            (corpus_name, self.__corpus_files.get(corpus_name), sorted_tasks[idx:idx + self.batch_size],
+             lazy, result_threshold, max_true_results)
+            for idx in range(0, len(sorted_tasks), self.batch_size)]
+
+        results: List[Optional[Tuple[int, int]]] = [None] * len(tasks)
+        sorted_results = (
+            result for batch_result in self.__pool.imap(_evaluate_batch, batches) for result in batch_result)
+        for idx, result in zip(order, sorted_results):
+            results[idx] = result
+
+        return results
+
+    def close(self) -> None:
+        if self.__pool is None:
+            return
+
+        self.__pool.close()
+        self.__pool.join()
+        self.__pool = None
+
+        if self.__corpus_dir is not None:
+            shutil.rmtree(self.__corpus_dir, ignore_errors=True)
+            self.__corpus_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
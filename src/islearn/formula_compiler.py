@@ -0,0 +1,354 @@
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set, Tuple, Sequence, cast
+
+import z3
+from grammar_graph import gg
+from isla import language
+from isla.evaluator import evaluate, matches_for_quantified_formula
+from isla.three_valued_truth import ThreeValuedTruth
+from isla.z3_helpers import is_valid, DomainError, evaluate_z3_expression
+from returns.result import Success
+
+from islearn.tree_index import TreeIndex
+
+logger = logging.getLogger("formula_compiler")
+
+# Matches of quantifiers with match expressions, keyed by the quantified nonterminal type, the
+# position of the node quantified in, and the shape of the match expression (see
+# `_bind_expression_shape`). A match is the tuple of the positions assigned to the bound variable
+# and the variables in the match expression.
+QuantifierMatches = Dict[Tuple[str, int, Tuple], List[Tuple[int, ...]]]
+
+
+class EvaluationContext:
+    """The grammar graph and the quantifier matches shared by all plans evaluated on one input."""
+
+    __slots__ = ("graph", "matches")
+
+    def __init__(self, graph: gg.GrammarGraph, matches: Optional[QuantifierMatches] = None):
+        self.graph = graph
+        self.matches: QuantifierMatches = {} if matches is None else matches
+
+
+# A compiled (sub)formula: Takes the index of the evaluated input, the evaluation context, and the
+# positions of the nodes assigned to the variables in scope (by slot), and returns True, False,
+# or None (for "unknown").
+Plan = Callable[[TreeIndex, EvaluationContext, List[int]], Optional[bool]]
+
+
+class UnsupportedFormulaError(Exception):
+    """Raised if a formula (or its evaluation for some input) is not supported by `EvaluationPlan`."""
+    pass
+
+
+class EvaluationPlan:
+    """
+    A formula compiled into nested closures evaluating it on the `TreeIndex` of an input.
+    Quantifiers become loops over the occurrence lists of the index, SMT formulas become
+    the Python functions obtained from `evaluate_z3_expression` (with fixed argument slots),
+    and propositional combinators short-circuit. Variable assignments are kept in a list
+    of node positions indexed by precomputed slots instead of dictionaries.
+
+    Results coincide with those of ISLa's evaluator for complete inputs. Formulas with
+    numeric quantifiers, free variables other than the top-level constant, concrete
+    trees, or shadowed variables are not supported; neither are evaluations of semantic
+    predicates which assign constants. In those cases, `UnsupportedFormulaError` is raised.
+    """
+
+    def __init__(self, formula: language.Formula):
+        self.formula = formula
+
+        free_variables = formula.free_variables()
+        if len(free_variables) > 1 or any(not isinstance(var, language.Constant) for var in free_variables):
+            raise UnsupportedFormulaError(f"Unsupported free variables {free_variables}")
+
+        self.__slots: Dict[language.Variable, int] = {var: 0 for var in free_variables}
+        self.__scope: Set[language.Variable] = set(free_variables)
+        self.__plan = self.__compile(formula)
+
+    @property
+    def num_slots(self) -> int:
+        return max(len(self.__slots), 1)
+
+    def evaluate(
+            self,
+            tree_index: TreeIndex,
+            graph: gg.GrammarGraph,
+            matches: Optional[QuantifierMatches] = None) -> ThreeValuedTruth:
+        """Evaluates the plan on the input indexed by `tree_index`. Matches of quantifiers with
+        match expressions are looked up in and added to `matches`, which can be shared by all plans
+        evaluated on the same input."""
+        env = [0] * self.num_slots  # Slot 0 holds the root (position 0) for the top-level constant.
+        result = self.__plan(tree_index, EvaluationContext(graph, matches), env)
+        return ThreeValuedTruth.unknown() if result is None else ThreeValuedTruth.from_bool(result)
+
+    def __slot(self, variable: language.Variable) -> int:
+        if variable not in self.__slots:
+            self.__slots[variable] = len(self.__slots)
+        return self.__slots[variable]
+
+    def __compile(self, formula: language.Formula) -> Plan:
+        if isinstance(formula, language.SMTFormula):
+            return self.__compile_smt_formula(formula)
+        elif isinstance(formula, language.NumericQuantifiedFormula):
+            raise UnsupportedFormulaError("Numeric quantifiers are not supported")
+        elif isinstance(formula, language.QuantifiedFormula):
+            return self.__compile_quantified_formula(formula)
+        elif isinstance(formula, language.StructuralPredicateFormula):
+            return self.__compile_structural_predicate_formula(formula)
+        elif isinstance(formula, language.SemanticPredicateFormula):
+            return self.__compile_semantic_predicate_formula(formula)
+        elif isinstance(formula, language.NegatedFormula):
+            return self.__compile_negated_formula(formula)
+        elif isinstance(formula, language.ConjunctiveFormula):
+            return self.__compile_conjunctive_formula(formula)
+        elif isinstance(formula, language.DisjunctiveFormula):
+            return self.__compile_disjunctive_formula(formula)
+
+        raise UnsupportedFormulaError(f"Unsupported formula type {type(formula).__name__}")
+
+    def __compile_smt_formula(self, formula: language.SMTFormula) -> Plan:
+        if formula.substitutions:
+            raise UnsupportedFormulaError("SMT formulas with substitutions are not supported")
+        if any(var not in self.__scope for var in formula.free_variables()):
+            raise UnsupportedFormulaError("SMT formulas over unbound variables are not supported")
+
+        slots_by_name = {var.name: self.__slots[var] for var in formula.free_variables()}
+        if len(slots_by_name) < len(formula.free_variables()):
+            raise UnsupportedFormulaError("SMT formulas over different variables of the same name are not supported")
+
+        translation = evaluate_z3_expression(formula.formula)
+        if not isinstance(translation, Success):
+            # z3 formulas that cannot be translated to Python are passed to the solver.
+            substitutions = [(z3.String(name), slot) for name, slot in slots_by_name.items()]
+
+            def solve(tree_index: TreeIndex, _: EvaluationContext, env: List[int]) -> Optional[bool]:
+                result = is_valid(z3.substitute(formula.formula, *[
+                    (symbol, z3.StringVal(str(tree_index.subtrees[env[slot]])))
+                    for symbol, slot in substitutions]))
+                return None if result.is_unknown() else result.is_true()
+
+            return solve
+
+        arg_names, fun = translation.unwrap()
+        if not arg_names:
+            return lambda tree_index, context, env: bool(fun)
+
+        arg_slots = [slots_by_name[name] for name in arg_names]
+
+        def evaluate_smt(tree_index: TreeIndex, _: EvaluationContext, env: List[int]) -> Optional[bool]:
+            try:
+                return bool(fun(tuple([str(tree_index.subtrees[env[slot]]) for slot in arg_slots])))
+            except DomainError:
+                return False
+
+        return evaluate_smt
+
+    def __compile_quantified_formula(self, formula: language.QuantifiedFormula) -> Plan:
+        if not isinstance(formula.in_variable, language.Variable) or formula.in_variable not in self.__scope:
+            raise UnsupportedFormulaError("Quantifiers over trees or unbound variables are not supported")
+
+        in_slot = self.__slots[formula.in_variable]
+        bound_variables = [formula.bound_variable] + (
+            [] if formula.bind_expression is None else list(formula.bind_expression.bound_variables()))
+        if any(var in self.__scope for var in bound_variables):
+            raise UnsupportedFormulaError("Shadowed variables are not supported")
+
+        # Variables bound by sibling quantifiers may share a slot, since each loop assigns it before use.
+        slots = [self.__slot(var) for var in bound_variables]
+        self.__scope.update(bound_variables)
+        inner = self.__compile(formula.inner_formula)
+        self.__scope.difference_update(bound_variables)
+
+        if formula.bind_expression is None:
+            bound_slot = slots[0]
+            n_type = formula.bound_variable.n_type
+
+            def assignments(tree_index: TreeIndex, _: EvaluationContext, env: List[int]):
+                for pos in tree_index.descendants(env[in_slot], n_type):
+                    env[bound_slot] = pos
+                    yield
+        else:
+            n_type = formula.bound_variable.n_type
+            bind_expression_shape = _bind_expression_shape(formula.bind_expression)
+
+            def assignments(tree_index: TreeIndex, context: EvaluationContext, env: List[int]):
+                in_pos = env[in_slot]
+                key = (n_type, in_pos, bind_expression_shape)
+                matches = context.matches.get(key)
+                if matches is None:
+                    in_path, in_inst = tree_index.node(in_pos)
+                    matches = [
+                        tuple(tree_index.position(in_path + match[var][0]) for var in bound_variables)
+                        for match in matches_for_quantified_formula(formula, context.graph.grammar, in_inst, {})]
+                    context.matches[key] = matches
+
+                for match in matches:
+                    for slot, pos in zip(slots, match):
+                        env[slot] = pos
+                    yield
+
+        if isinstance(formula, language.ForallFormula):
+            def evaluate_forall(tree_index: TreeIndex, context: EvaluationContext, env: List[int]) -> Optional[bool]:
+                result = True
+                for _ in assignments(tree_index, context, env):
+                    inner_result = inner(tree_index, context, env)
+                    if inner_result is False:
+                        return False
+                    if inner_result is None:
+                        result = None
+                return result
+
+            return evaluate_forall
+        else:
+            def evaluate_exists(tree_index: TreeIndex, context: EvaluationContext, env: List[int]) -> Optional[bool]:
+                result = False
+                for _ in assignments(tree_index, context, env):
+                    inner_result = inner(tree_index, context, env)
+                    if inner_result is True:
+                        return True
+                    if inner_result is None:
+                        result = None
+                return result
+
+            return evaluate_exists
+
+    def __compile_structural_predicate_formula(self, formula: language.StructuralPredicateFormula) -> Plan:
+        if any(not isinstance(arg, str) and arg not in self.__scope for arg in formula.args):
+            raise UnsupportedFormulaError("Structural predicates over trees or unbound variables are not supported")
+
+        args = [(True, arg) if isinstance(arg, str) else (False, self.__slots[arg]) for arg in formula.args]
+        predicate = formula.predicate
+
+        def evaluate_structural_predicate(
+                tree_index: TreeIndex, _: EvaluationContext, env: List[int]) -> Optional[bool]:
+            return bool(predicate.evaluate(
+                tree_index.tree,
+                *[arg if is_string else tree_index.paths[env[arg]] for is_string, arg in args]))
+
+        return evaluate_structural_predicate
+
+    def __compile_semantic_predicate_formula(self, formula: language.SemanticPredicateFormula) -> Plan:
+        if any(isinstance(arg, language.DerivationTree) for arg in formula.args):
+            raise UnsupportedFormulaError("Semantic predicates over trees are not supported")
+
+        # Unbound variables (e.g., constants assigned by the predicate) are passed as they are.
+        args = [(False, self.__slots[arg]) if arg in self.__scope else (True, arg) for arg in formula.args]
+        predicate = formula.predicate
+
+        def evaluate_semantic_predicate(
+                tree_index: TreeIndex, context: EvaluationContext, env: List[int]) -> Optional[bool]:
+            result = predicate.evaluate(
+                context.graph, *[arg if is_literal else tree_index.subtrees[env[arg]] for is_literal, arg in args])
+
+            if result.true():
+                return True
+            elif result.false():
+                return False
+            elif not result.ready() or not all(isinstance(key, language.Constant) for key in result.result):
+                return None
+
+            raise UnsupportedFormulaError("Semantic predicates assigning constants are not supported")
+
+        return evaluate_semantic_predicate
+
+    def __compile_negated_formula(self, formula: language.NegatedFormula) -> Plan:
+        inner = self.__compile(formula.args[0])
+
+        def evaluate_negation(tree_index: TreeIndex, context: EvaluationContext, env: List[int]) -> Optional[bool]:
+            result = inner(tree_index, context, env)
+            return None if result is None else not result
+
+        return evaluate_negation
+
+    def __compile_conjunctive_formula(self, formula: language.ConjunctiveFormula) -> Plan:
+        conjuncts = [self.__compile(arg) for arg in formula.args]
+
+        def evaluate_conjunction(tree_index: TreeIndex, context: EvaluationContext, env: List[int]) -> Optional[bool]:
+            result = True
+            for conjunct in conjuncts:
+                conjunct_result = conjunct(tree_index, context, env)
+                if conjunct_result is False:
+                    return False
+                if conjunct_result is None:
+                    result = None
+            return result
+
+        return evaluate_conjunction
+
+    def __compile_disjunctive_formula(self, formula: language.DisjunctiveFormula) -> Plan:
+        disjuncts = [self.__compile(arg) for arg in formula.args]
+
+        def evaluate_disjunction(tree_index: TreeIndex, context: EvaluationContext, env: List[int]) -> Optional[bool]:
+            result = False
+            for disjunct in disjuncts:
+                disjunct_result = disjunct(tree_index, context, env)
+                if disjunct_result is True:
+                    return True
+                if disjunct_result is None:
+                    result = None
+            return result
+
+        return evaluate_disjunction
+
+
+def _bind_expression_shape(bind_expression: language.BindExpression) -> Tuple:
+    """The types of the elements of `bind_expression`, which determine its matches independently of
+    the names of the bound variables."""
+    return tuple(
+        tuple((type(elem).__name__, elem.n_type) for elem in bound_element)
+        if isinstance(bound_element, list)
+        else (type(bound_element).__name__, bound_element.n_type)
+        for bound_element in bind_expression.bound_elements)
+
+
+def quantifier_skeleton(formula: language.Formula) -> Tuple[str, ...]:
+    """The nonterminal types of all quantified variables in `formula`, in pre-order."""
+    return tuple(
+        quantified_formula.bound_variable.n_type
+        for quantified_formula in cast(
+            List[language.QuantifiedFormula],
+            language.FilterVisitor(lambda f: isinstance(f, language.QuantifiedFormula)).collect(formula)))
+
+
+@lru_cache(maxsize=10000)
+def compile_formula(formula: language.Formula) -> Optional[EvaluationPlan]:
+    """Returns the (cached) evaluation plan for `formula`, or None if the formula is not supported."""
+    try:
+        return EvaluationPlan(formula)
+    except UnsupportedFormulaError as err:
+        logger.debug("Falling back to ISLa's evaluator: %s", err)
+        return None
+
+
+def evaluate_formula(
+        formula: language.Formula,
+        inp: language.DerivationTree,
+        graph: gg.GrammarGraph,
+        tree_index: Optional[TreeIndex] = None,
+        matches: Optional[QuantifierMatches] = None) -> ThreeValuedTruth:
+    """Evaluates `formula` on `inp` using its compiled evaluation plan, or ISLa's evaluator if
+    the formula or input are not supported. Quantifier matches for `inp` can be shared with
+    other formulas by passing the same `matches` dictionary."""
+    plan = compile_formula(formula)
+    if plan is not None and inp.is_complete():
+        try:
+            return plan.evaluate(TreeIndex.of(inp) if tree_index is None else tree_index, graph, matches)
+        except UnsupportedFormulaError as err:
+            logger.debug("Falling back to ISLa's evaluator: %s", err)
+
+    return evaluate(formula, inp, graph.grammar, graph=graph)
+
+
+def evaluate_formulas(
+        formulas: Sequence[language.Formula],
+        inp: language.DerivationTree,
+        graph: gg.GrammarGraph,
+        tree_index: Optional[TreeIndex] = None) -> List[ThreeValuedTruth]:
+    """Evaluates a group of formulas (e.g., candidates instantiated from the same pattern) on `inp`.
+    Quantifier matches are computed once per quantified nonterminal type, node quantified in,
+    and match expression shape, and shared by all formulas of the group."""
+    tree_index = TreeIndex.of(inp) if tree_index is None else tree_index
+    matches: QuantifierMatches = {}
+    return [evaluate_formula(formula, inp, graph, tree_index, matches) for formula in formulas]
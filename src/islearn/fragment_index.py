@@ -0,0 +1,74 @@
+import weakref
+from typing import List, Dict, Set
+
+from isla import language
+from isla.helpers import is_nonterminal
+
+from islearn.helpers import is_float, is_int
+from islearn.tree_index import TreeIndex
+
+
+class FragmentIndex:
+    """
+    The language fragments of an indexed derivation tree (or parse tree), built in a single
+    preorder pass over a `TreeIndex`. The string of the node at position `pos` is the slice
+    `text[starts[pos]:stops[pos]]` of the string of the whole tree; thus, node strings are not
+    computed recursively. For each nonterminal, `fragments` holds the (non-empty) strings of the
+    outermost nodes with that label, i.e., nodes not nested in another node with the same label,
+    together with their lengths and, for strings representing floats, the two enclosing integers.
+    """
+
+    def __init__(self, tree_index: TreeIndex):
+        self.tree_index = tree_index
+
+        leaf_strings: List[str] = []
+        self.starts: List[int] = []
+        self.stops: List[int] = [0] * len(tree_index)
+        offset = 0
+        for pos, (label, subtree) in enumerate(zip(tree_index.labels, tree_index.subtrees)):
+            self.starts.append(offset)
+            children = subtree.children if isinstance(subtree, language.DerivationTree) else subtree[1]
+            if not children:
+                # Open leaves (`children is None`) are represented by their nonterminal, as in `str(tree)`.
+                leaf_string = label if children is None or not is_nonterminal(label) else ""
+                leaf_strings.append(leaf_string)
+                offset += len(leaf_string)
+
+        # Subtrees end where the next node outside of them starts (or at the end of the text).
+        self.text = "".join(leaf_strings)
+        for pos, end in enumerate(tree_index.ends):
+            self.stops[pos] = self.starts[end] if end < len(tree_index) else len(self.text)
+
+        self.fragments: Dict[str, Set[str]] = {}
+        nested_until: Dict[str, int] = {}
+        for pos, label in enumerate(tree_index.labels):
+            if not is_nonterminal(label) or pos < nested_until.get(label, 0):
+                continue
+
+            nested_until[label] = tree_index.ends[pos]
+            fragment = self.string(pos)
+            if not fragment:
+                continue
+
+            fragments = self.fragments.setdefault(label, set([]))
+            fragments.add(fragment)
+            fragments.add(str(len(fragment)))
+
+            if is_float(fragment) and not is_int(fragment):
+                fragments.add(str(int(float(fragment))))
+                fragments.add(str(int(float(fragment)) + 1))
+
+    @staticmethod
+    def of(tree_index: TreeIndex) -> 'FragmentIndex':
+        """Returns the fragment index of `tree_index`, which is computed only once per tree index."""
+        result = _fragment_indices.get(tree_index)
+        if result is None:
+            result = FragmentIndex(tree_index)
+            _fragment_indices[tree_index] = result
+        return result
+
+    def string(self, pos: int) -> str:
+        return self.text[self.starts[pos]:self.stops[pos]]
+
+
+_fragment_indices: 'weakref.WeakKeyDictionary[TreeIndex, FragmentIndex]' = weakref.WeakKeyDictionary()
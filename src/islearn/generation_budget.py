@@ -0,0 +1,79 @@
+import resource
+import time
+from typing import List, Optional
+
+
+class GenerationBudget:
+    """
+    Limits the number of candidates, the wall time, and the (peak) memory of candidate
+    generation, both globally and per pattern. A limit of None means no limit. The budget is
+    spent by `InvariantLearner.iterate_candidates`, which calls `start_pattern` before
+    instantiating a pattern and `spend` for each produced candidate, and stops instantiating
+    the pattern (or all remaining patterns) as soon as `pattern_exhausted` (or `exhausted`)
+    holds. The indices of patterns whose instantiation was stopped (or skipped) are recorded in
+    `truncated_patterns`.
+    """
+
+    def __init__(
+            self,
+            max_candidates: Optional[int] = None,
+            max_seconds: Optional[float] = None,
+            max_memory_mb: Optional[float] = None,
+            max_candidates_per_pattern: Optional[int] = None,
+            max_seconds_per_pattern: Optional[float] = None):
+        self.max_candidates = max_candidates
+        self.max_seconds = max_seconds
+        self.max_memory_mb = max_memory_mb
+        self.max_candidates_per_pattern = max_candidates_per_pattern
+        self.max_seconds_per_pattern = max_seconds_per_pattern
+
+        self.num_candidates = 0
+        self.num_pattern_candidates = 0
+        self.truncated_patterns: List[int] = []
+
+        self.__start_time: Optional[float] = None
+        self.__pattern_start_time: Optional[float] = None
+
+    def restart(self) -> None:
+        """Makes the full budget available again, e.g., for another run of candidate generation."""
+        self.num_candidates = 0
+        self.num_pattern_candidates = 0
+        self.truncated_patterns = []
+        self.__start_time = None
+        self.__pattern_start_time = None
+
+    def start_pattern(self) -> None:
+        now = time.time()
+        if self.__start_time is None:
+            self.__start_time = now
+        self.__pattern_start_time = now
+        self.num_pattern_candidates = 0
+
+    def spend(self, num_candidates: int = 1) -> None:
+        self.num_candidates += num_candidates
+        self.num_pattern_candidates += num_candidates
+
+    def exhausted(self) -> bool:
+        """True iff the global budget is spent."""
+        if self.max_candidates is not None and self.num_candidates >= self.max_candidates:
+            return True
+        if (self.max_seconds is not None and self.__start_time is not None
+                and time.time() - self.__start_time >= self.max_seconds):
+            return True
+        return self.max_memory_mb is not None and peak_memory_mb() >= self.max_memory_mb
+
+    def pattern_exhausted(self) -> bool:
+        """True iff the budget of the current pattern or the global budget is spent."""
+        if (self.max_candidates_per_pattern is not None
+                and self.num_pattern_candidates >= self.max_candidates_per_pattern):
+            return True
+        if (self.max_seconds_per_pattern is not None and self.__pattern_start_time is not None
+                and time.time() - self.__pattern_start_time >= self.max_seconds_per_pattern):
+            return True
+        return self.exhausted()
+
+
+def peak_memory_mb() -> float:
+    """The peak resident set size of this process in megabytes."""
+    # On Linux, `ru_maxrss` is in kilobytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -1,10 +1,14 @@
+import copyreg
 import itertools
 import math
+import pickle
 import re
 from functools import reduce
 from typing import Callable, TypeVar, Optional, Iterable, Tuple, Set, List, Dict, Sequence
 
 import isla.language
+import z3
+from isla.isla_predicates import STANDARD_STRUCTURAL_PREDICATES, STANDARD_SEMANTIC_PREDICATES
 from pathos import multiprocessing as pmp
 
 S = TypeVar("S")
@@ -253,3 +257,72 @@ def try_except(success: Callable[[], T], failure: Callable[[], T] | T, *exceptio
         return success()
     except exceptions or Exception:
         return failure() if callable(failure) else failure
+
+
+def _smt_formula_getstate(self: isla.language.SMTFormula) -> Dict[str, bytes]:
+    result: Dict[str, bytes] = {f: pickle.dumps(v) for f, v in self.__dict__.items() if f != "formula"}
+    result["formula"] = self.formula.sexpr().encode("utf-8")
+    return result
+
+
+def _smt_formula_setstate(self: isla.language.SMTFormula, state: Dict[str, bytes]) -> None:
+    inst = {f: pickle.loads(v) for f, v in state.items() if f != "formula"}
+    self.formula = z3.parse_smt2_string(
+        f"(assert {state['formula'].decode('utf-8')})",
+        decls={
+            var.name: z3.String(var.name)
+            for var in inst["free_variables_"] | inst["instantiated_variables"]
+        })[0]
+    self.__dict__.update(inst)
+
+
+def _standard_predicate(name: str) -> isla.language.StructuralPredicate | isla.language.SemanticPredicate:
+    return next(
+        predicate
+        for predicate in STANDARD_STRUCTURAL_PREDICATES | STANDARD_SEMANTIC_PREDICATES
+        if predicate.name == name)
+
+
+def _reduce_predicate(self: isla.language.StructuralPredicate | isla.language.SemanticPredicate):
+    if any(predicate is self for predicate in STANDARD_STRUCTURAL_PREDICATES | STANDARD_SEMANTIC_PREDICATES):
+        return _standard_predicate, (self.name,)
+    return copyreg.__newobj__, (type(self),), self.__dict__
+
+
+def make_formulas_picklable() -> None:
+    """
+    ISLa pickles SMT formulas in its own concrete syntax, which z3 cannot always parse back,
+    e.g., for string constants with quotes. Unpickling such formulas in worker processes fails,
+    and pools wait forever for the lost results. This replaces the pickling methods of SMT
+    formulas by ones using z3's SMT-LIB representation.
+
+    Furthermore, the standard predicates of ISLa are pickled by name. Otherwise, their evaluation
+    functions are pickled by value once `InvariantLearner` replaced them by cached versions, and
+    unpickled formulas are no longer equal to the original ones.
+    """
+    isla.language.SMTFormula.__getstate__ = _smt_formula_getstate
+    isla.language.SMTFormula.__setstate__ = _smt_formula_setstate
+    isla.language.StructuralPredicate.__reduce__ = _reduce_predicate
+    isla.language.SemanticPredicate.__reduce__ = _reduce_predicate
+
+
+_isla_derivation_tree_getstate = isla.language.DerivationTree.__getstate__
+
+
+def _derivation_tree_getstate(self: isla.language.DerivationTree) -> bytes:
+    caches = {
+        f: v for f, v in self.__dict__.items()
+        if f in ("_DerivationTree__k_paths", "_DerivationTree__concrete_k_paths")}
+    try:
+        return _isla_derivation_tree_getstate(self)
+    finally:
+        self.__dict__.update(caches)
+
+
+def make_trees_picklable() -> None:
+    """
+    ISLa removes the cached k-paths of a derivation tree from the tree itself (and not from a copy)
+    when pickling it. Later computations of k-paths of the original tree fail. This replaces the
+    pickling method of derivation trees by one restoring the cache after pickling.
+    """
+    isla.language.DerivationTree.__getstate__ = _derivation_tree_getstate
@@ -0,0 +1,200 @@
+import copy
+import logging
+from typing import Dict, Tuple, Set, List, Optional, Iterable, Sequence
+
+from isla import language
+
+from islearn.evaluation_cache import EvaluationCache
+from islearn.evaluation_pool import EvaluationPool
+from islearn.helpers import transitive_closure
+from islearn.learner import InvariantLearner, TruthTable, TruthTableRow, create_input_reachability_relation
+
+logger = logging.getLogger("incremental")
+
+
+class IncrementalLearningSession:
+    """
+    Keeps the candidates and the complete recall and precision truth tables of an
+    `InvariantLearner` run, such that positive and negative examples can be added
+    afterward without a full relearn: For new examples, only the new columns are
+    evaluated. Boolean combinations are scored again on the extended bit matrices,
+    and `invariants` is updated in place.
+
+    Candidates are only generated again if new positive examples extend the input
+    reachability relation of the examples for learning; in that case, the new examples
+    are added to the examples for learning and the new candidates are evaluated on all
+    examples.
+
+    Different from `InvariantLearner.learn_invariants`, the truth tables are always
+    evaluated completely, since rows failing the thresholds now might meet them later.
+
+    If the learner uses several evaluation processes, one evaluation pool serves the whole
+    session; new examples are added to it as corpora. Close the session (or use it as a
+    context manager) to stop the pool.
+    """
+
+    def __init__(self, learner: InvariantLearner, ensure_unique_var_names: bool = True):
+        self.learner = learner
+        self.ensure_unique_var_names = ensure_unique_var_names
+
+        self.candidates: Set[language.Formula] = set([])
+        self.input_reachability_relation: Set[Tuple[str, str]] = set([])
+        self.recall_truth_table: TruthTable = TruthTable()
+        self.precision_truth_table: Optional[TruthTable] = None
+        self.invariants: Dict[language.Formula, Tuple[float, float]] = {}
+
+        self.num_candidate_generations = 0
+        self.evaluation_pool: Optional[EvaluationPool] = None
+
+    def learn(self) -> Dict[language.Formula, Tuple[float, float]]:
+        """Runs the learner once and returns the learned invariants."""
+        self.learner._prepare_inputs_for_learning()
+
+        self.input_reachability_relation = create_input_reachability_relation(
+            self.learner.positive_examples_for_learning)
+        self.candidates = self.__generate_candidates()
+        logger.info("Found %d invariant candidates.", len(self.candidates))
+
+        self.recall_truth_table = self.__evaluate(self.candidates, self.learner.positive_examples)
+        self.precision_truth_table = (
+            None if not self.learner.negative_examples
+            else self.__evaluate(self.candidates, self.learner.negative_examples))
+
+        return self.__update_invariants()
+
+    def add_positive(self, *inputs: language.DerivationTree) -> Dict[language.Formula, Tuple[float, float]]:
+        new_inputs = self.__new_inputs(inputs, self.learner.positive_examples)
+        if not new_inputs:
+            return self.invariants
+
+        old_inputs = self.learner.positive_examples
+        self.learner.positive_examples = old_inputs + new_inputs
+
+        self.recall_truth_table = self.__extend(
+            self.recall_truth_table, old_inputs, self.__evaluate(self.candidates, new_inputs))
+
+        input_reachability_relation = transitive_closure(
+            self.input_reachability_relation | create_input_reachability_relation(new_inputs))
+        if input_reachability_relation != self.input_reachability_relation:
+            logger.info(
+                "New positive examples extend the input reachability relation by %d pairs, generating candidates.",
+                len(input_reachability_relation) - len(self.input_reachability_relation))
+
+            self.input_reachability_relation = input_reachability_relation
+            self.learner.positive_examples_for_learning = (
+                list(self.learner.positive_examples_for_learning) + new_inputs)
+
+            new_candidates = self.__generate_candidates() - self.candidates
+            logger.info("Found %d new invariant candidates.", len(new_candidates))
+
+            self.candidates.update(new_candidates)
+            self.recall_truth_table += self.__evaluate(new_candidates, self.learner.positive_examples)
+            if self.precision_truth_table is not None:
+                self.precision_truth_table += self.__evaluate(new_candidates, self.learner.negative_examples)
+
+        return self.__update_invariants()
+
+    def add_negative(self, *inputs: language.DerivationTree) -> Dict[language.Formula, Tuple[float, float]]:
+        new_inputs = self.__new_inputs(inputs, self.learner.negative_examples)
+        if not new_inputs:
+            return self.invariants
+
+        old_inputs = self.learner.negative_examples
+        self.learner.negative_examples = old_inputs + new_inputs
+
+        new_columns = self.__evaluate(self.candidates, new_inputs)
+        if self.precision_truth_table is None:
+            self.precision_truth_table = new_columns
+        else:
+            self.precision_truth_table = self.__extend(self.precision_truth_table, old_inputs, new_columns)
+
+        return self.__update_invariants()
+
+    def close(self) -> None:
+        if self.evaluation_pool is not None:
+            self.evaluation_pool.close()
+            self.evaluation_pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __generate_candidates(self) -> Set[language.Formula]:
+        self.num_candidate_generations += 1
+        return self.learner.generate_candidates(self.learner.patterns, self.learner.positive_examples_for_learning)
+
+    def __update_invariants(self) -> Dict[language.Formula, Tuple[float, float]]:
+        # Combining rows modifies the tables; we keep the original ones for later updates.
+        invariants = self.learner._combine_and_score(
+            copy.deepcopy(self.recall_truth_table),
+            copy.deepcopy(self.precision_truth_table),
+            self.ensure_unique_var_names)
+
+        self.invariants.clear()
+        self.invariants.update(invariants)
+        return self.invariants
+
+    def __evaluate(
+            self,
+            formulas: Iterable[language.Formula],
+            inputs: Sequence[language.DerivationTree]) -> TruthTable:
+        truth_table = TruthTable([TruthTableRow(formula, inputs) for formula in formulas])
+        if not len(truth_table) or not inputs:
+            return truth_table
+
+        added_corpus = None
+        if self.learner.num_evaluation_processes > 1:
+            if self.evaluation_pool is None:
+                self.evaluation_pool = EvaluationPool(
+                    self.learner.grammar,
+                    {"positive": self.learner.positive_examples, "negative": self.learner.negative_examples},
+                    self.learner.num_evaluation_processes)
+            if self.evaluation_pool.corpus_of(inputs) is None:
+                added_corpus = self.evaluation_pool.add_corpus(inputs)
+
+        evaluation_cache = (
+            None if self.learner.evaluation_cache_dir is None
+            else EvaluationCache(self.learner.grammar, self.learner.evaluation_cache_dir))
+
+        try:
+            truth_table.evaluate(
+                self.learner.graph,
+                evaluation_pool=self.evaluation_pool,
+                evaluation_cache=evaluation_cache)
+        finally:
+            if added_corpus is not None:
+                self.evaluation_pool.remove_corpus(added_corpus)
+            if evaluation_cache is not None:
+                evaluation_cache.close()
+
+        logger.debug("Evaluated %d candidates on %d inputs.", len(truth_table), len(inputs))
+        return truth_table
+
+    @staticmethod
+    def __new_inputs(
+            inputs: Iterable[language.DerivationTree],
+            known_inputs: Iterable[language.DerivationTree]) -> List[language.DerivationTree]:
+        seen = {str(inp) for inp in known_inputs}
+        result: List[language.DerivationTree] = []
+        for inp in inputs:
+            if str(inp) not in seen:
+                seen.add(str(inp))
+                result.append(inp)
+
+        return result
+
+    @staticmethod
+    def __extend(
+            truth_table: TruthTable,
+            old_inputs: Sequence[language.DerivationTree],
+            new_columns: TruthTable) -> TruthTable:
+        """Appends the columns of `new_columns` to the rows of `truth_table` with the same formulas."""
+        inputs = list(old_inputs) + (list(new_columns[0].inputs) if len(new_columns) else [])
+        return TruthTable([
+            TruthTableRow.from_bits(
+                row.formula,
+                inputs,
+                row.bits | new_columns[row.formula].bits << len(old_inputs))
+            for row in truth_table])
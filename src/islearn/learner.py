@@ -1,3 +1,4 @@
+import asyncio
 import copy
 import functools
 import inspect
@@ -6,9 +7,10 @@ import logging
 import os.path
 import pkgutil
 import string
+import time
 from abc import ABC
 from functools import lru_cache
-from typing import List, Tuple, Set, Dict, Optional, cast, Callable, Iterable, Sequence
+from typing import List, Tuple, Set, Dict, Optional, cast, Callable, Iterable, Sequence, Iterator
 
 from returns.result import Success, Failure
 import datrie
@@ -19,19 +21,26 @@ from grammar_graph import gg
 from isla import language, isla_predicates
 from isla.evaluator import evaluate, matches_for_quantified_formula
 from isla.helpers import RE_NONTERMINAL, weighted_geometric_mean, \
-    is_nonterminal, dict_of_lists_to_list_of_dicts, canonical
+    is_nonterminal, canonical
 from isla.isla_predicates import reachable
 from isla.language import set_smt_auto_eval, ensure_unique_bound_variables
 from isla.solver import ISLaSolver
 from isla.three_valued_truth import ThreeValuedTruth
-from isla.trie import path_to_trie_key
 from isla.type_defs import Grammar, ParseTree, Path
 from isla.z3_helpers import z3_subst, evaluate_z3_expression, is_valid, \
     DomainError
 from pathos import multiprocessing as pmp
 
+from islearn.boolean_combinations import CombinationEngine
+from islearn.canonical_form import add_representatives, canonical_key
+from islearn.evaluation_cache import EvaluationCache
+from islearn.evaluation_pool import EvaluationPool, EvaluationTask, evaluate_formula_on_inputs, \
+    evaluate_tasks_by_skeleton
+from islearn.formula_compiler import evaluate_formula, QuantifierMatches
+from islearn.fragment_index import FragmentIndex
+from islearn.generation_budget import GenerationBudget
 from islearn.helpers import connected_chains, transitive_closure, tree_in, \
-    is_int, is_float, e_assert
+    is_int, e_assert, make_formulas_picklable
 from islearn.language import NonterminalPlaceholderVariable, PlaceholderVariable, \
     NonterminalStringPlaceholderVariable, parse_abstract_isla, \
     StringPlaceholderVariable, \
@@ -39,16 +48,28 @@ from islearn.language import NonterminalPlaceholderVariable, PlaceholderVariable
     DisjunctiveStringsPlaceholderVariable, \
     StringPlaceholderVariableTypes
 from islearn.mutation import MutationFuzzer
+from islearn.oracle import PropertyOracle
+from islearn.parallel_fuzzing import ParallelMutationFuzzer
 from islearn.parse_tree_utils import replace_path, expand_tree, tree_leaves, \
-    get_subtree, tree_paths, trie_from_parse_tree, next_trie_key, tree_from_paths, Tree, \
-    get_subtrie
+    get_subtree, tree_paths, tree_from_paths, Tree
+from islearn.recall_filtering import SequentialSamplingFilter, FalsifierFirstOrdering
 from islearn.reducer import InputReducer
+from islearn.string_disjunctions import DisjunctionEnumerator, placeholder_polarity
+from islearn.tree_index import TreeIndex
 
 STANDARD_PATTERNS_REPO = "patterns.toml"
+
+# Maximum number of partial pattern instantiations completed in one task during parallel candidate generation.
+GENERATION_CHUNK_SIZE = 64
+
 logger = logging.getLogger("learner")
 
 
 class TruthTableRow:
+    """The evaluation results of one formula for a sequence of inputs. Results are stored
+    as a bit set (bit i is set iff the formula holds for input i) with a cached population
+    count, such that Boolean combinations and scores cost O(words), not O(inputs)."""
+
     def __init__(
             self,
             formula: language.Formula,
@@ -56,57 +77,95 @@ class TruthTableRow:
             eval_results: Sequence[bool] = ()):
         self.formula = formula
         self.inputs = list(inputs)
-        self.eval_results: List[bool] = list(eval_results)
+        self.__bits: int = 0
+        self.__num_results: int = 0
+        self.__num_true: int = 0
+        self.eval_results = eval_results
+
+    @staticmethod
+    def from_bits(
+            formula: language.Formula,
+            inputs: Sequence[language.DerivationTree],
+            bits: int,
+            num_results: Optional[int] = None) -> 'TruthTableRow':
+        result = TruthTableRow(formula, inputs)
+        result.set_bits(bits, len(result.inputs) if num_results is None else num_results)
+        return result
+
+    @property
+    def eval_results(self) -> List[bool]:
+        return [bool(self.__bits >> idx & 1) for idx in range(self.__num_results)]
+
+    @eval_results.setter
+    def eval_results(self, eval_results: Sequence[bool]) -> None:
+        bits = 0
+        for idx, eval_result in enumerate(eval_results):
+            if eval_result:
+                bits |= 1 << idx
+        self.set_bits(bits, len(eval_results))
+
+    @property
+    def bits(self) -> int:
+        return self.__bits
+
+    @property
+    def num_true(self) -> int:
+        return self.__num_true
+
+    def set_bits(self, bits: int, num_results: int) -> None:
+        assert bits >> num_results == 0
+        self.__bits = bits
+        self.__num_results = num_results
+        self.__num_true = bits.bit_count()
 
     def __copy__(self):
-        return TruthTableRow(self.formula, self.inputs, self.eval_results)
+        return TruthTableRow.from_bits(self.formula, self.inputs, self.__bits, self.__num_results)
 
     def evaluate(
             self,
             graph: gg.GrammarGraph,
             columns_parallel: bool = False,
             lazy: bool = False,
-            result_threshold: float = .9) -> 'TruthTableRow':
+            result_threshold: float = .9,
+            max_true_results: Optional[int] = None) -> 'TruthTableRow':
         """If lazy is True, then the evaluation stops as soon as result_threshold can no longer be
         reached. E.g., if result_threshold is .9 and there are 100 inputs, then after more than
-        10 negative results, 90% positive results is no longer possible."""
+        10 negative results, 90% positive results is no longer possible. If max_true_results
+        is set, the evaluation stops as soon as more than that many results are positive
+        (e.g., since a minimum specificity can no longer be reached)."""
 
         if columns_parallel:
             with pmp.ProcessingPool(processes=pmp.cpu_count()) as pool:
                 iterator = pool.imap(
-                    lambda inp: evaluate(self.formula, inp, graph.grammar, graph=graph).is_true(),
+                    lambda inp: evaluate_formula(self.formula, inp, graph).is_true(),
                     self.inputs)
 
-                self.eval_results = []
+                bits = 0
+                true_results = 0
                 negative_results = 0
-                for eval_result in iterator:
+                for idx, eval_result in enumerate(iterator):
+                    # All remaining results are considered to be negative.
                     if lazy and negative_results > len(self.inputs) * (1 - result_threshold):
-                        self.eval_results += [False for _ in range(len(self.inputs) - len(self.eval_results))]
+                        break
+                    if max_true_results is not None and true_results > max_true_results:
                         break
 
-                    if not eval_result:
+                    if eval_result:
+                        bits |= 1 << idx
+                        true_results += 1
+                    else:
                         negative_results += 1
-                    self.eval_results.append(eval_result)
         else:
-            self.eval_results = []
-            negative_results = 0
-            for inp in self.inputs:
-                if lazy and negative_results > len(self.inputs) * (1 - result_threshold):
-                    self.eval_results += [False for _ in range(len(self.inputs) - len(self.eval_results))]
-                    break
-
-                eval_result = evaluate(self.formula, inp, graph.grammar, graph=graph).is_true()
-                if not eval_result:
-                    negative_results += 1
-                self.eval_results.append(eval_result)
+            bits = evaluate_formula_on_inputs(
+                self.formula, self.inputs, graph, lazy, result_threshold, max_true_results)
 
+        self.set_bits(bits, len(self.inputs))
         return self
 
     def eval_result(self) -> float:
         assert len(self.inputs) > 0
-        assert len(self.eval_results) == len(self.inputs)
-        assert all(isinstance(entry, bool) for entry in self.eval_results)
-        return sum(int(entry) for entry in self.eval_results) / len(self.eval_results)
+        assert self.__num_results == len(self.inputs)
+        return self.__num_true / self.__num_results
 
     def __repr__(self):
         return f"TruthTableRow({repr(self.formula)}, {repr(self.inputs)}, {repr(self.eval_results)})"
@@ -119,88 +178,130 @@ class TruthTableRow:
                 self.formula == other.formula)
 
     def __len__(self):
-        return len(self.eval_results)
+        return self.__num_results
 
     def __hash__(self):
         return hash(self.formula)
 
     def __neg__(self):
-        return TruthTableRow(
+        return TruthTableRow.from_bits(
             -self.formula,
             self.inputs,
-            [not eval_result for eval_result in self.eval_results]
+            self.__bits ^ ((1 << self.__num_results) - 1),
+            self.__num_results
         )
 
     def __and__(self, other: 'TruthTableRow') -> 'TruthTableRow':
         assert len(self.inputs) == len(other.inputs)
-        assert len(self.eval_results) == len(other.eval_results)
-        return TruthTableRow(
+        assert len(self) == len(other)
+        return TruthTableRow.from_bits(
             self.formula & other.formula,
             self.inputs,
-            [a and b for a, b in zip(self.eval_results, other.eval_results)]
+            self.__bits & other.bits,
+            self.__num_results
         )
 
     def __or__(self, other: 'TruthTableRow') -> 'TruthTableRow':
         assert len(self.inputs) == len(other.inputs)
-        assert len(self.eval_results) == len(other.eval_results)
-        return TruthTableRow(
+        assert len(self) == len(other)
+        return TruthTableRow.from_bits(
             self.formula | other.formula,
             self.inputs,
-            [a or b for a, b in zip(self.eval_results, other.eval_results)]
+            self.__bits | other.bits,
+            self.__num_results
         )
 
 
 class TruthTable:
+    """
+    An insertion-ordered collection of rows with unique formulas. Rows are indexed by their
+    formulas. Removed rows leave a tombstone, which is dropped when the table is compacted;
+    this happens when tombstones make up half of the storage or a row is accessed by position.
+    Thus, removing any number of rows, individually or in bulk with `filter` or `retain`,
+    takes linear time.
+    """
+
     def __init__(self, rows: Iterable[TruthTableRow] = ()):
-        self.__row_hashes = set([])
-        self.__rows = []
+        self.__rows: List[Optional[TruthTableRow]] = []
+        self.__index: Dict[language.Formula, int] = {}
+        self.__num_tombstones = 0
         for row in rows:
-            row_hash = hash(row)
-            if row_hash not in self.__row_hashes:
-                self.__row_hashes.add(row_hash)
-                self.__rows.append(row)
+            self.append(row)
 
     def __deepcopy__(self, memodict=None):
-        return TruthTable([copy.copy(row) for row in self.__rows])
+        return TruthTable([copy.copy(row) for row in self])
 
     def __repr__(self):
-        return f"TruthTable({repr(self.__rows)})"
+        return f"TruthTable({repr(list(self))})"
 
     def __str__(self):
-        return "\n".join(map(str, self.__rows))
+        return "\n".join(map(str, self))
 
     def __getitem__(self, item: int | language.Formula) -> TruthTableRow:
         if isinstance(item, int):
+            self.__compact()
             return self.__rows[item]
 
         assert isinstance(item, language.Formula)
 
         try:
-            return next(row for row in self.__rows if row.formula == item)
-        except StopIteration:
+            return self.__rows[self.__index[item]]
+        except KeyError:
             raise KeyError(item)
 
+    def __contains__(self, item: TruthTableRow | language.Formula) -> bool:
+        return (item.formula if isinstance(item, TruthTableRow) else item) in self.__index
+
     def __len__(self):
-        return len(self.__rows)
+        return len(self.__index)
 
     def __iter__(self):
-        return iter(self.__rows)
+        # Iterating over a snapshot permits removing rows during iteration.
+        return iter([row for row in self.__rows if row is not None])
 
     def append(self, row: TruthTableRow):
-        row_hash = hash(row)
-        if row_hash not in self.__row_hashes:
-            self.__row_hashes.add(row_hash)
+        if row.formula not in self.__index:
+            self.__index[row.formula] = len(self.__rows)
             self.__rows.append(row)
 
     def remove(self, row: TruthTableRow):
-        self.__rows.remove(row)
-        self.__row_hashes.remove(hash(row))
+        position = self.__index.pop(row.formula)
+        self.__rows[position] = None
+        self.__num_tombstones += 1
+
+        if 2 * self.__num_tombstones >= len(self.__rows):
+            self.__compact()
+
+    def filter(self, predicate: Callable[[TruthTableRow], bool]) -> 'TruthTable':
+        """Removes all rows not satisfying `predicate` and returns this table."""
+        return self.retain([predicate(row) for row in self])
+
+    def retain(self, mask: Sequence[bool]) -> 'TruthTable':
+        """Keeps exactly the rows at those positions for which `mask` is True and returns this table.
+        Passing the same mask to tables of the same length removes corresponding rows from both."""
+        assert len(mask) == len(self)
+
+        self.__rows = [row for row, keep in zip(self, mask) if keep]
+        self.__num_tombstones = 0
+        self.__reindex()
+        return self
+
+    def __compact(self) -> None:
+        if not self.__num_tombstones:
+            return
+
+        self.__rows = [row for row in self.__rows if row is not None]
+        self.__num_tombstones = 0
+        self.__reindex()
+
+    def __reindex(self) -> None:
+        self.__index = {row.formula: position for position, row in enumerate(self.__rows)}
 
     def __add__(self, other: 'TruthTable') -> 'TruthTable':
-        return TruthTable(self.__rows + other.__rows)
+        return TruthTable(list(self) + list(other))
 
     def __iadd__(self, other: 'TruthTable') -> 'TruthTable':
-        for row in other.__rows:
+        for row in other:
             self.append(row)
 
         return self
@@ -211,25 +312,127 @@ class TruthTable:
             columns_parallel: bool = False,
             rows_parallel: bool = False,
             lazy: bool = False,
-            result_threshold: float = .9) -> 'TruthTable':
+            result_threshold: float = .9,
+            evaluation_pool: Optional[EvaluationPool] = None,
+            max_true_results: Optional[int] = None,
+            input_ordering: Optional[FalsifierFirstOrdering] = None,
+            evaluation_cache: Optional[EvaluationCache] = None) -> 'TruthTable':
         """If lazy is True, then column evaluation stops as soon as result_threshold can no longer be
         reached. E.g., if result_threshold is .9 and there are 100 inputs, then after more than
-        10 negative results, 90% positive results is no longer possible."""
+        10 negative results, 90% positive results is no longer possible. If max_true_results is
+        set, column evaluation stops as soon as more than that many results are positive.
+
+        If an evaluation pool is passed, rows are evaluated by its workers, which already hold
+        the inputs of the rows; only formulas and result bit sets are exchanged with them.
+
+        If an input ordering is passed in lazy mode, each row's inputs are evaluated in the
+        order it suggests, and the ordering is updated with each rejected row.
+
+        If an evaluation cache is passed, only results not found in the cache are evaluated,
+        and these are added to the cache.
+
+        Rows with the same quantifier skeleton share, per input, the matches of their
+        quantifiers (see `evaluate_tasks_by_skeleton`)."""
 
         assert not columns_parallel or not rows_parallel
+        assert evaluation_pool is None or (not columns_parallel and not rows_parallel)
+        assert (input_ordering is None and evaluation_cache is None) or (not columns_parallel and not rows_parallel)
+
+        self.__compact()
 
         if rows_parallel:
             with pmp.ProcessingPool(processes=pmp.cpu_count()) as pool:
-                self.__rows = set(pool.map(
-                    lambda row: row.evaluate(graph, columns_parallel, lazy=lazy, result_threshold=result_threshold),
+                self.__rows = list(pool.map(
+                    lambda row: row.evaluate(
+                        graph, columns_parallel, lazy=lazy, result_threshold=result_threshold,
+                        max_true_results=max_true_results),
                     self.__rows
                 ))
-        else:
+                self.__reindex()
+        elif columns_parallel:
             for row in self.__rows:
-                row.evaluate(graph, columns_parallel, lazy=lazy, result_threshold=result_threshold)
+                row.evaluate(
+                    graph, columns_parallel, lazy=lazy, result_threshold=result_threshold,
+                    max_true_results=max_true_results)
+        else:
+            self.__evaluate_rows(
+                graph, lazy, result_threshold, max_true_results, evaluation_pool,
+                input_ordering if lazy else None, evaluation_cache)
 
         return self
 
+    def __evaluate_rows(
+            self,
+            graph: gg.GrammarGraph,
+            lazy: bool,
+            result_threshold: float,
+            max_true_results: Optional[int],
+            evaluation_pool: Optional[EvaluationPool],
+            input_ordering: Optional[FalsifierFirstOrdering],
+            evaluation_cache: Optional[EvaluationCache]) -> None:
+        if not self.__rows:
+            return
+
+        inputs = self.__rows[0].inputs
+        num_inputs = len(inputs)
+
+        # The workers of an evaluation pool hold their own indices and quantifier matches.
+        tree_indices = None if evaluation_pool is not None else [TreeIndex(inp) for inp in inputs]
+        matches_by_skeleton: Dict[Tuple[str, ...], List[QuantifierMatches]] = {}
+
+        corpus_name = None
+        if evaluation_pool is not None:
+            corpus_name = evaluation_pool.corpus_of(inputs)
+            assert corpus_name is not None, "The evaluation pool does not hold the inputs of this table"
+
+        # An input ordering is updated after each round. With an evaluation pool,
+        # all workers are busy during one round.
+        if input_ordering is None:
+            round_size = len(self.__rows)
+        elif evaluation_pool is None:
+            round_size = 1
+        else:
+            round_size = evaluation_pool.processes * evaluation_pool.batch_size
+
+        for round_start in range(0, len(self.__rows), round_size):
+            rows = self.__rows[round_start:round_start + round_size]
+
+            known_results: List[Tuple[int, int]] = [
+                (0, 0) if evaluation_cache is None else evaluation_cache.lookup(row.formula, inputs)
+                for row in rows]
+
+            tasks: List[EvaluationTask] = []
+            for row, (known_bits, known) in zip(rows, known_results):
+                columns = None if input_ordering is None else input_ordering.order(row.formula)
+                if known:
+                    columns = [
+                        idx for idx in (range(num_inputs) if columns is None else columns)
+                        if not known >> idx & 1]
+
+                num_known_true = known_bits.bit_count()
+                tasks.append((row.formula, columns, num_known_true, known.bit_count() - num_known_true))
+
+            if evaluation_pool is None:
+                results = evaluate_tasks_by_skeleton(
+                    tasks, inputs, graph, lazy, result_threshold, max_true_results,
+                    tree_indices, matches_by_skeleton)
+            else:
+                results = evaluation_pool.evaluate_tasks(
+                    tasks, corpus_name, lazy, result_threshold, max_true_results)
+
+            for row, (known_bits, known), (bits, evaluated) in zip(rows, known_results, results):
+                row.set_bits(known_bits | bits, num_inputs)
+
+                if evaluation_cache is not None:
+                    evaluation_cache.add(row.formula, inputs, bits, evaluated)
+
+                if input_ordering is not None:
+                    input_ordering.record(
+                        row.formula, known_bits | bits, known | evaluated, num_inputs * (1 - result_threshold))
+
+        if evaluation_cache is not None:
+            evaluation_cache.flush()
+
 
 class InvariantLearner:
     def __init__(
@@ -259,6 +462,17 @@ class InvariantLearner:
             generate_new_learning_samples: bool = True,
             do_generate_more_inputs: bool = True,
             filter_inputs_for_learning_by_kpaths: bool = True,
+            num_evaluation_processes: int = 1,
+            num_generation_processes: int = 1,
+            num_fuzzing_jobs: int = 1,
+            num_fuzzing_workers: int = 1,
+            adaptive_recall_filtering: bool = False,
+            adaptive_recall_filtering_confidence: Optional[float] = None,
+            falsifier_first_ordering: bool = True,
+            evaluation_cache_dir: Optional[str] = None,
+            generation_budget: Optional[GenerationBudget] = None,
+            max_string_disjunction_width: Optional[int] = None,
+            oracle_cache_dir: Optional[str] = None,
     ):
         # We add extended caching certain, crucial functions.
         isla.helpers.evaluate_z3_expression = lru_cache(maxsize=None)(
@@ -274,7 +488,11 @@ class InvariantLearner:
         self.grammar = grammar
         self.canonical_grammar = canonical(grammar)
         self.graph = gg.GrammarGraph.from_grammar(grammar)
-        self.prop = prop
+        # Verdicts of the property are memoized and shared with the mutation fuzzer and the
+        # input reducers. A `PropertyOracle` can also be passed directly as `prop`, e.g., to
+        # name a lambda whose verdicts are persisted.
+        self.prop: Optional[PropertyOracle] = (
+            None if prop is None else PropertyOracle.of(prop, cache_dir=oracle_cache_dir))
         self.k = k
         self.mexpr_expansion_limit = mexpr_expansion_limit
         self.max_nonterminals_in_mexpr = max_nonterminals_in_mexpr
@@ -289,6 +507,31 @@ class InvariantLearner:
         self.generate_new_learning_samples = generate_new_learning_samples
         self.do_generate_more_inputs = do_generate_more_inputs
         self.filter_inputs_for_learning_by_kpaths = filter_inputs_for_learning_by_kpaths
+        self.num_evaluation_processes = num_evaluation_processes
+        self.num_generation_processes = num_generation_processes
+        self.num_fuzzing_jobs = num_fuzzing_jobs
+        self.num_fuzzing_workers = num_fuzzing_workers
+        self.adaptive_recall_filtering = adaptive_recall_filtering
+        self.adaptive_recall_filtering_confidence = adaptive_recall_filtering_confidence
+        self.falsifier_first_ordering = falsifier_first_ordering
+        self.evaluation_cache_dir = evaluation_cache_dir
+        # A generation budget is spent by the streaming generator (`iterate_candidates`), which
+        # instantiates patterns sequentially: `num_generation_processes` is then ignored.
+        self.generation_budget = generation_budget
+        if generation_budget is not None and num_generation_processes > 1:
+            logger.warning(
+                "Candidates are generated sequentially with a generation budget; "
+                "ignoring num_generation_processes=%d.", num_generation_processes)
+        self.max_string_disjunction_width = max_string_disjunction_width
+        self.evaluation_pool: Optional[EvaluationPool] = None
+
+        # Number of candidates per pattern that collapsed with equivalent candidates (see
+        # `islearn.canonical_form`) in the last call of `generate_candidates`.
+        self.num_collapsed_candidates: List[int] = []
+        # Number of branches pruned while instantiating nonterminal placeholders (see
+        # `_instantiations_for_placeholder_variables`) in the last call of `generate_candidates`.
+        self.num_pruned_instantiation_branches: int = 0
+        self.recall_input_ordering: Optional[FalsifierFirstOrdering] = None
 
         self.positive_examples: List[language.DerivationTree] = list(set(positive_examples or []))
         self.original_positive_examples: List[language.DerivationTree] = list(self.positive_examples)
@@ -300,8 +543,9 @@ class InvariantLearner:
         self.target_number_positive_samples_for_learning = target_number_positive_samples_for_learning
         assert target_number_positive_samples >= target_number_positive_samples_for_learning
 
-        assert not prop or all(prop(example) for example in self.positive_examples)
-        assert not prop or all(not prop(example) for example in self.negative_examples)
+        # Asynchronous properties might require an event loop that is not running yet.
+        assert not self.prop or self.prop.is_async or all(self.prop.check_all(self.positive_examples))
+        assert not self.prop or self.prop.is_async or not any(self.prop.check_all(self.negative_examples))
 
         # Also consider inverted patterns?
         assert not activated_patterns or not deactivated_patterns
@@ -318,11 +562,47 @@ class InvariantLearner:
                 for pattern in patterns]
 
     def learn_invariants(self, ensure_unique_var_names: bool = True) -> Dict[language.Formula, Tuple[float, float]]:
+        self._prepare_inputs_for_learning()
+
+        # One evaluation pool serves the whole run; it is started once the examples are final.
+        self._get_evaluation_pool()
+        try:
+            candidates = self.generate_candidates(self.patterns, self.positive_examples_for_learning)
+            logger.info("Found %d invariant candidates.", len(candidates))
+
+            logger.debug(
+                "Candidates:\n%s",
+                "\n\n".join([language.ISLaUnparser(candidate).unparse() for candidate in candidates]))
+
+            recall_truth_table, precision_truth_table = self._evaluate_candidates(candidates)
+        finally:
+            self.close_evaluation_pool()
+
+        return self._combine_and_score(recall_truth_table, precision_truth_table, ensure_unique_var_names)
+
+    async def learn_invariants_async(
+            self, ensure_unique_var_names: bool = True) -> Dict[language.Formula, Tuple[float, float]]:
+        """
+        Like `learn_invariants`, for use in a running event loop. Learning runs in a worker thread,
+        while the calls of an asynchronous property are executed in the event loop. Thus, several
+        learners can run concurrently in one event loop, also sharing one oracle. An oracle cannot
+        be shared by learners running in different event loops at the same time.
+        """
+
+        if self.prop is None:
+            return await asyncio.to_thread(self.learn_invariants, ensure_unique_var_names)
+
+        with self.prop.running_in(asyncio.get_running_loop()):
+            return await asyncio.to_thread(self.learn_invariants, ensure_unique_var_names)
+
+    def _prepare_inputs_for_learning(self) -> None:
+        """Generates and reduces inputs (depending on the configuration) and chooses the positive
+        examples for candidate generation (`positive_examples_for_learning`)."""
         if self.prop and self.do_generate_more_inputs:
             self._generate_more_inputs()
             assert len(self.positive_examples) > 0, "Cannot learn without any positive examples!"
-            assert all(self.prop(positive_example) for positive_example in self.positive_examples)
-            assert all(not self.prop(negative_example) for negative_example in self.negative_examples)
+            assert all(self.prop.check_all(self.positive_examples))
+            assert not any(self.prop.check_all(self.negative_examples))
 
         if self.reduce_all_inputs and self.prop is not None:
             logger.info(
@@ -376,54 +656,130 @@ class InvariantLearner:
                 reducer.reduce_by_smallest_subtree_replacement(inp)
                 for inp in self.positive_examples_for_learning]
 
+        if self.prop is not None:
+            logger.info(
+                "Property oracle: %d calls, %d hits (hit rate %.2f), %.2f seconds in the property.",
+                self.prop.calls, self.prop.hits, self.prop.hit_rate(), self.prop.seconds)
+            self.prop.flush()
+
         logger.debug(
             "Examples for learning:\n%s",
             "\n".join(map(str, self.positive_examples_for_learning)))
 
-        candidates = self.generate_candidates(self.patterns, self.positive_examples_for_learning)
-        logger.info("Found %d invariant candidates.", len(candidates))
-
-        logger.debug(
-            "Candidates:\n%s",
-            "\n\n".join([language.ISLaUnparser(candidate).unparse() for candidate in candidates]))
-
+    def _evaluate_candidates(
+            self,
+            candidates: Iterable[language.Formula]) -> Tuple['TruthTable', Optional['TruthTable']]:
+        """Returns the recall and (if there are negative examples) the precision truth tables of
+        the candidates. Rows whose recall or precision requirements cannot be met might not be
+        evaluated completely, and rows not meeting the recall requirement might be dropped if
+        no disjunctions are learned."""
         logger.info("Filtering invariants.")
 
         # Only consider *real* invariants
 
-        # NOTE: Disabled parallel evaluation for now. In certain cases, this renders
-        #       the filtering process *much* slower, or gives rise to stack overflows
-        #       (e.g., "test_learn_from_islearn_patterns_file" example).
-        recall_truth_table = TruthTable([
-            TruthTableRow(inv, self.positive_examples)
-            for inv in candidates
-        ]).evaluate(
-            self.graph,
-            # rows_parallel=True,
-            lazy=self.max_disjunction_size < 2,
-            result_threshold=self.min_recall
-        )
-
-        if self.max_disjunction_size < 2:
-            for row in recall_truth_table:
-                if row.eval_result() < self.min_recall:
-                    recall_truth_table.remove(row)
-
-        precision_truth_table = None
-        if self.negative_examples:
-            logger.info("Evaluating precision.")
-            logger.debug("Negative samples:\n" + "\n-----------\n".join(map(str, self.negative_examples)))
+        # NOTE: Disabled parallel evaluation with fresh process pools for now. In certain cases,
+        #       this renders the filtering process *much* slower, or gives rise to stack overflows
+        #       (e.g., "test_learn_from_islearn_patterns_file" example), since each task ships
+        #       the inputs and the grammar graph. A persistent evaluation pool holding the inputs
+        #       is used instead if `num_evaluation_processes` is greater than 1.
+        # A pool started here (i.e., not by `learn_invariants`) is closed afterward.
+        owns_evaluation_pool = self.evaluation_pool is None
+        evaluation_pool = self._get_evaluation_pool()
+        evaluation_cache = (
+            None if self.evaluation_cache_dir is None
+            else EvaluationCache(self.grammar, self.evaluation_cache_dir))
+        try:
+            if self.adaptive_recall_filtering and self.max_disjunction_size < 2:
+                # Eliminate candidates on growing random samples of the inputs; only the remaining
+                # ones are evaluated on all inputs. Without disjunctions, we don't need exact
+                # results for candidates that don't meet the recall requirement.
+                recall_filter = SequentialSamplingFilter(
+                    self.graph,
+                    self.positive_examples,
+                    self.min_recall,
+                    confidence=self.adaptive_recall_filtering_confidence,
+                    evaluation_pool=evaluation_pool)
+                candidates = list(candidates)
+                recall_truth_table = TruthTable([
+                    TruthTableRow.from_bits(candidate, self.positive_examples, bits)
+                    for candidate, bits in zip(candidates, recall_filter.evaluate(candidates))
+                ])
+
+                logger.info(
+                    "Adaptive recall filtering eliminated %d of %d candidates with %d evaluations.",
+                    recall_filter.num_eliminated,
+                    len(candidates),
+                    recall_filter.num_evaluations)
+            else:
+                recall_truth_table = TruthTable([
+                    TruthTableRow(inv, self.positive_examples)
+                    for inv in candidates
+                ]).evaluate(
+                    self.graph,
+                    # rows_parallel=True,
+                    lazy=self.max_disjunction_size < 2,
+                    result_threshold=self.min_recall,
+                    evaluation_pool=evaluation_pool,
+                    input_ordering=self._get_recall_input_ordering(),
+                    evaluation_cache=evaluation_cache,
+                )
+
+                if self.recall_input_ordering is not None and self.recall_input_ordering.num_rejected:
+                    logger.info(
+                        "Rejected %d candidates after %.1f evaluations on average (%d inputs).",
+                        self.recall_input_ordering.num_rejected,
+                        self.recall_input_ordering.average_evaluations_per_rejection(),
+                        len(self.positive_examples))
+
+            if self.max_disjunction_size < 2:
+                recall_truth_table.filter(lambda row: row.eval_result() >= self.min_recall)
+
+            precision_truth_table = None
+            if self.negative_examples:
+                logger.info("Evaluating precision.")
+                logger.debug("Negative samples:\n" + "\n-----------\n".join(map(str, self.negative_examples)))
+
+                # Stop evaluating a row as soon as it cannot meet the minimum specificity anymore.
+                # Rows that conjunctions might rescue are evaluated completely afterward.
+                max_true_results = self._max_true_results_for_specificity()
+                precision_truth_table = TruthTable([
+                    TruthTableRow(row.formula, self.negative_examples)
+                    for row in recall_truth_table
+                ]).evaluate(
+                    self.graph,
+                    # rows_parallel=True
+                    evaluation_pool=evaluation_pool,
+                    max_true_results=max_true_results,
+                    evaluation_cache=evaluation_cache,
+                )
+
+                assert len(precision_truth_table) == len(recall_truth_table)
+
+                if max_true_results is not None:
+                    self._complete_rescuable_precision_rows(
+                        recall_truth_table, precision_truth_table, max_true_results, evaluation_pool, evaluation_cache)
+        finally:
+            if owns_evaluation_pool:
+                self.close_evaluation_pool()
+
+            if evaluation_cache is not None:
+                logger.info(
+                    "Evaluation cache: %d hits, %d misses (hit rate %.2f).",
+                    evaluation_cache.hits, evaluation_cache.misses, evaluation_cache.hit_rate())
+                evaluation_cache.close()
 
-            precision_truth_table = TruthTable([
-                TruthTableRow(row.formula, self.negative_examples)
-                for row in recall_truth_table
-            ]).evaluate(
-                self.graph,
-                # rows_parallel=True
-            )
+        assert not self.negative_examples or precision_truth_table is not None
 
-            assert len(precision_truth_table) == len(recall_truth_table)
+        return recall_truth_table, precision_truth_table
 
+    def _combine_and_score(
+            self,
+            recall_truth_table: 'TruthTable',
+            precision_truth_table: Optional['TruthTable'],
+            ensure_unique_var_names: bool = True) -> Dict[language.Formula, Tuple[float, float]]:
+        """Builds Boolean combinations from the rows of the truth tables, which are modified
+        in the process, and returns all invariants meeting the recall and specificity
+        requirements together with their (specificity, recall) scores."""
         assert not self.negative_examples or precision_truth_table is not None
 
         invariants = {
@@ -444,49 +800,36 @@ class InvariantLearner:
             disjunctive_recall_truthtable = copy.deepcopy(recall_truth_table)
             assert precision_truth_table is None or len(disjunctive_recall_truthtable) == len(precision_truth_table)
 
+            # Combinations are scored on the bit sets of the rows; formulas are only
+            # built for the combinations passing all thresholds.
+            recall_combinations = CombinationEngine(
+                [row.bits for row in recall_truth_table], len(self.positive_examples))
+            precision_rows = None if precision_truth_table is None else list(precision_truth_table)
+
             for level in range(2, self.max_disjunction_size + 1):
                 assert precision_truth_table is None or len(disjunctive_recall_truthtable) == len(precision_truth_table)
                 logger.debug(f"Disjunction size: {level}")
 
-                for rows_with_indices in itertools.combinations(enumerate(recall_truth_table), level):
-                    assert (precision_truth_table is None or
-                            len(disjunctive_recall_truthtable) == len(precision_truth_table))
-                    assert (precision_truth_table is None or
-                            all(rwi[1].formula == precision_truth_table[rwi[0]].formula for rwi in rows_with_indices))
-
-                    max_num_negations = level // 2 if self.include_negations_in_disjunctions else 0
-                    for formulas_to_negate in (
-                            t for t in itertools.product(*[[0, 1] for _ in range(3)]) if sum(t) <= max_num_negations):
-
-                        # To ensure that only "meaningful" properties are negated, the un-negated properties
-                        # should hold for at least 20% of all inputs; but at most for 80%, since otherwise,
-                        # the negation is overly specific.
-                        negated_rows: List[Tuple[int, TruthTableRow]] = list(
-                            itertools.compress(rows_with_indices, formulas_to_negate))
-                        if any(.8 < negated_row.eval_result() < .2 for _, negated_row in negated_rows):
-                            continue
-
-                        recall_table_rows = [
-                            -row if bool(negate) else row
-                            for negate, (_, row) in zip(formulas_to_negate, rows_with_indices)]
+                max_num_negations = level // 2 if self.include_negations_in_disjunctions else 0
+                for indices, negations in recall_combinations.disjunctions(
+                        level, self.min_recall, max_num_negations):
+                    assert (precision_rows is None or
+                            all(recall_truth_table[idx].formula == precision_rows[idx].formula for idx in indices))
 
-                        # Compute recall of disjunction, add if above threshold and
-                        # an improvement over all participants of the disjunction
-                        disjunction = functools.reduce(TruthTableRow.__or__, recall_table_rows)
-                        new_recall = disjunction.eval_result()
-                        if (new_recall < self.min_recall or
-                                not all(new_recall > row.eval_result() for row in recall_table_rows)):
-                            continue
+                    disjunctive_recall_truthtable.append(functools.reduce(TruthTableRow.__or__, [
+                        -recall_truth_table[idx] if negate else recall_truth_table[idx]
+                        for idx, negate in zip(indices, negations)]))
 
-                        disjunctive_recall_truthtable.append(disjunction)
+                    if precision_truth_table is not None:
+                        # Also add disjunction to the precision truth table. Saves us a couple of evaluations.
+                        precision_truth_table.append(functools.reduce(TruthTableRow.__or__, [
+                            -precision_rows[idx] if negate else precision_rows[idx]
+                            for idx, negate in zip(indices, negations)]))
 
-                        if precision_truth_table is not None:
-                            # Also add disjunction to the precision truth table. Saves us a couple of evaluations.
-                            precision_table_rows = [
-                                -precision_truth_table[idx] if bool(negate) else precision_truth_table[idx]
-                                for negate, (idx, _) in zip(formulas_to_negate, rows_with_indices)]
-                            disjunction = functools.reduce(TruthTableRow.__or__, precision_table_rows)
-                            precision_truth_table.append(disjunction)
+            logger.debug(
+                "Scored %d disjunctions, pruned %d subsumed or column-duplicate ones.",
+                recall_combinations.num_scored,
+                recall_combinations.num_pruned)
 
             recall_truth_table = disjunctive_recall_truthtable
 
@@ -520,41 +863,32 @@ class InvariantLearner:
                 if row.eval_result() >= self.min_recall
             }
 
-        indices_to_remove = list(reversed([
-            idx for idx, row in enumerate(recall_truth_table)
-            if row.eval_result() < self.min_recall]))
-        assert sorted(indices_to_remove, reverse=True) == indices_to_remove
-        for idx in indices_to_remove:
-            recall_truth_table.remove(recall_truth_table[idx])
-            precision_truth_table.remove(precision_truth_table[idx])
+        meets_recall = [row.eval_result() >= self.min_recall for row in recall_truth_table]
+        recall_truth_table.retain(meets_recall)
+        precision_truth_table.retain(meets_recall)
 
         logger.info("Calculating precision of Boolean combinations.")
-        conjunctive_precision_truthtable = copy.copy(precision_truth_table)
+        conjunctive_precision_truthtable = copy.deepcopy(precision_truth_table)
+        precision_combinations = CombinationEngine(
+            [row.bits for row in precision_truth_table], len(self.negative_examples))
         for level in range(2, self.max_conjunction_size + 1):
             logger.debug(f"Conjunction size: {level}")
             assert len(recall_truth_table) == len(conjunctive_precision_truthtable)
-            for rows_with_indices in itertools.combinations(enumerate(precision_truth_table), level):
-                precision_table_rows = [row for (_, row) in rows_with_indices]
-
+            for indices in precision_combinations.conjunctions(level, self.min_specificity):
                 # Only consider combinations where all rows meet minimum recall requirement.
                 # Recall doesn't get better by forming conjunctions!
-                if any(recall_truth_table[idx].eval_result() < self.min_recall
-                       for idx, _ in rows_with_indices):
+                if any(recall_truth_table[idx].eval_result() < self.min_recall for idx in indices):
                     continue
 
-                # Compute precision of conjunction, add if above threshold and
-                # an improvement over all participants of the conjunction
-                conjunction = functools.reduce(TruthTableRow.__and__, precision_table_rows)
-                new_precision = 1 - conjunction.eval_result()
-                if (new_precision < self.min_specificity or
-                        not all(new_precision > 1 - row.eval_result() for row in precision_table_rows)):
-                    continue
-
-                conjunctive_precision_truthtable.append(conjunction)
+                conjunctive_precision_truthtable.append(functools.reduce(
+                    TruthTableRow.__and__, [precision_truth_table[idx] for idx in indices]))
+                recall_truth_table.append(functools.reduce(
+                    TruthTableRow.__and__, [recall_truth_table[idx] for idx in indices]))
 
-                recall_table_rows = [recall_truth_table[idx] for idx, _ in rows_with_indices]
-                conjunction = functools.reduce(TruthTableRow.__and__, recall_table_rows)
-                recall_truth_table.append(conjunction)
+        logger.debug(
+            "Scored %d conjunctions, pruned %d subsumed or column-duplicate ones.",
+            precision_combinations.num_scored,
+            precision_combinations.num_pruned)
 
         precision_truth_table = conjunctive_precision_truthtable
 
@@ -587,121 +921,417 @@ class InvariantLearner:
                         key=lambda p: (p[1], -len(p[0])),
                         reverse=True)))
 
+    def _max_true_results_for_specificity(self) -> Optional[int]:
+        """Returns the maximum number of negative examples for which a formula may hold while
+        still meeting the minimum specificity, or None if precision rows have to be evaluated
+        completely. This is the case if both disjunctions and conjunctions are formed: Then,
+        a disjunction with imprecise participants could be rescued by a conjunction. It is also
+        the case if disjunctions may contain negations, since the negation of a row whose
+        evaluation stopped early would hold for all negative examples that were not evaluated."""
+        if self.max_disjunction_size > 1 and (self.max_conjunction_size > 1 or self.include_negations_in_disjunctions):
+            return None
+
+        num_negative_examples = len(self.negative_examples)
+        return max(
+            (num_true for num_true in range(num_negative_examples + 1)
+             if 1 - num_true / num_negative_examples >= self.min_specificity),
+            default=-1)
+
+    def _complete_rescuable_precision_rows(
+            self,
+            recall_truth_table: 'TruthTable',
+            precision_truth_table: 'TruthTable',
+            max_true_results: int,
+            evaluation_pool: Optional[EvaluationPool] = None,
+            evaluation_cache: Optional[EvaluationCache] = None) -> None:
+        """Completes the evaluation of precision rows whose evaluation stopped early, but which
+        might still become part of a result by a conjunction. A conjunction can only be a result
+        if its recall meets the minimum requirement, which is at most the recall of any pair of
+        its participants; we thus complete rows with a partner yielding a sufficient recall."""
+        decided_rows = [idx for idx, row in enumerate(precision_truth_table) if row.num_true > max_true_results]
+        if self.max_conjunction_size < 2:
+            logger.debug(
+                "Stopped precision evaluation early for %d of %d rows.",
+                len(decided_rows), len(precision_truth_table))
+            return
+
+        num_positive_examples = len(self.positive_examples)
+        recall_bits = [row.bits for row in recall_truth_table]
+        rescuable_rows = [
+            precision_truth_table[idx] for idx in decided_rows
+            if any((recall_bits[idx] & other_bits).bit_count() / num_positive_examples >= self.min_recall
+                   for other_idx, other_bits in enumerate(recall_bits)
+                   if other_idx != idx)]
+
+        TruthTable(rescuable_rows).evaluate(
+            self.graph, evaluation_pool=evaluation_pool, evaluation_cache=evaluation_cache)
+
+        logger.debug(
+            "Stopped precision evaluation early for %d of %d rows, completed %d rows possibly rescued by conjunctions.",
+            len(decided_rows), len(precision_truth_table), len(rescuable_rows))
+
+    def _get_recall_input_ordering(self) -> Optional[FalsifierFirstOrdering]:
+        """
+        Returns the falsifier-first ordering of the positive examples, which is kept across
+        calls to `learn_invariants` and reset if the number of positive examples changes.
+        Orderings are only useful for lazy evaluation, i.e., if no disjunctions are learned.
+        """
+
+        if not self.falsifier_first_ordering or self.max_disjunction_size >= 2:
+            return None
+
+        if (self.recall_input_ordering is None or
+                self.recall_input_ordering.num_inputs != len(self.positive_examples)):
+            self.recall_input_ordering = FalsifierFirstOrdering(len(self.positive_examples))
+
+        return self.recall_input_ordering
+
+    def _get_evaluation_pool(self) -> Optional[EvaluationPool]:
+        """Returns a pool of worker processes holding the current positive and negative examples,
+        or None if evaluation should be sequential. The pool is only restarted if the examples
+        changed since it was created."""
+        if self.num_evaluation_processes <= 1:
+            return None
+
+        if (self.evaluation_pool is not None and
+                self.evaluation_pool.corpus_of(self.positive_examples) == "positive" and
+                self.evaluation_pool.corpus_of(self.negative_examples) == "negative"):
+            return self.evaluation_pool
+
+        self.close_evaluation_pool()
+        self.evaluation_pool = EvaluationPool(
+            self.grammar,
+            {"positive": self.positive_examples, "negative": self.negative_examples},
+            processes=self.num_evaluation_processes)
+
+        return self.evaluation_pool
+
+    def close_evaluation_pool(self) -> None:
+        if self.evaluation_pool is not None:
+            self.evaluation_pool.close()
+            self.evaluation_pool = None
+
     def generate_candidates(
             self,
             patterns: Iterable[language.Formula | str],
             inputs: Iterable[language.DerivationTree]) -> Set[language.Formula]:
+        inputs = list(inputs)
         input_reachability_relation = create_input_reachability_relation(inputs)
 
         logger.debug("Computed input reachability relation of size %d", len(input_reachability_relation))
 
-        filters: List[PatternInstantiationFilter] = [
-            NonterminalStringInCountPredicatesFilter(self.graph, input_reachability_relation),
-        ]
-
         patterns = [
             parse_abstract_isla(pattern, self.grammar) if isinstance(pattern, str)
             else pattern
             for pattern in patterns]
 
-        tries: List[datrie.Trie] = [inp.trie().trie for inp in inputs]
+        if self.generation_budget is not None:
+            # Budgets are spent by the (sequential) streaming generator; see `__init__`.
+            self.generation_budget.restart()
+            return set(self.iterate_candidates(patterns, inputs, self.generation_budget))
 
-        result: Set[language.Formula] = set([])
+        if self.num_generation_processes > 1 and len(patterns) > 1:
+            return self.__generate_candidates_in_parallel(patterns, inputs, input_reachability_relation)
+
+        filters = self._instantiation_filters(input_reachability_relation)
+        tree_indices: List[TreeIndex] = [TreeIndex(inp) for inp in inputs]
+        memo = ApproximateEvaluationMemo()
 
-        for pattern in patterns:
+        representatives: Dict[str, language.Formula] = {}
+        self.num_collapsed_candidates = []
+        self.num_pruned_instantiation_branches = 0
+
+        for pattern_idx, pattern in enumerate(patterns):
+            start_time = time.time()
             logger.debug("Instantiating pattern\n%s", AbstractISLaUnparser(pattern).unparse())
             set_smt_auto_eval(pattern, False)
 
             # Instantiate various placeholder variables:
             # 1. Nonterminal placeholders
-            pattern_insts_without_nonterminal_placeholders = self._instantiate_nonterminal_placeholders(
-                pattern, input_reachability_relation)
+            partial_instantiations = self._instantiate_nonterminal_placeholders(
+                pattern, input_reachability_relation, tree_indices=tree_indices)
+            logger.debug("Found %d instantiations of pattern meeting quantifier requirements "
+                         "(%d branches pruned so far)",
+                         len(partial_instantiations), self.num_pruned_instantiation_branches)
 
-            logger.debug("Found %d instantiations of pattern meeting quantifier requirements",
-                         len(pattern_insts_without_nonterminal_placeholders))
+            candidates = self._complete_partial_instantiations(
+                pattern, partial_instantiations, filters, tree_indices, memo)
+            self.num_collapsed_candidates.append(add_representatives(representatives, candidates))
 
-            # NOTE: At this point, filtering is not useful. It is cheaper to first instantiate
-            #       match expressions (if any), which reduces the search space, and to filter then.
-            # pattern_insts_without_nonterminal_placeholders = self._filter_partial_instantiations(
-            #     pattern_insts_without_nonterminal_placeholders, tries)
-            # logger.debug("%d instantiations remain after filtering",
-            #              len(pattern_insts_without_nonterminal_placeholders))
+            logger.info(
+                "Pattern %d of %d: %d candidates (%d collapsed with equivalent ones) in %.2f seconds.",
+                pattern_idx + 1, len(patterns), len(candidates), self.num_collapsed_candidates[-1],
+                time.time() - start_time)
 
-            # 2. Match expression placeholders
-            pattern_insts_without_mexpr_placeholders = self._instantiate_mexpr_placeholders(
-                pattern_insts_without_nonterminal_placeholders)
+        self.__log_memo_hit_rates(memo)
+        return set(representatives.values())
 
-            logger.debug("Found %d instantiations of pattern after instantiating match expression placeholders",
-                         len(pattern_insts_without_mexpr_placeholders))
+    def iterate_candidates(
+            self,
+            patterns: Iterable[language.Formula | str],
+            inputs: Iterable[language.DerivationTree],
+            budget: Optional[GenerationBudget] = None) -> Iterator[language.Formula]:
+        """
+        Yields the candidates of `generate_candidates` lazily, pattern by pattern. Within a pattern,
+        partial instantiations are completed in the order of `instantiation_priority`. Of equivalent
+        candidates (see `islearn.canonical_form`), only the first one is yielded. If a budget is
+        passed, instantiating a pattern stops as soon as the budget of the pattern is spent, and
+        the remaining patterns are skipped as soon as the global budget is spent.
+        """
+
+        inputs = list(inputs)
+        input_reachability_relation = create_input_reachability_relation(inputs)
+        patterns = [
+            parse_abstract_isla(pattern, self.grammar) if isinstance(pattern, str)
+            else pattern
+            for pattern in patterns]
 
-            pattern_insts_without_mexpr_placeholders = self._filter_partial_instantiations(
-                pattern_insts_without_mexpr_placeholders, tries)
-            logger.debug("%d instantiations remain after filtering",
-                         len(pattern_insts_without_mexpr_placeholders))
+        filters = self._instantiation_filters(input_reachability_relation)
+        tree_indices: List[TreeIndex] = [TreeIndex(inp) for inp in inputs]
+        memo = ApproximateEvaluationMemo()
+        stop = None if budget is None else budget.pattern_exhausted
+
+        canonical_keys: Set[str] = set()
+        self.num_collapsed_candidates = []
+        self.num_pruned_instantiation_branches = 0
+
+        for pattern_idx, pattern in enumerate(patterns):
+            if budget is not None:
+                if budget.exhausted():
+                    logger.info(
+                        "Candidate generation budget spent, skipping patterns %d to %d.",
+                        pattern_idx + 1, len(patterns))
+                    budget.truncated_patterns.extend(range(pattern_idx, len(patterns)))
+                    break
 
-            # 3. Special string placeholders in predicates.
-            #    This comprises, e.g., `nth(<STRING>, elem, container`.
-            pattern_insts_without_special_string_placeholders = \
-                self.__instantiate_special_predicate_string_placeholders(
-                    pattern_insts_without_mexpr_placeholders, tries)
+                budget.start_pattern()
 
-            logger.debug("Found %d instantiations of pattern after instantiating special predicate string placeholders",
-                         len(pattern_insts_without_special_string_placeholders))
+            start_time = time.time()
+            set_smt_auto_eval(pattern, False)
+            partial_instantiations = self._instantiate_nonterminal_placeholders(
+                pattern, input_reachability_relation, tree_indices=tree_indices)
+
+            num_candidates = 0
+            self.num_collapsed_candidates.append(0)
+            for candidate in self._iterate_completed_instantiations(
+                    pattern, partial_instantiations, filters, tree_indices, memo, stop):
+                key = canonical_key(candidate)
+                if key in canonical_keys:
+                    self.num_collapsed_candidates[-1] += 1
+                    continue
 
-            if pattern_insts_without_special_string_placeholders != pattern_insts_without_mexpr_placeholders:
-                pattern_insts_without_special_string_placeholders = self._filter_partial_instantiations(
-                    pattern_insts_without_special_string_placeholders, tries)
-                logger.debug("%d instantiations remain after filtering",
-                             len(pattern_insts_without_special_string_placeholders))
+                canonical_keys.add(key)
+                num_candidates += 1
+                if budget is not None:
+                    budget.spend()
 
-            # 4. Nonterminal-String placeholders
-            pattern_insts_without_nonterminal_string_placeholders = self._instantiate_nonterminal_string_placeholders(
-                pattern_insts_without_special_string_placeholders)
+                yield candidate
 
-            pattern_insts_without_nonterminal_string_placeholders = self._apply_filters(
-                pattern_insts_without_nonterminal_string_placeholders, filters, 1, tries)
+                if budget is not None and budget.pattern_exhausted():
+                    break
 
-            logger.debug("Found %d instantiations of pattern after instantiating nonterminal string placeholders",
-                         len(pattern_insts_without_nonterminal_string_placeholders))
+            logger.info(
+                "Pattern %d of %d: %d candidates (%d collapsed with equivalent ones) in %.2f seconds.",
+                pattern_idx + 1, len(patterns), num_candidates, self.num_collapsed_candidates[-1],
+                time.time() - start_time)
 
-            if (pattern_insts_without_special_string_placeholders !=
-                    pattern_insts_without_nonterminal_string_placeholders):
-                pattern_insts_without_nonterminal_string_placeholders = self._filter_partial_instantiations(
-                    pattern_insts_without_nonterminal_string_placeholders, tries)
-                logger.debug("%d instantiations remain after filtering",
-                             len(pattern_insts_without_nonterminal_string_placeholders))
+            if budget is not None and budget.pattern_exhausted():
+                logger.info(
+                    "Pattern %d of %d truncated after %d candidates: candidate generation budget spent.",
+                    pattern_idx + 1, len(patterns), num_candidates)
+                budget.truncated_patterns.append(pattern_idx)
 
-            # 5. String placeholders
-            if not any(isinstance(ph, StringPlaceholderVariableTypes) for ph in get_placeholders(pattern)):
-                pattern_insts_without_string_placeholders = pattern_insts_without_nonterminal_string_placeholders
-            else:
-                pattern_insts_without_string_placeholders = self._instantiate_string_placeholders(
-                    pattern_insts_without_nonterminal_string_placeholders, tries)
+        self.__log_memo_hit_rates(memo)
 
-                logger.debug("Found %d instantiations of pattern after instantiating string placeholders",
-                             len(pattern_insts_without_string_placeholders))
+    def __generate_candidates_in_parallel(
+            self,
+            patterns: List[language.Formula],
+            inputs: List[language.DerivationTree],
+            input_reachability_relation: Set[Tuple[str, str]]) -> Set[language.Formula]:
+        """
+        Instantiates the patterns in a pool of `num_generation_processes` workers. The learner,
+        the patterns, the inputs, and the input reachability relation are passed to each worker
+        once; the workers build the tree indices and filters themselves. Tasks address patterns by their
+        indices, and workers compute the instantiations of nonterminal placeholders themselves,
+        such that only complete candidates are transferred. A first round of tasks determines the
+        numbers of partial instantiations; in a second round, chunks of these are completed.
+        Results are merged in the order of patterns and chunks.
+        """
+
+        make_formulas_picklable()
+        with pmp.Pool(
+                processes=self.num_generation_processes,
+                initializer=_initialize_generation_worker,
+                initargs=(self, patterns, inputs, input_reachability_relation)) as pool:
+            nonterminal_results: List[Tuple[int, float, int]] = pool.map(
+                _instantiate_nonterminal_placeholders_in_worker, range(len(patterns)))
+
+            tasks: List[Tuple[int, int, int]] = []
+            for pattern_idx, (num_partial_instantiations, _, _) in enumerate(nonterminal_results):
+                logger.debug("Found %d instantiations of pattern %d meeting quantifier requirements",
+                             num_partial_instantiations, pattern_idx + 1)
+                for chunk_start in range(0, num_partial_instantiations, GENERATION_CHUNK_SIZE):
+                    tasks.append((pattern_idx, chunk_start, chunk_start + GENERATION_CHUNK_SIZE))
+
+            chunk_results: List[Tuple[Set[language.Formula], float, Tuple[int, int, int, int]]] = pool.map(
+                _complete_partial_instantiations_in_worker, tasks)
+
+        candidates_per_pattern: List[Set[language.Formula]] = [set([]) for _ in patterns]
+        seconds_per_pattern: List[float] = [seconds for _, seconds, _ in nonterminal_results]
+        self.num_pruned_instantiation_branches = sum(num_pruned for _, _, num_pruned in nonterminal_results)
+        memo = ApproximateEvaluationMemo()
+        for (pattern_idx, _, _), (candidates, seconds, memo_statistics) in zip(tasks, chunk_results):
+            candidates_per_pattern[pattern_idx].update(candidates)
+            seconds_per_pattern[pattern_idx] += seconds
+            memo.add_statistics(memo_statistics)
+
+        representatives: Dict[str, language.Formula] = {}
+        self.num_collapsed_candidates = []
+        for pattern_idx, candidates in enumerate(candidates_per_pattern):
+            self.num_collapsed_candidates.append(add_representatives(representatives, candidates))
+            logger.info(
+                "Pattern %d of %d: %d candidates (%d collapsed with equivalent ones) in %.2f seconds (in %d workers).",
+                pattern_idx + 1, len(patterns), len(candidates), self.num_collapsed_candidates[-1],
+                seconds_per_pattern[pattern_idx], self.num_generation_processes)
 
-            assert all(not get_placeholders(candidate)
-                       for candidate in pattern_insts_without_string_placeholders)
+        self.__log_memo_hit_rates(memo)
+        return set(representatives.values())
 
-            result.update(pattern_insts_without_string_placeholders)
+    @staticmethod
+    def __log_memo_hit_rates(memo: 'ApproximateEvaluationMemo') -> None:
+        logger.info(
+            "Approximate evaluation hit rates: %.2f for quantifier matches, %.2f for quantified formulas.",
+            memo.match_hit_rate(), memo.truth_value_hit_rate())
 
-        return result
+    def _instantiation_filters(
+            self,
+            input_reachability_relation: Set[Tuple[str, str]]) -> List['PatternInstantiationFilter']:
+        return [
+            NonterminalStringInCountPredicatesFilter(self.graph, input_reachability_relation),
+        ]
+
+    def _complete_partial_instantiations(
+            self,
+            pattern: language.Formula,
+            pattern_insts_without_nonterminal_placeholders: Iterable[language.Formula],
+            filters: List['PatternInstantiationFilter'],
+            tree_indices: List[TreeIndex],
+            memo: Optional['ApproximateEvaluationMemo'] = None) -> Set[language.Formula]:
+        """Instantiates all remaining placeholders of instantiations of `pattern` whose
+        nonterminal placeholders are already instantiated. Results of approximate evaluations
+        are memoized in `memo`, if given."""
+        return set(self._iterate_completed_instantiations(
+            pattern, pattern_insts_without_nonterminal_placeholders, filters, tree_indices, memo))
+
+    def _iterate_completed_instantiations(
+            self,
+            pattern: language.Formula,
+            pattern_insts_without_nonterminal_placeholders: Iterable[language.Formula],
+            filters: List['PatternInstantiationFilter'],
+            tree_indices: List[TreeIndex],
+            memo: Optional['ApproximateEvaluationMemo'] = None,
+            stop: Optional[Callable[[], bool]] = None) -> Iterator[language.Formula]:
+        """Like `_complete_partial_instantiations`, but yields the candidates lazily. String
+        placeholders, whose instantiation is the most expensive stage, are instantiated in the
+        order of `instantiation_priority`. Stops as soon as `stop` (if any) returns True."""
+        pattern_insts_without_nonterminal_placeholders = set(pattern_insts_without_nonterminal_placeholders)
+
+        # NOTE: At this point, filtering is not useful. It is cheaper to first instantiate
+        #       match expressions (if any), which reduces the search space, and to filter then.
+        # pattern_insts_without_nonterminal_placeholders = self._filter_partial_instantiations(
+        #     pattern_insts_without_nonterminal_placeholders, tree_indices)
+        # logger.debug("%d instantiations remain after filtering",
+        #              len(pattern_insts_without_nonterminal_placeholders))
+
+        # 2. Match expression placeholders
+        pattern_insts_without_mexpr_placeholders = self._instantiate_mexpr_placeholders(
+            pattern_insts_without_nonterminal_placeholders)
+
+        logger.debug("Found %d instantiations of pattern after instantiating match expression placeholders",
+                     len(pattern_insts_without_mexpr_placeholders))
+
+        pattern_insts_without_mexpr_placeholders = self._filter_partial_instantiations(
+            pattern_insts_without_mexpr_placeholders, tree_indices, memo)
+        logger.debug("%d instantiations remain after filtering",
+                     len(pattern_insts_without_mexpr_placeholders))
+
+        if stop is not None and stop():
+            return
+
+        # 3. Special string placeholders in predicates.
+        #    This comprises, e.g., `nth(<STRING>, elem, container`.
+        pattern_insts_without_special_string_placeholders = \
+            self.__instantiate_special_predicate_string_placeholders(
+                pattern_insts_without_mexpr_placeholders, tree_indices)
+
+        logger.debug("Found %d instantiations of pattern after instantiating special predicate string placeholders",
+                     len(pattern_insts_without_special_string_placeholders))
+
+        if pattern_insts_without_special_string_placeholders != pattern_insts_without_mexpr_placeholders:
+            pattern_insts_without_special_string_placeholders = self._filter_partial_instantiations(
+                pattern_insts_without_special_string_placeholders, tree_indices, memo)
+            logger.debug("%d instantiations remain after filtering",
+                         len(pattern_insts_without_special_string_placeholders))
+
+        if stop is not None and stop():
+            return
+
+        # 4. Nonterminal-String placeholders
+        pattern_insts_without_nonterminal_string_placeholders = self._instantiate_nonterminal_string_placeholders(
+            pattern_insts_without_special_string_placeholders)
+
+        pattern_insts_without_nonterminal_string_placeholders = self._apply_filters(
+            pattern_insts_without_nonterminal_string_placeholders, filters, 1, tree_indices)
+
+        logger.debug("Found %d instantiations of pattern after instantiating nonterminal string placeholders",
+                     len(pattern_insts_without_nonterminal_string_placeholders))
+
+        if (pattern_insts_without_special_string_placeholders !=
+                pattern_insts_without_nonterminal_string_placeholders):
+            pattern_insts_without_nonterminal_string_placeholders = self._filter_partial_instantiations(
+                pattern_insts_without_nonterminal_string_placeholders, tree_indices, memo)
+            logger.debug("%d instantiations remain after filtering",
+                         len(pattern_insts_without_nonterminal_string_placeholders))
+
+        # 5. String placeholders
+        partial_instantiations = sorted(
+            pattern_insts_without_nonterminal_string_placeholders, key=instantiation_priority)
+
+        if not any(isinstance(ph, StringPlaceholderVariableTypes) for ph in get_placeholders(pattern)):
+            for candidate in partial_instantiations:
+                if stop is not None and stop():
+                    return
+                assert not get_placeholders(candidate)
+                yield candidate
+            return
+
+        string_placeholder_insts = self._get_string_placeholder_instantiations(
+            set(partial_instantiations), tree_indices)
+        for formula in partial_instantiations:
+            if formula not in string_placeholder_insts:
+                continue
+            for candidate in self._iterate_string_placeholder_instantiations(
+                    formula, string_placeholder_insts[formula], tree_indices, memo, stop):
+                assert not get_placeholders(candidate)
+                yield candidate
 
     def _filter_partial_instantiations(
             self,
             formulas: Iterable[language.Formula],
-            tries: Iterable[datrie.Trie]) -> Set[language.Formula]:
+            tree_indices: Iterable[TreeIndex | datrie.Trie],
+            memo: Optional['ApproximateEvaluationMemo'] = None) -> Set[language.Formula]:
         result: Set[language.Formula] = set()
+        tree_indices = [TreeIndex.of(tree_index) for tree_index in tree_indices]
 
         for pattern in formulas:
-            for trie in tries:
+            for tree_index in tree_indices:
                 if not approximately_evaluate_abst_for(
                         pattern,
                         self.grammar,
                         self.graph,
-                        {language.Constant("start", "<start>"): trie[path_to_trie_key(())]},
-                        trie).is_false():
+                        {language.Constant("start", "<start>"): tree_index.node(0)},
+                        tree_index,
+                        memo).is_false():
                     result.add(pattern)
                     break
 
@@ -712,7 +1342,7 @@ class InvariantLearner:
             formulas: Set[language.Formula],
             filters: List['PatternInstantiationFilter'],
             order: int,
-            tries: List[datrie.Trie],
+            tree_indices: List[TreeIndex],
             parallel: bool = False) -> Set[language.Formula]:
         # TODO: Check when parallel evaluation makes sense. In some cases, like
         #       "test_learn_from_islearn_patterns_file," the overhead of parallel
@@ -726,7 +1356,7 @@ class InvariantLearner:
 
                 with pmp.ProcessingPool(processes=pmp.cpu_count()) as pool:
                     eval_results = list(pool.map(
-                        lambda pattern_inst: int(pattern_filter.predicate(pattern_inst, tries)),
+                        lambda pattern_inst: int(pattern_filter.predicate(pattern_inst, tree_indices)),
                         formulas,
                     ))
 
@@ -734,7 +1364,7 @@ class InvariantLearner:
             else:
                 formulas = {
                     pattern_inst for pattern_inst in formulas
-                    if pattern_filter.predicate(pattern_inst, tries)
+                    if pattern_filter.predicate(pattern_inst, tree_indices)
                 }
 
             logger.debug("%d instantiations remaining after filter '%s'",
@@ -764,17 +1394,25 @@ class InvariantLearner:
         assert len(self.positive_examples) > 0, "Cannot learn without any positive examples!"
         pe_before = len(self.positive_examples)
         ne_before = len(self.negative_examples)
-        mutation_fuzzer = MutationFuzzer(self.grammar, self.positive_examples, self.prop, k=self.k)
-        for inp in mutation_fuzzer.run(
-                num_iterations=min(
-                    30,
-                    max(self.target_number_positive_samples - pe_before, 30),
-                    max(self.target_number_negative_samples - ne_before, 30)
-                ),
-                alpha=.1, yield_negative=True):
-            if self.prop(inp) and not tree_in(inp, self.positive_examples):
+        num_iterations = min(
+            30,
+            max(self.target_number_positive_samples - pe_before, 30),
+            max(self.target_number_negative_samples - ne_before, 30)
+        )
+        if self.num_fuzzing_workers > 1:
+            mutation_fuzzer = ParallelMutationFuzzer(
+                self.grammar, self.positive_examples, self.prop, k=self.k, num_workers=self.num_fuzzing_workers)
+            mutated_inputs = mutation_fuzzer.run(num_iterations=num_iterations, alpha=.1, yield_negative=True)
+        else:
+            mutation_fuzzer = MutationFuzzer(self.grammar, self.positive_examples, self.prop, k=self.k)
+            mutated_inputs = mutation_fuzzer.run(
+                num_iterations=num_iterations, alpha=.1, yield_negative=True, jobs=self.num_fuzzing_jobs)
+
+        for inp in mutated_inputs:
+            verdict = self.prop(inp)
+            if verdict and not tree_in(inp, self.positive_examples):
                 self.positive_examples.append(inp)
-            elif not self.prop(inp) and not tree_in(inp, self.negative_examples):
+            elif not verdict and not tree_in(inp, self.negative_examples):
                 self.negative_examples.append(inp)
 
         logger.info(
@@ -834,14 +1472,16 @@ class InvariantLearner:
             while ((len(self.positive_examples) < self.target_number_positive_samples
                     or len(self.negative_examples) < self.target_number_negative_samples)
                    and i < num_tries):
-                i += 1
-
-                inp = fuzzer.expand_tree(language.DerivationTree("<start>", None))
+                # Asynchronous properties check several inputs concurrently
+                num_inputs = min(self.prop.max_concurrency if self.prop.is_async else 1, num_tries - i)
+                i += num_inputs
 
-                if self.prop(inp) and not tree_in(inp, self.positive_examples):
-                    self.positive_examples.append(inp)
-                elif not self.prop(inp) and not tree_in(inp, self.negative_examples):
-                    self.negative_examples.append(inp)
+                inputs = [fuzzer.expand_tree(language.DerivationTree("<start>", None)) for _ in range(num_inputs)]
+                for inp, verdict in zip(inputs, self.prop.check_all(inputs)):
+                    if verdict and not tree_in(inp, self.positive_examples):
+                        self.positive_examples.append(inp)
+                    elif not verdict and not tree_in(inp, self.negative_examples):
+                        self.negative_examples.append(inp)
 
     def _generate_counter_examples_from_formulas(
             self,
@@ -930,12 +1570,14 @@ class InvariantLearner:
             self,
             pattern: language.Formula,
             input_reachability_relation: Set[Tuple[str, str]],
-            _instantiations: Optional[List[Dict[NonterminalPlaceholderVariable, language.BoundVariable]]] = None
+            _instantiations: Optional[List[Dict[NonterminalPlaceholderVariable, language.BoundVariable]]] = None,
+            tree_indices: Optional[List[TreeIndex]] = None
     ) -> Set[language.Formula]:
         if _instantiations:
             instantiations = _instantiations
         else:
-            instantiations = self._instantiations_for_placeholder_variables(pattern, input_reachability_relation)
+            instantiations = self._instantiations_for_placeholder_variables(
+                pattern, input_reachability_relation, tree_indices)
 
         result: Set[language.Formula] = {
             pattern.substitute_variables(instantiation)
@@ -947,8 +1589,25 @@ class InvariantLearner:
     def _instantiations_for_placeholder_variables(
             self,
             pattern: language.Formula,
-            input_reachability_relation: Set[Tuple[str, str]]
+            input_reachability_relation: Set[Tuple[str, str]],
+            tree_indices: Optional[List[TreeIndex]] = None
     ) -> List[Dict[NonterminalPlaceholderVariable, language.BoundVariable]]:
+        """
+        Instantiates the nonterminal placeholders of `pattern` with nonterminals reachable (in the
+        inputs) from the instantiations of their parent variables. If the indices of the inputs are
+        passed in `tree_indices`, branches of the search which cannot yield a candidate are pruned
+        as soon as the children of a variable are instantiated:
+
+        1. The nonterminals of the variables of a match expression placeholder have to be derivable,
+           in that order, from the nonterminal of the quantified variable (see `_infer_mexpr`);
+           otherwise, no match expression can be inferred.
+        2. The variables of `necessary_quantified_variables(pattern)` have to be embeddable into
+           one of the inputs: Some node of a variable has to contain nodes for all children of that
+           variable. Approximate evaluation considers quantifiers without matches to be false, such
+           that `_filter_partial_instantiations` would discard these instantiations anyway.
+
+        The number of pruned branches is added to `num_pruned_instantiation_branches`.
+        """
         instantiations: List[Dict[NonterminalPlaceholderVariable, language.BoundVariable]] = []
 
         in_visitor = InVisitor()
@@ -964,14 +1623,27 @@ class InvariantLearner:
         initial_tree: InstantiationTree = tree_from_paths(
             [list(reversed(chain)) for chain in variable_chains])
 
+        mexpr_variables: Dict[language.Variable, Tuple[NonterminalPlaceholderVariable, ...]] = {
+            formula.bound_variable: tuple(formula.bind_expression.bound_elements[0].variables)
+            for formula in language.FilterVisitor(
+                lambda f: (isinstance(f, language.QuantifiedFormula) and
+                           isinstance(f.bind_expression, AbstractBindExpression) and
+                           isinstance(f.bind_expression.bound_elements[0], MexprPlaceholderVariable))).collect(pattern)}
+
+        # The positions, per input, of the nodes into which the necessary variables can be embedded
+        necessary_variables = necessary_quantified_variables(pattern)
+        initial_embeddings: Dict[language.Variable, List[List[int]]] = (
+            {} if tree_indices is None else {start_const: [[0] for _ in tree_indices]})
+
         # We basically perform a BFS over the partially instantiated trees and
         # instantiate children based on the parent values.
         stack: List[Tuple[
             List[InstantiationTree],
-            Dict[NonterminalPlaceholderVariable, language.BoundVariable]]] = \
-            [([tree for _, tree in tree_paths(initial_tree)], {})]
+            Dict[NonterminalPlaceholderVariable, language.BoundVariable],
+            Dict[language.Variable, List[List[int]]]]] = \
+            [([tree for _, tree in tree_paths(initial_tree)], {}, initial_embeddings)]
         while stack:
-            remaining_subtrees, inst_map = stack.pop()
+            remaining_subtrees, inst_map, embeddings = stack.pop()
             if not remaining_subtrees:
                 instantiations.append(inst_map)
                 continue
@@ -981,7 +1653,7 @@ class InvariantLearner:
             (parent_variable, children), *remaining_subtrees = remaining_subtrees
 
             if not children:
-                stack.append((remaining_subtrees, inst_map))
+                stack.append((remaining_subtrees, inst_map, embeddings))
                 continue
 
             if isinstance(parent_variable, PlaceholderVariable):
@@ -994,12 +1666,40 @@ class InvariantLearner:
             if not reachable_nonterminals:
                 continue
 
+            necessary_children = [
+                idx for idx, child in enumerate(children)
+                if parent_variable in embeddings and child[0] in necessary_variables]
+
             for instantiation in itertools.product(*[reachable_nonterminals for _ in range(len(children))]):
                 assert all(child[0] not in inst_map for child in children)
                 child_insts = {
                     child[0]: language.BoundVariable(child[0].name, instantiation[idx])
                     for idx, child in enumerate(children)}
-                stack.append((remaining_subtrees, inst_map | child_insts))
+
+                if tree_indices is not None and parent_variable in mexpr_variables and not self._infer_mexpr(
+                        parent_instantiation,
+                        tuple(child_insts[variable].n_type for variable in mexpr_variables[parent_variable])):
+                    self.num_pruned_instantiation_branches += 1
+                    continue
+
+                child_embeddings: Dict[language.Variable, List[List[int]]] = {}
+                if necessary_children:
+                    parent_embeddings = [
+                        [pos for pos in positions
+                         if all(tree_index.count(pos, instantiation[idx]) for idx in necessary_children)]
+                        for tree_index, positions in zip(tree_indices, embeddings[parent_variable])]
+
+                    if not any(parent_embeddings):
+                        self.num_pruned_instantiation_branches += 1
+                        continue
+
+                    child_embeddings = {
+                        children[idx][0]: [
+                            tree_index.descendants_of_all(positions, instantiation[idx])
+                            for tree_index, positions in zip(tree_indices, parent_embeddings)]
+                        for idx in necessary_children}
+
+                stack.append((remaining_subtrees, inst_map | child_insts, embeddings | child_embeddings))
 
         return instantiations
 
@@ -1131,36 +1831,23 @@ class InvariantLearner:
                     continue
 
                 nonterminal_occurrences: List[Tuple[Path, ...]] = []
-                trie = trie_from_parse_tree(tree)
-                stack: List[Tuple[Tuple[Path, ...], Tuple[str], str]] = \
-                    [((), nonterminal_types, path_to_trie_key(()))]
-                while stack:
-                    matches, remaining_types, trie_key = stack.pop(0)
-                    if not remaining_types:
-                        nonterminal_occurrences.append(matches)
-
-                    cur_path, cur_tree = trie[trie_key]
-
-                    if cur_tree[0] == remaining_types[0]:
+                tree_index = TreeIndex(tree)
+                matches: Tuple[Path, ...] = ()
+                remaining_types: Tuple[str, ...] = nonterminal_types
+                pos = 0
+                while pos < len(tree_index):
+                    if tree_index.labels[pos] == remaining_types[0]:
                         remaining_types = remaining_types[1:]
-                        matches = matches + (cur_path,)
+                        matches = matches + (tree_index.paths[pos],)
 
                         if not remaining_types:
                             nonterminal_occurrences.append(matches)
-                            continue
+                            break
 
-                        # For the next trie key, skip the whole subtree of cur_path
-                        if not cur_tree[1]:
-                            next_key = next_trie_key(trie, trie_key)
-                        else:
-                            suffixes = list(filter(None, trie.suffixes(trie_key)))
-                            assert suffixes
-                            next_key = next_trie_key(trie, trie_key + suffixes[-1])
+                        # Skip the whole subtree of the match
+                        pos = tree_index.ends[pos]
                     else:
-                        next_key = next_trie_key(trie, trie_key)
-
-                    if next_key is not None:
-                        stack.append((matches, remaining_types, next_key))
+                        pos += 1
 
                 for matching_seq in nonterminal_occurrences:
                     assert len(matching_seq) == len(nonterminal_types)
@@ -1251,8 +1938,9 @@ class InvariantLearner:
     def __instantiate_special_predicate_string_placeholders(
             self,
             inst_patterns: Set[language.Formula],
-            tries: List[datrie.Trie]) -> Set[language.Formula]:
+            tree_indices: List[TreeIndex | datrie.Trie]) -> Set[language.Formula]:
         result: Set[language.Formula] = set([])
+        tree_indices = [TreeIndex.of(tree_index) for tree_index in tree_indices]
 
         for pattern in inst_patterns:
             nth_predicates = language.FilterVisitor(
@@ -1277,16 +1965,9 @@ class InvariantLearner:
                 elem_nonterminal = nth_predicate.args[1].n_type
                 container_nonterminal = nth_predicate.args[2].n_type
                 indices: Set[int] = set([])
-                for trie in tries:
-                    container_tries = [
-                        get_subtrie(trie, path_key) for path_key, (path, subtree) in trie.items()
-                        if subtree.value == container_nonterminal]
-
-                    for container_trie in container_tries:
-                        num_occs = len([
-                            subtree for _, subtree in container_trie.values()
-                            if subtree.value == elem_nonterminal])
-
+                for tree_index in tree_indices:
+                    for container_pos in tree_index.positions.get(container_nonterminal, []):
+                        num_occs = tree_index.count(container_pos, elem_nonterminal)
                         indices.update(list(range(1, num_occs + 1)))
 
                 for partial_result in list(sub_result):
@@ -1341,56 +2022,105 @@ class InvariantLearner:
     def _instantiate_string_placeholders(
             self,
             inst_patterns: Set[language.Formula],
-            tries: List[datrie.Trie]):
-        result: Set[language.Formula] = set([])
-        string_placeholder_insts = self._get_string_placeholder_instantiations(inst_patterns, tries)
-
-        for formula in string_placeholder_insts:
-            if not string_placeholder_insts[formula]:
-                result.add(formula)
-                continue
-
-            # We make instantiations for DSTRINGS placeholders map to *sets of tuples* of strings instead of
-            # sets of strings. To prevent explosion, we apply a simple heuristic: We consider numbers and
-            # single letters as irrelevant. This holds for our use cases (e.g., considering 'xmlns', 'sqrt',
-            # and '*') but can be problematic in cases where something like 'f' should be considered. However,
-            # some reduction *has* to be done, and this works for our use cases and seems to be sensile in
-            # general (protected/pre-defined identifiers are rarely numbers or single characters).
-            insts = {
-                ph:
-                    s if isinstance(ph, StringPlaceholderVariable)
-                    else (s_ := {elem for elem in s if not is_int(elem) and elem not in string.ascii_letters},
-                          {c for k in range(1, len(s_) + 1) for c in tuple(itertools.combinations(s_, k))})[-1]
-                for ph, s in string_placeholder_insts[formula].items()}
-
-            string_ph_insts: List[Dict[StringPlaceholderVariable, str | Set[str]]] = \
-                dict_of_lists_to_list_of_dicts(insts)
-
-            for instantiation in string_ph_insts:
-                # TODO: We have to account for sets in instantiations in the abstract
-                #       evaluation, or expand the formula before. Probably try the former.
-                if any(
-                        not approximately_evaluate_abst_for(
-                            formula,
-                            self.grammar,
-                            self.graph,
-                            {language.Constant("start", "<start>"): trie[path_to_trie_key(())]} | instantiation,
-                            trie
-                        ).is_false()
-                        for trie in tries):
-                    instantiated_formula = formula
-                    for ph, inst in instantiation.items():
-                        instantiated_formula = language.replace_formula(
-                            instantiated_formula,
-                            functools.partial(substitute_string_placeholder, ph, inst))
-                    result.add(instantiated_formula)
+            tree_indices: List[TreeIndex | datrie.Trie],
+            memo: Optional['ApproximateEvaluationMemo'] = None):
+        tree_indices = [TreeIndex.of(tree_index) for tree_index in tree_indices]
+        string_placeholder_insts = self._get_string_placeholder_instantiations(inst_patterns, tree_indices)
+
+        return {
+            instantiated_formula
+            for formula in string_placeholder_insts
+            for instantiated_formula in self._iterate_string_placeholder_instantiations(
+                formula, string_placeholder_insts[formula], tree_indices, memo)}
+
+    def _iterate_string_placeholder_instantiations(
+            self,
+            formula: language.Formula,
+            string_placeholder_insts: Optional[Dict[StringPlaceholderVariable, Set[str]]],
+            tree_indices: List[TreeIndex],
+            memo: Optional['ApproximateEvaluationMemo'] = None,
+            stop: Optional[Callable[[], bool]] = None) -> Iterator[language.Formula]:
+        """Yields the instantiations of the string placeholders in `formula` with the given strings which
+        are not approximately evaluated to false for all inputs. Shorter strings and narrower disjunctions
+        come first. Stops as soon as `stop` (if any) returns True."""
+        if not string_placeholder_insts:
+            yield formula
+            return
+
+        # We make instantiations for DSTRINGS placeholders map to *tuples* of strings instead of
+        # strings. To prevent explosion, we apply a simple heuristic: We consider numbers and
+        # single letters as irrelevant. This holds for our use cases (e.g., considering 'xmlns', 'sqrt',
+        # and '*') but can be problematic in cases where something like 'f' should be considered. However,
+        # some reduction *has* to be done, and this works for our use cases and seems to be sensile in
+        # general (protected/pre-defined identifiers are rarely numbers or single characters). The tuples
+        # are enumerated lazily up to a width of `max_string_disjunction_width` (see `DisjunctionEnumerator`).
+        string_placeholders = [ph for ph in string_placeholder_insts if isinstance(ph, StringPlaceholderVariable)]
+        disjunctive_placeholders = [ph for ph in string_placeholder_insts if ph not in string_placeholders]
+        disjunction_strings = {
+            ph: {elem for elem in string_placeholder_insts[ph] if not is_int(elem) and elem not in string.ascii_letters}
+            for ph in disjunctive_placeholders}
+
+        def approximately_true(instantiation: Dict[StringPlaceholderVariable, str | Tuple[str, ...]]) -> bool:
+            # TODO: We have to account for sets in instantiations in the abstract
+            #       evaluation, or expand the formula before. Probably try the former.
+            return any(
+                not approximately_evaluate_abst_for(
+                    formula,
+                    self.grammar,
+                    self.graph,
+                    {language.Constant("start", "<start>"): tree_index.node(0)} | instantiation,
+                    tree_index,
+                    memo
+                ).is_false()
+                for tree_index in tree_indices)
+
+        def disjunctive_instantiations(
+                instantiation: Dict[StringPlaceholderVariable, str | Tuple[str, ...]],
+                placeholders: List[StringPlaceholderVariable]
+        ) -> Iterator[Dict[StringPlaceholderVariable, str | Tuple[str, ...]]]:
+            # Only the disjunctions of the last placeholder are checked (and pruned); for the
+            # others, all disjunctions are enumerated.
+            ph, remaining_placeholders = placeholders[0], placeholders[1:]
+            if remaining_placeholders:
+                enumerator = DisjunctionEnumerator(disjunction_strings[ph], None, self.max_string_disjunction_width)
+                for disjunction in enumerator.disjunctions(lambda _: True, stop):
+                    yield from disjunctive_instantiations(instantiation | {ph: disjunction}, remaining_placeholders)
+                return
+
+            enumerator = DisjunctionEnumerator(
+                disjunction_strings[ph], placeholder_polarity(formula, ph), self.max_string_disjunction_width)
+            yield from (
+                instantiation | {ph: disjunction}
+                for disjunction in enumerator.disjunctions(
+                    lambda disjunction: approximately_true(instantiation | {ph: disjunction}), stop))
+            logger.debug(
+                "Checked %d disjunctions for %s, %d passed without check, %d were pruned",
+                enumerator.num_checked, ph, enumerator.num_inferred, enumerator.num_pruned)
+
+        for values in itertools.product(*[
+                sorted(string_placeholder_insts[ph], key=lambda value: (len(value), value))
+                for ph in string_placeholders]):
+            if stop is not None and stop():
+                return
+
+            string_instantiation = dict(zip(string_placeholders, values))
+            if not disjunctive_placeholders:
+                instantiations = [string_instantiation] if approximately_true(string_instantiation) else []
+            else:
+                instantiations = disjunctive_instantiations(string_instantiation, disjunctive_placeholders)
 
-        return result
+            for instantiation in instantiations:
+                instantiated_formula = formula
+                for ph, inst in instantiation.items():
+                    instantiated_formula = language.replace_formula(
+                        instantiated_formula,
+                        functools.partial(substitute_string_placeholder, ph, inst))
+                yield instantiated_formula
 
     def _get_string_placeholder_instantiations(
             self,
             inst_patterns: Set[language.Formula],
-            tries: List[datrie.Trie]) -> Dict[language.Formula, Dict[StringPlaceholderVariable, Set[str]]]:
+            tree_indices: List[TreeIndex | datrie.Trie]) -> Dict[language.Formula, Dict[StringPlaceholderVariable, Set[str]]]:
         if all(not isinstance(placeholder, StringPlaceholderVariableTypes)
                for inst_pattern in inst_patterns
                for placeholder in get_placeholders(inst_pattern)):
@@ -1400,35 +2130,12 @@ class InvariantLearner:
         #       An <ID> in at the place of a function name is different than an <ID> at the place of
         #       a variable.
         fragments: Dict[str, Set[str]] = {nonterminal: set([]) for nonterminal in self.grammar}
-        for trie in tries:
-            remaining_paths: List[Tuple[Path, language.DerivationTree]] = list(
-                sorted(list(trie.values()), key=lambda p: len(p[0])))
-
-            handled_paths: Dict[str, Set[Path]] = {nonterminal: set([]) for nonterminal in self.grammar}
-            while remaining_paths:
-                path, tree = remaining_paths.pop(0)
-                if not is_nonterminal(tree.value):
-                    continue
-
-                tree_string = str(tree)
-                if not tree_string:
-                    continue
-
-                # NOTE: We exclude substrings from fragments; e.g., if we have a <digits>
-                #       "1234", don't include the <digits> "34". This might lead
-                #       to imprecision, but otherwise the search space tends to explode.
-                if any(len(opath) < len(path) and opath == path[:len(opath)]
-                       for opath in handled_paths[tree.value]):
-                    continue
-
-                handled_paths[tree.value].add(path)
-                fragments[tree.value].add(tree_string)
-                fragments[tree.value].add(str(len(tree_string)))
-
-                # For strings representing floats, we also include the rounded Integers.
-                if is_float(tree_string) and not is_int(tree_string):
-                    fragments[tree.value].add(str(int(float(tree_string))))
-                    fragments[tree.value].add(str(int(float(tree_string)) + 1))
+        for tree_index in map(TreeIndex.of, tree_indices):
+            # NOTE: We exclude substrings from fragments; e.g., if we have a <digits>
+            #       "1234", don't include the <digits> "34". This might lead
+            #       to imprecision, but otherwise the search space tends to explode.
+            for nonterminal, nonterminal_fragments in FragmentIndex.of(tree_index).fragments.items():
+                fragments.setdefault(nonterminal, set([])).update(nonterminal_fragments)
 
         logger.debug(
             "Extracted %d language fragments from sample inputs",
@@ -1466,6 +2173,13 @@ class InvariantLearner:
         return result
 
 
+def instantiation_priority(formula: language.Formula) -> Tuple[int, int, str]:
+    """A sort key for partial instantiations which puts instantiations with fewer remaining
+    placeholders and smaller instantiations first. Ties are broken by the string representation."""
+    formula_string = str(formula)
+    return len(get_placeholders(formula)), len(formula_string), formula_string
+
+
 def substitute_string_placeholder(
         ph: PlaceholderVariable,
         inst: str | tuple[str, ...],
@@ -1504,13 +2218,125 @@ def substitute_string_placeholder(
     return functools.reduce(language.Formula.__or__, single_insts)
 
 
+class _FormulaKey:
+    """Wraps a formula whose hash is computed only once."""
+
+    def __init__(self, formula: language.Formula):
+        self.formula = formula
+        self.hash = hash(formula)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return isinstance(other, _FormulaKey) and (self.formula is other.formula or self.formula == other.formula)
+
+
+class ApproximateEvaluationMemo:
+    """
+    Memoizes results of `approximately_evaluate_abst_for` during one candidate generation run.
+    Instantiations of a pattern mostly share their quantifier prefixes and differ in their inner
+    constraints only. The memo stores the matches of quantified formulas per input, quantifier
+    and instantiation of the quantifier's "in" variable, and the truth values of quantified
+    (sub)formulas per input and assignment of their free variables. Sibling instantiations
+    thus only pay for the evaluation of the parts in which they differ.
+    """
+
+    def __init__(self):
+        self.__matches: Dict[tuple, List[Dict[language.Variable, Tuple[Path, language.DerivationTree]]]] = {}
+        self.__truth_values: Dict[tuple, ThreeValuedTruth] = {}
+        # Hashing formulas and computing their free variables is expensive; we do it once per formula object.
+        self.__formula_keys: Dict[int, Tuple[_FormulaKey, Tuple[language.Variable, ...]]] = {}
+
+        self.match_hits = 0
+        self.match_misses = 0
+        self.truth_value_hits = 0
+        self.truth_value_misses = 0
+
+    def quantifier_matches(
+            self,
+            formula: language.QuantifiedFormula,
+            grammar: Grammar,
+            tree_index: TreeIndex,
+            in_path: Path,
+            in_inst: language.DerivationTree) -> List[Dict[language.Variable, Tuple[Path, language.DerivationTree]]]:
+        key = (
+            tree_index.tree.id, in_path, in_inst.id,
+            type(formula), formula.bound_variable,
+            None if formula.bind_expression is None else tuple(formula.bind_expression.bound_elements))
+
+        try:
+            result = self.__matches[key]
+            self.match_hits += 1
+        except KeyError:
+            result = _approximate_quantifier_matches(formula, grammar, tree_index, in_path, in_inst)
+            self.__matches[key] = result
+            self.match_misses += 1
+
+        return result
+
+    def truth_value(
+            self,
+            formula: language.QuantifiedFormula,
+            tree_index: TreeIndex,
+            assignments: Dict[language.Variable, Tuple[Path, language.DerivationTree] | str | Set[str]],
+            evaluate: Callable[[], ThreeValuedTruth]) -> ThreeValuedTruth:
+        def assignment_key(value):
+            if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], language.DerivationTree):
+                return value[0], value[1].id
+            return frozenset(value) if isinstance(value, set) else value
+
+        try:
+            formula_key, free_variables = self.__formula_keys[id(formula)]
+        except KeyError:
+            formula_key, free_variables = _FormulaKey(formula), tuple(formula.free_variables())
+            self.__formula_keys[id(formula)] = formula_key, free_variables
+
+        # SMT formulas that z3 cannot evaluate are only checked if all assigned values are trees.
+        key = (
+            formula_key, tree_index.tree.id,
+            tuple(assignment_key(assignments.get(var)) for var in free_variables),
+            all(isinstance(value, tuple) for value in assignments.values()))
+
+        try:
+            result = self.__truth_values[key]
+            self.truth_value_hits += 1
+        except KeyError:
+            result = evaluate()
+            self.__truth_values[key] = result
+            self.truth_value_misses += 1
+
+        return result
+
+    def match_hit_rate(self) -> float:
+        return self.match_hits / (self.match_hits + self.match_misses or 1)
+
+    def truth_value_hit_rate(self) -> float:
+        return self.truth_value_hits / (self.truth_value_hits + self.truth_value_misses or 1)
+
+    def statistics(self) -> Tuple[int, int, int, int]:
+        return self.match_hits, self.match_misses, self.truth_value_hits, self.truth_value_misses
+
+    def add_statistics(self, statistics: Tuple[int, int, int, int]) -> None:
+        """Adds the statistics of a memo used in another process."""
+        match_hits, match_misses, truth_value_hits, truth_value_misses = statistics
+        self.match_hits += match_hits
+        self.match_misses += match_misses
+        self.truth_value_hits += truth_value_hits
+        self.truth_value_misses += truth_value_misses
+
+
 def approximately_evaluate_abst_for(
         formula: language.Formula,
         grammar: Grammar,
         graph: gg.GrammarGraph,
         assignments: Dict[language.Variable, Tuple[Path, language.DerivationTree] | str | Set[str]],
-        trie: Optional[datrie.Trie] = None) -> ThreeValuedTruth:
+        tree_index: Optional[TreeIndex | datrie.Trie] = None,
+        memo: Optional['ApproximateEvaluationMemo'] = None) -> ThreeValuedTruth:
     # TODO: Handle String placeholder variables in predicate formulas
+    if tree_index is not None:
+        tree_index = TreeIndex.of(tree_index)
+
     if isinstance(formula, language.SMTFormula):
         if any(isinstance(arg, PlaceholderVariable) and arg not in assignments
                for arg in formula.free_variables()):
@@ -1568,119 +2394,29 @@ def approximately_evaluate_abst_for(
                         in assignments.items()}.items())))
 
     elif isinstance(formula, language.NumericQuantifiedFormula):
-        return approximately_evaluate_abst_for(formula.inner_formula, grammar, graph, assignments, trie)
+        return approximately_evaluate_abst_for(formula.inner_formula, grammar, graph, assignments, tree_index, memo)
     elif isinstance(formula, language.QuantifiedFormula):
         assert isinstance(formula.in_variable, language.Variable)
         assert formula.in_variable in assignments
-        in_path, in_inst = assignments[formula.in_variable]
-
-        if formula.bind_expression is None:
-            sub_trie = get_subtrie(trie, in_path)
-
-            new_assignments: List[Dict[language.Variable, Tuple[Path, language.DerivationTree]]] = []
-            for path, subtree in sub_trie.values():
-                if subtree.value == formula.bound_variable.n_type:
-                    new_assignments.append({formula.bound_variable: (in_path + path, subtree)})
-        elif isinstance(formula.bind_expression.bound_elements[0], MexprPlaceholderVariable):
-            mexpr_placeholder = cast(MexprPlaceholderVariable, formula.bind_expression.bound_elements[0])
-
-            # First, get all matches for the bound variables
-            new_assignments: List[Dict[language.Variable, Tuple[Path, language.DerivationTree]]] = []
-            for path, subtree in get_subtrie(trie, in_path).values():
-                if subtree.value == formula.bound_variable.n_type:
-                    new_assignments.append({formula.bound_variable: (in_path + path, subtree)})
-
-            # Next, find subtrees below those matches matching the mexpr placeholder in the correct order
-            for idx, placeholder_variable in enumerate(mexpr_placeholder.variables):
-                if not idx:
-                    for assignment in list(new_assignments):
-                        new_assignments.remove(assignment)
-
-                        sub_trie = get_subtrie(trie, assignment[formula.bound_variable][0])
-                        matches = [
-                            (in_path + path, subtree)
-                            for path, subtree in sub_trie.values()
-                            if subtree.value == placeholder_variable.n_type]
-                        if not matches:
-                            continue
-
-                        new_assignments.extend([
-                            assignment | {placeholder_variable: (path, subtree)}
-                            for path, subtree in matches
-                        ])
-                else:
-                    last_variable: NonterminalPlaceholderVariable = mexpr_placeholder.variables[idx - 1]
-                    for assignment in list(new_assignments):
-                        new_assignments.remove(assignment)
-
-                        sub_trie = get_subtrie(trie, assignment[formula.bound_variable][0])
-                        last_path: Path = assignment[last_variable][0]
-                        for sub_path_key in sub_trie.keys(path_to_trie_key(last_path)):
-                            del sub_trie[sub_path_key]
-
-                        next_key = next_trie_key(sub_trie, path_to_trie_key(last_path))
-                        while next_key is not None:
-                            sub_sub_trie = get_subtrie(sub_trie, next_key)
-
-                            matches = [
-                                (last_path + path, subtree)
-                                for path, subtree in sub_sub_trie.values()
-                                if subtree.value == placeholder_variable.n_type]
-                            if not matches:
-                                continue
-
-                            new_assignments.extend([
-                                assignment | {placeholder_variable: (path, subtree)}
-                                for path, subtree in matches
-                            ])
-
-                            for sub_path_key in sub_trie.keys(next_key):
-                                del sub_trie[sub_path_key]
-
-                            next_key = next_trie_key(sub_trie, path_to_trie_key(last_path))
-
-            # For universal formulas, we only consider the first 3 new assignments
-            # to save time. After match expression placeholders are instantiated,
-            # we have the chance for a more precise check.
-            assert all(formula.bound_variable in assignment for assignment in new_assignments)
-            assert all(var in assignment for assignment in new_assignments for var in mexpr_placeholder.variables)
-            if isinstance(formula, language.ForallFormula):
-                new_assignments = new_assignments[:3]
-        else:
-            new_assignments = [
-                {var: (in_path + path, tree) for var, (path, tree) in new_assignment.items()}
-                for new_assignment in matches_for_quantified_formula(
-                    formula, grammar, in_inst, {})]
+        if memo is not None:
+            return memo.truth_value(
+                formula, tree_index, assignments,
+                lambda: _approximately_evaluate_quantified_formula(
+                    formula, grammar, graph, assignments, tree_index, memo))
 
-        if not new_assignments:
-            return ThreeValuedTruth.false()
-
-        new_assignments = [
-            new_assignment | assignments
-            for new_assignment in new_assignments]
-
-        if isinstance(formula, language.ExistsFormula):
-            return ThreeValuedTruth.from_bool(any(
-                not approximately_evaluate_abst_for(
-                    formula.inner_formula, grammar, graph, new_assignment, trie).is_false()
-                for new_assignment in new_assignments))
-        else:
-            return ThreeValuedTruth.from_bool(all(
-                not approximately_evaluate_abst_for(
-                    formula.inner_formula, grammar, graph, new_assignment, trie).is_false()
-                for new_assignment in new_assignments))
+        return _approximately_evaluate_quantified_formula(formula, grammar, graph, assignments, tree_index)
     elif isinstance(formula, language.StructuralPredicateFormula):
         if any(isinstance(arg, PlaceholderVariable) for arg in formula.args):
             return ThreeValuedTruth.unknown()
 
         arg_insts = [
             arg if isinstance(arg, str)
-            else next(path for path, subtree in trie.values() if subtree.id == arg.id)
+            else tree_index.paths[tree_index.position_of(arg)]
             if isinstance(arg, language.DerivationTree)
             else assignments[arg][0]
             for arg in formula.args]
 
-        return ThreeValuedTruth.from_bool(formula.predicate.evaluate(trie.get(path_to_trie_key(()))[1], *arg_insts))
+        return ThreeValuedTruth.from_bool(formula.predicate.evaluate(tree_index.tree, *arg_insts))
     elif isinstance(formula, language.SemanticPredicateFormula):
         if any(isinstance(arg, PlaceholderVariable) for arg in formula.args):
             return ThreeValuedTruth.unknown()
@@ -1705,20 +2441,108 @@ def approximately_evaluate_abst_for(
         return ThreeValuedTruth.true()
     elif isinstance(formula, language.NegatedFormula):
         return ThreeValuedTruth.not_(
-            approximately_evaluate_abst_for(formula.args[0], grammar, graph, assignments, trie))
+            approximately_evaluate_abst_for(formula.args[0], grammar, graph, assignments, tree_index, memo))
     elif isinstance(formula, language.ConjunctiveFormula):
         # Relaxation: Unknown is OK, only False is excluded.
         return ThreeValuedTruth.from_bool(all(
-            not approximately_evaluate_abst_for(sub_formula, grammar, graph, assignments, trie).is_false()
+            not approximately_evaluate_abst_for(sub_formula, grammar, graph, assignments, tree_index, memo).is_false()
             for sub_formula in formula.args))
     elif isinstance(formula, language.DisjunctiveFormula):
         return ThreeValuedTruth.from_bool(any(
-            not approximately_evaluate_abst_for(sub_formula, grammar, graph, assignments, trie).is_false()
+            not approximately_evaluate_abst_for(sub_formula, grammar, graph, assignments, tree_index, memo).is_false()
             for sub_formula in formula.args))
     else:
         raise NotImplementedError()
 
 
+def _approximately_evaluate_quantified_formula(
+        formula: language.QuantifiedFormula,
+        grammar: Grammar,
+        graph: gg.GrammarGraph,
+        assignments: Dict[language.Variable, Tuple[Path, language.DerivationTree] | str | Set[str]],
+        tree_index: TreeIndex,
+        memo: Optional['ApproximateEvaluationMemo'] = None) -> ThreeValuedTruth:
+    in_path, in_inst = assignments[formula.in_variable]
+    new_assignments = (
+        _approximate_quantifier_matches(formula, grammar, tree_index, in_path, in_inst) if memo is None
+        else memo.quantifier_matches(formula, grammar, tree_index, in_path, in_inst))
+
+    if not new_assignments:
+        return ThreeValuedTruth.false()
+
+    new_assignments = [
+        new_assignment | assignments
+        for new_assignment in new_assignments]
+
+    if isinstance(formula, language.ExistsFormula):
+        return ThreeValuedTruth.from_bool(any(
+            not approximately_evaluate_abst_for(
+                formula.inner_formula, grammar, graph, new_assignment, tree_index, memo).is_false()
+            for new_assignment in new_assignments))
+    else:
+        return ThreeValuedTruth.from_bool(all(
+            not approximately_evaluate_abst_for(
+                formula.inner_formula, grammar, graph, new_assignment, tree_index, memo).is_false()
+            for new_assignment in new_assignments))
+
+
+def _approximate_quantifier_matches(
+        formula: language.QuantifiedFormula,
+        grammar: Grammar,
+        tree_index: TreeIndex,
+        in_path: Path,
+        in_inst: language.DerivationTree) -> List[Dict[language.Variable, Tuple[Path, language.DerivationTree]]]:
+    in_pos = tree_index.position(in_path)
+
+    if formula.bind_expression is None:
+        new_assignments: List[Dict[language.Variable, Tuple[Path, language.DerivationTree]]] = [
+            {formula.bound_variable: tree_index.node(pos)}
+            for pos in ([] if in_pos is None else tree_index.descendants(in_pos, formula.bound_variable.n_type))]
+    elif isinstance(formula.bind_expression.bound_elements[0], MexprPlaceholderVariable):
+        mexpr_placeholder = cast(MexprPlaceholderVariable, formula.bind_expression.bound_elements[0])
+
+        # First, get all matches for the bound variables
+        new_assignments: List[Dict[language.Variable, Tuple[Path, language.DerivationTree]]] = [
+            {formula.bound_variable: tree_index.node(pos)}
+            for pos in ([] if in_pos is None else tree_index.descendants(in_pos, formula.bound_variable.n_type))]
+
+        # Next, find subtrees below those matches matching the mexpr placeholder in the correct order:
+        # The first variable is matched anywhere inside the bound variable's subtree, all subsequent
+        # ones after the subtree matched by the preceding variable.
+        for idx, placeholder_variable in enumerate(mexpr_placeholder.variables):
+            old_assignments = new_assignments
+            new_assignments = []
+
+            for assignment in old_assignments:
+                bound_pos = tree_index.position(assignment[formula.bound_variable][0])
+                if not idx:
+                    matches = tree_index.descendants(bound_pos, placeholder_variable.n_type)
+                else:
+                    last_variable: NonterminalPlaceholderVariable = mexpr_placeholder.variables[idx - 1]
+                    last_pos = tree_index.position(assignment[last_variable][0])
+                    matches = tree_index.successors(last_pos, bound_pos, placeholder_variable.n_type)
+
+                new_assignments.extend([
+                    assignment | {placeholder_variable: tree_index.node(pos)}
+                    for pos in matches
+                ])
+
+        # For universal formulas, we only consider the first 3 new assignments
+        # to save time. After match expression placeholders are instantiated,
+        # we have the chance for a more precise check.
+        assert all(formula.bound_variable in assignment for assignment in new_assignments)
+        assert all(var in assignment for assignment in new_assignments for var in mexpr_placeholder.variables)
+        if isinstance(formula, language.ForallFormula):
+            new_assignments = new_assignments[:3]
+    else:
+        new_assignments = [
+            {var: (in_path + path, tree) for var, (path, tree) in new_assignment.items()}
+            for new_assignment in matches_for_quantified_formula(
+                formula, grammar, in_inst, {})]
+
+    return new_assignments
+
+
 class PatternInstantiationFilter(ABC):
     def __init__(self, name: str):
         self.name = name
@@ -1736,7 +2560,7 @@ class PatternInstantiationFilter(ABC):
     def __hash__(self):
         return hash(self.name)
 
-    def predicate(self, formula: language.Formula, tries: List[datrie.Trie]) -> bool:
+    def predicate(self, formula: language.Formula, tree_indices: List[TreeIndex]) -> bool:
         raise NotImplementedError()
 
 
@@ -1755,7 +2579,7 @@ class NonterminalStringInCountPredicatesFilter(PatternInstantiationFilter):
     def reachable_in_inputs(self, from_nonterminal: str, to_nonterminal: str) -> bool:
         return (from_nonterminal, to_nonterminal) in self.input_reachability_relation
 
-    def predicate(self, formula: language.Formula, _: List[datrie.Trie]) -> bool:
+    def predicate(self, formula: language.Formula, _: List[TreeIndex]) -> bool:
         # In `count(elem, nonterminal, num)` occurrences
         # 1. the nonterminal must be reachable from the nonterminal type of elem. We
         #    consider reachability as defined by the sample inputs, not the grammar,
@@ -1814,6 +2638,32 @@ class InVisitor(language.FormulaVisitor):
                 })
 
 
+def necessary_quantified_variables(formula: language.Formula) -> Set[language.Variable]:
+    """The variables bound by quantifiers (including the variables of match expressions and match
+    expression placeholders) which are only nested in other quantifiers and conjunctions. If such a
+    quantifier has no match in an input, `formula` is approximately evaluated to false for that input."""
+    result: Set[language.Variable] = set()
+
+    def collect(subformula: language.Formula) -> None:
+        if isinstance(subformula, language.ConjunctiveFormula):
+            for arg in subformula.args:
+                collect(arg)
+        elif isinstance(subformula, language.NumericQuantifiedFormula):
+            collect(subformula.inner_formula)
+        elif isinstance(subformula, language.QuantifiedFormula):
+            result.add(subformula.bound_variable)
+            if subformula.bind_expression is not None:
+                for elem in subformula.bind_expression.bound_elements:
+                    if isinstance(elem, MexprPlaceholderVariable):
+                        result.update(elem.variables)
+                    elif isinstance(elem, language.BoundVariable) and not isinstance(elem, language.DummyVariable):
+                        result.add(elem)
+            collect(subformula.inner_formula)
+
+    collect(formula)
+    return result
+
+
 def get_placeholders(formula: language.Formula) -> Set[PlaceholderVariable]:
     placeholders = {var for var in language.VariablesCollector.collect(formula)
                     if isinstance(var, PlaceholderVariable)}
@@ -1886,6 +2736,82 @@ class PatternRepository:
         return result.strip()
 
 
+# State of a candidate generation worker process, set once by `_initialize_generation_worker`.
+_generation_worker_learner: Optional[InvariantLearner] = None
+_generation_worker_patterns: List[language.Formula] = []
+_generation_worker_input_reachability_relation: Set[Tuple[str, str]] = set([])
+_generation_worker_filters: List['PatternInstantiationFilter'] = []
+_generation_worker_tree_indices: List[TreeIndex] = []
+_generation_worker_memo: Optional[ApproximateEvaluationMemo] = None
+_generation_worker_partial_instantiations: Dict[int, List[language.Formula]] = {}
+
+
+def _initialize_generation_worker(
+        learner: InvariantLearner,
+        patterns: List[language.Formula],
+        inputs: List[language.DerivationTree],
+        input_reachability_relation: Set[Tuple[str, str]]) -> None:
+    global _generation_worker_learner, _generation_worker_patterns, _generation_worker_input_reachability_relation, \
+        _generation_worker_filters, _generation_worker_tree_indices, _generation_worker_memo, \
+        _generation_worker_partial_instantiations
+    _generation_worker_learner = learner
+    _generation_worker_patterns = patterns
+    _generation_worker_input_reachability_relation = input_reachability_relation
+    _generation_worker_filters = learner._instantiation_filters(input_reachability_relation)
+    _generation_worker_tree_indices = [TreeIndex(inp) for inp in inputs]
+    _generation_worker_memo = ApproximateEvaluationMemo()
+    _generation_worker_partial_instantiations = {}
+
+
+def _partial_instantiations_in_worker(pattern_idx: int) -> List[language.Formula]:
+    """Returns the instantiations of the nonterminal placeholders of the pattern with the given
+    index, sorted such that all workers agree on the chunks of this list."""
+    assert _generation_worker_learner is not None, "Worker has not been initialized"
+
+    if pattern_idx not in _generation_worker_partial_instantiations:
+        pattern = _generation_worker_patterns[pattern_idx]
+        set_smt_auto_eval(pattern, False)
+        _generation_worker_partial_instantiations[pattern_idx] = sorted(
+            _generation_worker_learner._instantiate_nonterminal_placeholders(
+                pattern, _generation_worker_input_reachability_relation,
+                tree_indices=_generation_worker_tree_indices),
+            key=lambda formula: AbstractISLaUnparser(formula).unparse())
+
+    return _generation_worker_partial_instantiations[pattern_idx]
+
+
+def _instantiate_nonterminal_placeholders_in_worker(pattern_idx: int) -> Tuple[int, float, int]:
+    """Returns the number of partial instantiations of the pattern, the time spent, and the number of
+    pruned instantiation branches."""
+    start_time = time.time()
+    num_pruned_before = _generation_worker_learner.num_pruned_instantiation_branches
+    num_partial_instantiations = len(_partial_instantiations_in_worker(pattern_idx))
+    return (
+        num_partial_instantiations,
+        time.time() - start_time,
+        _generation_worker_learner.num_pruned_instantiation_branches - num_pruned_before)
+
+
+def _complete_partial_instantiations_in_worker(
+        task: Tuple[int, int, int]) -> Tuple[Set[language.Formula], float, Tuple[int, int, int, int]]:
+    """Returns the candidates for the given chunk, the time spent, and the memo statistics of the chunk."""
+    pattern_idx, chunk_start, chunk_end = task
+
+    start_time = time.time()
+    memo_statistics = _generation_worker_memo.statistics()
+    result = _generation_worker_learner._complete_partial_instantiations(
+        _generation_worker_patterns[pattern_idx],
+        _partial_instantiations_in_worker(pattern_idx)[chunk_start:chunk_end],
+        _generation_worker_filters,
+        _generation_worker_tree_indices,
+        _generation_worker_memo)
+    return (
+        result,
+        time.time() - start_time,
+        cast(Tuple[int, int, int, int], tuple(
+            after - before for after, before in zip(_generation_worker_memo.statistics(), memo_statistics))))
+
+
 def create_input_reachability_relation(inputs: Iterable[language.DerivationTree]) -> Set[Tuple[str, str]]:
     nonterminal_paths: Set[Tuple[str, ...]] = {
         tuple([inp.get_subtree(path[:idx]).value
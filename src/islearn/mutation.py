@@ -1,6 +1,6 @@
 import logging
 import random
-from typing import Set, Dict, Callable, Tuple, Iterable, Generator, Optional
+from typing import Set, Dict, Callable, Tuple, Iterable, Generator, Optional, List
 
 from grammar_graph import gg
 from isla.existential_helpers import paths_between, path_to_tree
@@ -8,6 +8,11 @@ from isla.fuzzer import GrammarCoverageFuzzer
 from isla.helpers import is_nonterminal, canonical
 from isla.language import DerivationTree
 from isla.type_defs import Grammar, Path
+from pathos import multiprocessing as pmp
+
+from islearn.helpers import make_trees_picklable
+from islearn.oracle import PropertyOracle
+from islearn.tree_index import TreeIndex
 
 random = random.SystemRandom()
 
@@ -28,7 +33,7 @@ class MutationFuzzer:
         self.grammar = grammar
         self.graph = gg.GrammarGraph.from_grammar(grammar)
         self.seed = set(seed)
-        self.property = property
+        self.property = PropertyOracle.of(property)
         self.k = k
         self.min_mutations = min_mutations
         self.max_mutations = max_mutations
@@ -57,8 +62,9 @@ class MutationFuzzer:
             self.update_fragments(sample)
 
     def update_fragments(self, sample: DerivationTree) -> None:
-        for _, tree in sample.paths():
-            self.fragments.setdefault(tree.value, set([])).add(tree)
+        tree_index = TreeIndex(sample)
+        for label, positions in tree_index.positions.items():
+            self.fragments.setdefault(label, set([])).update(tree_index.subtrees[pos] for pos in positions)
 
     def coverages_of(self, inp: DerivationTree) -> Set[Tuple[gg.Node, ...]]:
         return self.graph.k_paths_in_tree(inp.to_parse_tree(), self.k)
@@ -171,7 +177,28 @@ class MutationFuzzer:
             num_iterations: Optional[int] = 500,
             alpha: float = 0.1,
             extend_fragments: bool = True,
-            yield_negative=False) -> Generator[DerivationTree, None, None]:
+            yield_negative=False,
+            jobs: int = 1,
+            batch_size: Optional[int] = None,
+            use_processes: bool = False) -> Generator[DerivationTree, None, None]:
+        """
+        Yields new inputs satisfying the property that cover new k-paths (and, if `yield_negative`
+        is set, all other generated inputs). If `jobs` is greater than 1, inputs are generated in
+        rounds of `batch_size` (default: `jobs`) mutants of the population at the beginning of the
+        round, and the property is checked concurrently by `jobs` threads (or processes, if
+        `use_processes` is set; threads suffice for properties calling external programs). The
+        checked inputs are processed in the order of their generation. For asynchronous properties
+        (see `PropertyOracle`), inputs are always generated in rounds, by default of as many inputs
+        as the oracle checks concurrently.
+        """
+
+        if jobs > 1 or self.property.is_async:
+            default_batch_size = self.property.max_concurrency if self.property.is_async else jobs
+            yield from self.__run_batched(
+                num_iterations, alpha, extend_fragments, yield_negative, jobs, batch_size or default_batch_size,
+                use_processes)
+            return
+
         unsuccessful_tries = 0
 
         i = 0
@@ -196,9 +223,65 @@ class MutationFuzzer:
 
             i += 1
 
-    def process_new_input(self, inp: DerivationTree, extend_fragments: bool = True) -> bool:
+    def __run_batched(
+            self,
+            num_iterations: Optional[int],
+            alpha: float,
+            extend_fragments: bool,
+            yield_negative: bool,
+            jobs: int,
+            batch_size: int,
+            use_processes: bool) -> Generator[DerivationTree, None, None]:
+        unsuccessful_tries = 0
+
+        # Asynchronous properties are checked concurrently by the oracle itself.
+        pool = None
+        if jobs > 1 and not self.property.is_async:
+            make_trees_picklable()
+            pool = (pmp.ProcessingPool if use_processes else pmp.ThreadingPool)(processes=jobs)
+
+        def check_in_pool(inputs: List[DerivationTree]) -> List[bool]:
+            return pool.map(self.property.prop, inputs)
+
+        try:
+            i = 0
+            while num_iterations is None or i < num_iterations:
+                num_inputs = batch_size if num_iterations is None else min(batch_size, num_iterations - i)
+                batch = [self.fuzz() for _ in range(num_inputs)]
+                verdicts = self.property.check_all(batch, batch_property=None if pool is None else check_in_pool)
+
+                for inp, verdict in zip(batch, verdicts):
+                    curr_alpha = 1 - (unsuccessful_tries / (i + 1))
+                    if curr_alpha < alpha and i * 10 > (num_iterations or 500):
+                        return
+
+                    if self.process_new_input(inp, extend_fragments, verdict):
+                        yield inp
+                    else:
+                        unsuccessful_tries += 1
+                        if yield_negative:
+                            yield inp
+                        self.logger.debug("current alpha: %f, threshold: %f", curr_alpha, alpha)
+
+                    i += 1
+        finally:
+            # Also runs if the consumer stops the generator early
+            if pool is not None:
+                pool.close()
+                pool.join()
+                pool.clear()
+
+    def process_new_input(
+            self,
+            inp: DerivationTree,
+            extend_fragments: bool = True,
+            verdict: Optional[bool] = None) -> bool:
+        """Adds `inp` to the population if it satisfies the property (which is only checked if no
+        `verdict` is passed) and covers new k-paths."""
         new_coverage = self.coverages_seen - self.coverages_of(inp)
-        if inp in self.population or not self.property(inp) or not new_coverage:
+        if (inp in self.population
+                or not (self.property(inp) if verdict is None else verdict)
+                or not new_coverage):
             return False
 
         self.coverages_seen.update(new_coverage)
@@ -0,0 +1,370 @@
+import asyncio
+import contextlib
+import hashlib
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from isla import language
+
+logger = logging.getLogger("oracle")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PropertyOracle:
+    """
+    A memoizing wrapper around a property (e.g., a program under test that accepts or rejects
+    inputs). Verdicts are cached by the hash of the input string in a bounded LRU cache holding
+    up to `max_size` verdicts; if `cache_dir` is given, they are additionally persisted in an
+    SQLite database and reused across runs. Persisted verdicts are addressed by the oracle
+    `name`, which defaults to the qualified name of the property; lambdas and local functions
+    need an explicit name to persist their verdicts. If a `batch_property` is given, it is used
+    by `check_all` to decide all uncached inputs in a single call.
+
+    The property may also be a coroutine function (`async def prop(tree) -> bool`). Then, at most
+    `max_concurrency` calls are in flight at once, and `check_all` decides all uncached inputs
+    concurrently. Asynchronous properties can be awaited with `acheck` and `acheck_all`; the
+    synchronous methods run them in `loop` if it is set (see `running_in`) and in a new event
+    loop otherwise. The latter fails when called from a running event loop.
+
+    The oracle is thread-safe, but the property may be called concurrently for different inputs.
+    The oracle counts calls, cache hits, and the time spent in the wrapped property.
+    """
+
+    FILE_NAME = "verdicts.sqlite"
+
+    def __init__(
+            self,
+            prop: Callable[[language.DerivationTree], bool | Awaitable[bool]],
+            max_size: int = 100_000,
+            cache_dir: Optional[str] = None,
+            name: Optional[str] = None,
+            batch_property: Optional[Callable[[List[language.DerivationTree]], List[bool]]] = None,
+            batch_size: int = 100,
+            max_concurrency: int = 16):
+        self.prop = prop
+        self.max_size = max_size
+        self.batch_property = batch_property
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.is_async = inspect.iscoroutinefunction(prop)
+        # The event loop running calls of an asynchronous property from other threads, and the
+        # number of contexts (`running_in`) using it
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__loop_users = 0
+        self.name = name or PropertyOracle.__default_name(prop, cache_dir)
+
+        self.calls = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+        self.__verdicts: OrderedDict[str, bool] = OrderedDict()
+        # Verdicts not yet written to the database, by input hash
+        self.__pending: Dict[str, bool] = {}
+
+        self.path: Optional[str] = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.path = os.path.join(cache_dir, PropertyOracle.FILE_NAME)
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__semaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+        # Guards the caches and the database connection, which is shared by all threads
+        self.__lock = threading.RLock()
+
+    @staticmethod
+    def __default_name(prop: Callable, cache_dir: Optional[str]) -> str:
+        qualname = getattr(prop, "__qualname__", None)
+        # Lambdas and local functions do not have unique qualified names; persisted verdicts of
+        # different properties would be confused.
+        if cache_dir is not None and (qualname is None or "<lambda>" in qualname or "<locals>" in qualname):
+            raise ValueError(
+                f"Property {prop!r} needs an explicit oracle name to persist its verdicts in {cache_dir}")
+
+        return f"{getattr(prop, '__module__', None)}.{qualname or repr(prop)}"
+
+    @staticmethod
+    def of(prop: Callable[[language.DerivationTree], bool | Awaitable[bool]], **kwargs) -> 'PropertyOracle':
+        """
+        Wraps `prop` into an oracle; oracles are returned unchanged such that they can be shared.
+        In that case, settings passed in `kwargs` (other than None) must agree with those of the
+        oracle; otherwise, a ValueError is raised.
+        """
+
+        if not isinstance(prop, PropertyOracle):
+            return PropertyOracle(prop, **kwargs)
+
+        settings = {
+            "max_size": prop.max_size,
+            "cache_dir": None if prop.path is None else os.path.dirname(prop.path),
+            "name": prop.name,
+            "batch_property": prop.batch_property,
+            "batch_size": prop.batch_size,
+            "max_concurrency": prop.max_concurrency,
+        }
+        conflicts = [
+            key for key, value in kwargs.items()
+            if value is not None and (
+                os.path.realpath(value) != os.path.realpath(settings[key] or "") if key == "cache_dir"
+                else value != settings[key])]
+        if conflicts:
+            raise ValueError(
+                f"Oracle {prop.name} does not have the requested settings {', '.join(conflicts)}; "
+                "pass them to the oracle's constructor instead")
+
+        return prop
+
+    def __call__(self, inp: language.DerivationTree) -> bool:
+        key = _digest(str(inp))
+        result = self.__lookup(key)
+        if result is not None:
+            self.__count(calls=1, hits=1)
+            return result
+
+        start_time = time.time()
+        result = self.__run(self.__decide_async([inp]))[0] if self.is_async else bool(self.prop(inp))
+        self.__count(calls=1, seconds=time.time() - start_time)
+
+        self.__store(key, result)
+        return result
+
+    async def acheck(self, inp: language.DerivationTree) -> bool:
+        return (await self.acheck_all([inp]))[0]
+
+    def check_all(
+            self,
+            inputs: Iterable[language.DerivationTree],
+            batch_property: Optional[Callable[[List[language.DerivationTree]], List[bool]]] = None) -> List[bool]:
+        """
+        Returns the verdicts for all `inputs`. The property is called at most once per distinct
+        input string; if there is a `batch_property` (passed to this method or to the constructor),
+        it is called once for all uncached inputs.
+        """
+
+        batch_property = batch_property or self.batch_property
+        keys, verdicts, missing = self.__lookup_all(inputs)
+
+        if missing:
+            start_time = time.time()
+            if self.is_async:
+                results = self.__run(self.__decide_async(list(missing.values())))
+            elif batch_property is not None:
+                results = list(map(bool, batch_property(list(missing.values()))))
+                assert len(results) == len(missing)
+            else:
+                results = [bool(self.prop(inp)) for inp in missing.values()]
+            self.__count(seconds=time.time() - start_time)
+            self.__store_all(verdicts, missing, results)
+
+        return [verdicts[key] for key in keys]
+
+    async def acheck_all(self, inputs: Iterable[language.DerivationTree]) -> List[bool]:
+        """Like `check_all`, for use in a running event loop."""
+        keys, verdicts, missing = self.__lookup_all(inputs)
+
+        if missing:
+            start_time = time.time()
+            if self.is_async:
+                results = await self.__decide_async(list(missing.values()))
+            else:
+                results = [bool(self.prop(inp)) for inp in missing.values()]
+            self.__count(seconds=time.time() - start_time)
+            self.__store_all(verdicts, missing, results)
+
+        return [verdicts[key] for key in keys]
+
+    @contextlib.contextmanager
+    def running_in(self, loop: asyncio.AbstractEventLoop):
+        """
+        Runs the calls of an asynchronous property from other threads in `loop` while in this
+        context. Several contexts (e.g., concurrent learners sharing this oracle) may use the same
+        loop; using the oracle in another loop at the same time is refused with a RuntimeError.
+        """
+
+        with self.__lock:
+            if self.loop is not None and self.loop is not loop:
+                raise RuntimeError(f"Oracle {self.name} is already used in another event loop")
+            self.loop = loop
+            self.__loop_users += 1
+
+        try:
+            yield self
+        finally:
+            with self.__lock:
+                self.__loop_users -= 1
+                if not self.__loop_users:
+                    self.loop = None
+
+    def record(self, inp: language.DerivationTree, verdict: bool) -> None:
+        """Adds a verdict that was obtained elsewhere, e.g., by a copy of this oracle in another process."""
+        self.__store(_digest(str(inp)), bool(verdict))
+
+    def hit_rate(self) -> float:
+        with self.__lock:
+            if not self.calls:
+                return 0.0
+
+            return self.hits / self.calls
+
+    def flush(self) -> None:
+        with self.__lock:
+            if not self.__pending:
+                return
+
+            self.__get_connection().executemany(
+                "INSERT OR REPLACE INTO verdicts (oracle, input, result) VALUES (?, ?, ?)",
+                [(self.name, key, int(result)) for key, result in self.__pending.items()])
+            self.__get_connection().commit()
+
+            logger.debug("Stored %d verdicts in %s", len(self.__pending), self.path)
+            self.__pending = {}
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__connection is None:
+                return
+
+            self.flush()
+            self.__connection.close()
+            self.__connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        # Unwritten verdicts stay with the original oracle; copies in worker processes open
+        # their own database connection if needed.
+        state = dict(self.__dict__)
+        state["_PropertyOracle__connection"] = None
+        state["_PropertyOracle__pending"] = {}
+        state["_PropertyOracle__semaphore"] = None
+        state["loop"] = None
+        state["_PropertyOracle__loop_users"] = 0
+        del state["_PropertyOracle__lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.RLock()
+
+    def __lookup_all(
+            self,
+            inputs: Iterable[language.DerivationTree]
+    ) -> Tuple[List[str], Dict[str, bool], Dict[str, language.DerivationTree]]:
+        inputs = list(inputs)
+        keys = [_digest(str(inp)) for inp in inputs]
+        hits = 0
+
+        verdicts: Dict[str, bool] = {}
+        missing: Dict[str, language.DerivationTree] = {}
+        for key, inp in zip(keys, inputs):
+            if key in verdicts or key in missing:
+                hits += 1
+                continue
+
+            result = self.__lookup(key)
+            if result is None:
+                missing[key] = inp
+            else:
+                hits += 1
+                verdicts[key] = result
+
+        self.__count(calls=len(inputs), hits=hits)
+        return keys, verdicts, missing
+
+    def __count(self, calls: int = 0, hits: int = 0, seconds: float = 0.0) -> None:
+        with self.__lock:
+            self.calls += calls
+            self.hits += hits
+            self.seconds += seconds
+
+    def __store_all(
+            self,
+            verdicts: Dict[str, bool],
+            missing: Dict[str, language.DerivationTree],
+            results: List[bool]) -> None:
+        for key, result in zip(missing, results):
+            verdicts[key] = result
+            self.__store(key, result)
+
+    async def __decide_async(self, inputs: List[language.DerivationTree]) -> List[bool]:
+        loop = asyncio.get_running_loop()
+        if self.__semaphore is None or self.__semaphore[0] is not loop:
+            self.__semaphore = (loop, asyncio.Semaphore(self.max_concurrency))
+        semaphore = self.__semaphore[1]
+
+        async def decide(inp: language.DerivationTree) -> bool:
+            async with semaphore:
+                return bool(await self.prop(inp))
+
+        return list(await asyncio.gather(*map(decide, inputs)))
+
+    def __run(self, coroutine: Awaitable[List[bool]]) -> List[bool]:
+        if self.loop is not None and self.loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+        return asyncio.run(coroutine)
+
+    def __lookup(self, key: str) -> Optional[bool]:
+        with self.__lock:
+            result = self.__verdicts.get(key)
+            if result is not None:
+                self.__verdicts.move_to_end(key)
+                return result
+
+            if self.path is None:
+                return None
+
+            # Verdicts evicted from memory might not have been written yet.
+            result = self.__pending.get(key)
+            if result is not None:
+                self.__remember(key, result)
+                return result
+
+            row = self.__get_connection().execute(
+                "SELECT result FROM verdicts WHERE oracle = ? AND input = ?", (self.name, key)).fetchone()
+            if row is None:
+                return None
+
+            result = bool(row[0])
+            self.__remember(key, result)
+            return result
+
+    def __store(self, key: str, result: bool) -> None:
+        with self.__lock:
+            self.__remember(key, result)
+
+            if self.path is None:
+                return
+
+            self.__pending[key] = result
+            if len(self.__pending) >= self.batch_size:
+                self.flush()
+
+    def __remember(self, key: str, result: bool) -> None:
+        self.__verdicts[key] = result
+        self.__verdicts.move_to_end(key)
+        if len(self.__verdicts) > self.max_size:
+            self.__verdicts.popitem(last=False)
+
+    def __get_connection(self) -> sqlite3.Connection:
+        assert self.path is not None
+        if self.__connection is None:
+            self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "oracle TEXT NOT NULL, input TEXT NOT NULL, result INTEGER NOT NULL, "
+                "PRIMARY KEY (oracle, input)) WITHOUT ROWID")
+            self.__connection.commit()
+
+        return self.__connection
@@ -0,0 +1,320 @@
+import logging
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import BinaryIO, Callable, List, Optional, Sequence
+
+from isla import language
+
+logger = logging.getLogger("oracle_server")
+
+# The protocol between a `ValidatorPool` and its (long-lived) validator processes. Requests and
+# responses are framed by a header line; payloads are UTF-8 encoded.
+#
+#   request                          response
+#   "CHECK <n>\n" + n bytes input    "OK\n" (accepted) or "ERR <m>\n" + m bytes message (rejected)
+#   "PING\n"                         "PONG\n"
+#
+# Validators terminate when their standard input is closed.
+
+
+class ValidatorError(Exception):
+    pass
+
+
+class _Validator:
+    """A single validator process with a buffered, deadline-aware reader on its standard output."""
+
+    def __init__(self, command: Sequence[str]):
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.buffer = b""
+        self.last_used = time.time()
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def ping(self, timeout: float) -> bool:
+        try:
+            self.__send(b"PING\n")
+            return self.__read_line(time.time() + timeout) == b"PONG"
+        except (ValidatorError, TimeoutError):
+            return False
+
+    def check(self, inp: str, timeout: Optional[float]) -> bool | str:
+        payload = inp.encode("utf-8")
+        self.__send(b"CHECK %d\n" % len(payload) + payload)
+
+        deadline = None if timeout is None else time.time() + timeout
+        header = self.__read_line(deadline)
+        self.last_used = time.time()
+        if header == b"OK":
+            return True
+        if header.startswith(b"ERR "):
+            return self.__read_exact(int(header[4:]), deadline).decode("utf-8", errors="replace")
+
+        raise ValidatorError(f"Unexpected response {header!r}")
+
+    def kill(self) -> None:
+        if self.process.stdin:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+        self.process.kill()
+        self.process.wait()
+
+    def __send(self, data: bytes) -> None:
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise ValidatorError(f"Validator not reachable: {exc}")
+
+    def __read_line(self, deadline: Optional[float]) -> bytes:
+        while b"\n" not in self.buffer:
+            self.__fill(deadline)
+
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line
+
+    def __read_exact(self, num_bytes: int, deadline: Optional[float]) -> bytes:
+        while len(self.buffer) < num_bytes:
+            self.__fill(deadline)
+
+        result, self.buffer = self.buffer[:num_bytes], self.buffer[num_bytes:]
+        return result
+
+    def __fill(self, deadline: Optional[float]) -> None:
+        fd = self.process.stdout.fileno()
+        remaining = None if deadline is None else max(deadline - time.time(), 0)
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            raise TimeoutError()
+
+        data = os.read(fd, 65536)
+        if not data:
+            raise ValidatorError(f"Validator terminated (exit code {self.process.poll()})")
+
+        self.buffer += data
+
+
+class ValidatorPool:
+    """
+    A pool of up to `size` long-lived validator processes started with `command`, which must speak
+    the framed protocol of this module (e.g., by `serve`, or like `RACKET_VALIDATOR` in
+    `islearn_example_languages`). Thus, a validator is started once and not for each input. Calls are thread-safe; each call is served by an idle validator. A validator that
+    crashes or does not answer within `timeout` seconds is killed and replaced by a fresh one;
+    the input is then rejected with an error message (after one retry in the case of a crash).
+    Validators that were idle for more than `health_check_interval` seconds are pinged before
+    they are used. `close` waits for the calls in flight and rejects calls made meanwhile with a
+    `ValidatorError`; afterward, validators are started again on demand.
+
+    `validate` returns `True` or an error message, like `load_racket`; calling the pool returns
+    a Boolean verdict, such that it can be used as a property.
+
+    Commands not speaking the protocol can be used with `framed=False`: Then, `command` is started
+    for each input, which it reads from its standard input. The input is accepted iff the command
+    exits with code 0; otherwise, its standard error output is the error message. Up to `size`
+    commands run at once.
+    """
+
+    def __init__(
+            self,
+            command: Sequence[str],
+            size: int = 1,
+            timeout: Optional[float] = 10.0,
+            startup_timeout: float = 30.0,
+            health_check_interval: float = 60.0,
+            framed: bool = True):
+        self.command = list(command)
+        self.framed = framed
+        self.size = size
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.health_check_interval = health_check_interval
+
+        self.num_restarts = 0
+        self.__validators: List[_Validator] = []
+        # Idle validators; None signals that a validator was removed from the pool
+        self.__idle: queue.Queue[Optional[_Validator]] = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__closing = False
+        self.__in_flight = 0
+        self.__no_calls_in_flight = threading.Condition(self.__lock)
+        # Limits the number of commands running at once if `framed` is False
+        self.__slots = threading.BoundedSemaphore(size)
+
+    def __call__(self, inp: language.DerivationTree | str) -> bool:
+        return self.validate(inp) is True
+
+    def validate(self, inp: language.DerivationTree | str) -> bool | str:
+        with self.__lock:
+            if self.__closing:
+                raise ValidatorError("Validator pool is closing")
+            self.__in_flight += 1
+
+        try:
+            if not self.framed:
+                return self.__run_once(str(inp))
+
+            validator = self.__acquire()
+            try:
+                for attempt in range(2):
+                    try:
+                        return validator.check(str(inp), self.timeout)
+                    except TimeoutError:
+                        logger.debug("Validator timed out after %s seconds, restarting", self.timeout)
+                        validator = self.__restart(validator)
+                        return f"Timeout after {self.timeout} seconds"
+                    except ValidatorError as exc:
+                        logger.debug("%s, restarting", exc)
+                        validator = self.__restart(validator)
+                        if attempt:
+                            return str(exc)
+            finally:
+                # A validator that could not be restarted was removed from the pool.
+                with self.__lock:
+                    if any(v is validator for v in self.__validators):
+                        self.__idle.put(validator)
+        finally:
+            with self.__lock:
+                self.__in_flight -= 1
+                self.__no_calls_in_flight.notify_all()
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__closing = True
+            try:
+                self.__no_calls_in_flight.wait_for(lambda: not self.__in_flight)
+                for validator in self.__validators:
+                    validator.kill()
+                self.__validators = []
+                self.__idle = queue.Queue()
+            finally:
+                self.__closing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        # Copies (e.g., in worker processes) start their own validators.
+        state = dict(self.__dict__)
+        del state["_ValidatorPool__lock"]
+        del state["_ValidatorPool__no_calls_in_flight"]
+        del state["_ValidatorPool__slots"]
+        del state["_ValidatorPool__idle"]
+        state["_ValidatorPool__in_flight"] = 0
+        state["_ValidatorPool__validators"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__idle = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__no_calls_in_flight = threading.Condition(self.__lock)
+        self.__slots = threading.BoundedSemaphore(self.size)
+
+    def __run_once(self, inp: str) -> bool | str:
+        with self.__slots:
+            try:
+                process = subprocess.run(
+                    self.command, input=inp.encode("utf-8"),
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                return f"Timeout after {self.timeout} seconds"
+
+        if process.returncode == 0:
+            return True
+
+        return process.stderr.decode("utf-8", errors="replace") or f"Exit code {process.returncode}"
+
+    def __acquire(self) -> _Validator:
+        validator = None
+        while validator is None:
+            with self.__lock:
+                if self.__idle.empty() and len(self.__validators) < self.size:
+                    validator = self.__start()
+                    self.__validators.append(validator)
+                    return validator
+
+            validator = self.__idle.get()
+
+        if not validator.alive() or (
+                time.time() - validator.last_used > self.health_check_interval
+                and not validator.ping(self.startup_timeout)):
+            validator = self.__restart(validator)
+
+        return validator
+
+    def __start(self) -> _Validator:
+        validator = _Validator(self.command)
+        if not validator.ping(self.startup_timeout):
+            validator.kill()
+            raise ValidatorError(f"Validator {' '.join(self.command)} did not start")
+
+        return validator
+
+    def __restart(self, validator: _Validator) -> _Validator:
+        validator.kill()
+        self.num_restarts += 1
+        try:
+            new_validator = self.__start()
+        except Exception:
+            with self.__lock:
+                self.__validators = [v for v in self.__validators if v is not validator]
+            # Calls waiting for an idle validator may start a new one.
+            self.__idle.put(None)
+            raise
+
+        with self.__lock:
+            self.__validators = [new_validator if v is validator else v for v in self.__validators]
+
+        return new_validator
+
+
+def serve(
+        check: Callable[[str], bool | str],
+        stdin: Optional[BinaryIO] = None,
+        stdout: Optional[BinaryIO] = None) -> None:
+    """
+    Serves the requests of a `ValidatorPool` on `stdin` and `stdout` (the standard streams by
+    default) by calling `check`, until the input is closed. This is the server side of the
+    protocol for validators implemented in Python.
+    """
+
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+
+    while True:
+        header = stdin.readline()
+        if not header:
+            return
+
+        header = header.rstrip(b"\n")
+        if header == b"PING":
+            stdout.write(b"PONG\n")
+        elif header.startswith(b"CHECK "):
+            inp = stdin.read(int(header[6:])).decode("utf-8")
+            try:
+                result = check(inp)
+            except Exception as exc:
+                result = str(exc) or type(exc).__name__
+
+            if result is True:
+                stdout.write(b"OK\n")
+            else:
+                message = (result or "").encode("utf-8") if isinstance(result, str) else b""
+                stdout.write(b"ERR %d\n" % len(message) + message)
+        else:
+            raise ValidatorError(f"Unexpected request {header!r}")
+
+        stdout.flush()
@@ -0,0 +1,151 @@
+import logging
+from typing import Callable, Generator, Iterable, List, Optional, Sequence, Set, Tuple
+
+from grammar_graph import gg
+from isla.language import DerivationTree
+from isla.type_defs import Grammar
+from pathos import multiprocessing as pmp
+
+from islearn.helpers import make_trees_picklable
+from islearn.mutation import MutationFuzzer
+from islearn.oracle import PropertyOracle
+
+logger = logging.getLogger("parallel_fuzzing")
+
+# State of a worker process, set once by `_initialize_worker` when the process is spawned.
+_worker_fuzzer: Optional[MutationFuzzer] = None
+
+# Inputs and k-paths found by other workers, the number of inputs to generate, and whether
+# to extend the fragment pool by new inputs.
+EpochTask = Tuple[Sequence[DerivationTree], Set[Tuple[gg.Node, ...]], int, bool]
+
+
+def _initialize_worker(
+        grammar: Grammar,
+        seed: Sequence[DerivationTree],
+        property: PropertyOracle,
+        k: int,
+        min_mutations: int,
+        max_mutations: int) -> None:
+    global _worker_fuzzer
+    _worker_fuzzer = MutationFuzzer(grammar, seed, property, k, min_mutations, max_mutations)
+
+
+def _fuzz_epoch(task: EpochTask) -> List[Tuple[DerivationTree, bool]]:
+    """Synchronizes the worker's fuzzer with the coordinator and returns the inputs generated in
+    this epoch together with their verdicts."""
+    new_inputs, new_coverages, num_iterations, extend_fragments = task
+    fuzzer = _worker_fuzzer
+    assert fuzzer is not None, "Worker has not been initialized"
+
+    fuzzer.coverages_seen.update(new_coverages)
+    for inp in new_inputs:
+        if inp not in fuzzer.population:
+            fuzzer.population.add(inp)
+            if extend_fragments:
+                fuzzer.update_fragments(inp)
+
+    result: List[Tuple[DerivationTree, bool]] = []
+    for _ in range(num_iterations):
+        inp = fuzzer.fuzz()
+        verdict = fuzzer.property(inp)
+        fuzzer.process_new_input(inp, extend_fragments, verdict)
+        result.append((inp, verdict))
+
+    return result
+
+
+class ParallelMutationFuzzer:
+    """
+    Runs several `MutationFuzzer` instances in worker processes, which mutate independently.
+    The coordinator (this object) merges the inputs generated by the workers into one stream,
+    skipping inputs whose string was seen before, and decides on new population members with
+    its own fuzzer (`fuzzer`), in the order of the workers. After each epoch of `sync_interval`
+    inputs per worker, newly covered k-paths and new population members (and thus, their
+    fragments) are shared with all workers.
+    """
+
+    def __init__(
+            self,
+            grammar: Grammar,
+            seed: Iterable[DerivationTree],
+            property: Callable[[DerivationTree], bool] = lambda tree: True,
+            k: int = 3,
+            min_mutations: int = 2,
+            max_mutations: int = 10,
+            num_workers: Optional[int] = None):
+        self.grammar = grammar
+        self.fuzzer = MutationFuzzer(grammar, seed, property, k, min_mutations, max_mutations)
+        self.property = self.fuzzer.property
+        self.k = k
+        self.min_mutations = min_mutations
+        self.max_mutations = max_mutations
+        self.num_workers = num_workers or pmp.cpu_count()
+
+    def run(
+            self,
+            num_iterations: Optional[int] = 500,
+            alpha: float = 0.1,
+            extend_fragments: bool = True,
+            yield_negative: bool = False,
+            sync_interval: int = 10) -> Generator[DerivationTree, None, None]:
+        """
+        Like `MutationFuzzer.run`. Each iteration generates one input in one worker. The
+        success rate `alpha` is checked after each epoch.
+        """
+
+        make_trees_picklable()
+        seed = list(self.fuzzer.population)
+        workers = [
+            pmp.Pool(
+                processes=1,
+                initializer=_initialize_worker,
+                initargs=(self.grammar, seed, self.property, self.k, self.min_mutations, self.max_mutations))
+            for _ in range(self.num_workers)]
+
+        try:
+            seen: Set[str] = {str(inp) for inp in seed}
+            new_inputs: List[DerivationTree] = []
+            new_coverages: Set[Tuple[gg.Node, ...]] = set([])
+            unsuccessful_tries = 0
+            i = 0
+            while num_iterations is None or i < num_iterations:
+                per_worker = sync_interval if num_iterations is None else min(
+                    sync_interval, -(-(num_iterations - i) // self.num_workers))
+                task = (new_inputs, new_coverages, per_worker, extend_fragments)
+                epoch_results = [worker.apply_async(_fuzz_epoch, (task,)) for worker in workers]
+
+                coverages_before = set(self.fuzzer.coverages_seen)
+                new_inputs = []
+                for epoch_result in epoch_results:
+                    for inp, verdict in epoch_result.get():
+                        if num_iterations is not None and i >= num_iterations:
+                            break
+
+                        i += 1
+                        if str(inp) in seen:
+                            unsuccessful_tries += 1
+                            continue
+
+                        seen.add(str(inp))
+                        self.property.record(inp, verdict)
+                        if self.fuzzer.process_new_input(inp, extend_fragments, verdict):
+                            new_inputs.append(inp)
+                            yield inp
+                        else:
+                            unsuccessful_tries += 1
+                            if yield_negative:
+                                yield inp
+
+                new_coverages = self.fuzzer.coverages_seen - coverages_before
+                logger.debug(
+                    "Epoch done after %d inputs: %d new population members, %d new k-paths",
+                    i, len(new_inputs), len(new_coverages))
+
+                curr_alpha = 1 - (unsuccessful_tries / (i + 1))
+                if curr_alpha < alpha and i * 10 > (num_iterations or 500):
+                    break
+        finally:
+            for worker in workers:
+                worker.terminate()
+                worker.join()
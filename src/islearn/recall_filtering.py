@@ -0,0 +1,206 @@
+import logging
+import math
+import random
+from typing import Sequence, List, Optional, Dict, Tuple
+
+from grammar_graph import gg
+from isla import language
+
+from islearn.evaluation_pool import EvaluationPool, evaluate_formula_on_inputs
+from islearn.formula_compiler import quantifier_skeleton
+from islearn.tree_index import TreeIndex
+
+logger = logging.getLogger("recall_filtering")
+
+
+class SequentialSamplingFilter:
+    """
+    Evaluates the recall of candidate formulas on growing random batches of inputs and
+    eliminates candidates as soon as their recall is provably below `min_recall` (i.e., they
+    failed for more than `(1 - min_recall) * len(inputs)` inputs). If a `confidence` level is
+    set, candidates are also eliminated if the Hoeffding upper confidence bound on their recall,
+    estimated from the inputs evaluated so far, is below `min_recall`; candidates with a recall
+    meeting the requirement are wrongly eliminated with a probability of at most
+    `1 - confidence` per test.
+
+    Candidates that are not eliminated are evaluated on all inputs, such that their result
+    bit sets are exact. Results of eliminated candidates are only defined for the inputs
+    they were evaluated on, all other bits are unset.
+    """
+
+    def __init__(
+            self,
+            graph: gg.GrammarGraph,
+            inputs: Sequence[language.DerivationTree],
+            min_recall: float,
+            confidence: Optional[float] = None,
+            initial_batch_size: int = 4,
+            growth_factor: float = 2.0,
+            seed: Optional[int] = 0,
+            evaluation_pool: Optional[EvaluationPool] = None):
+        assert confidence is None or 0 < confidence < 1
+        assert initial_batch_size > 0
+        assert growth_factor >= 1
+
+        self.graph = graph
+        self.inputs = list(inputs)
+        self.min_recall = min_recall
+        self.confidence = confidence
+        self.initial_batch_size = initial_batch_size
+        self.growth_factor = growth_factor
+        self.random = random.Random(seed)
+        self.evaluation_pool = evaluation_pool
+        self.__tree_indices: Optional[List[TreeIndex]] = None
+
+        self.num_evaluations = 0
+        self.num_eliminated = 0
+
+    def evaluate(self, formulas: Sequence[language.Formula]) -> List[int]:
+        """Returns one result bit set for each formula in `formulas` (in the same order)."""
+        num_inputs = len(self.inputs)
+        assert num_inputs > 0
+
+        columns = list(range(num_inputs))
+        self.random.shuffle(columns)
+
+        results: List[int] = [0 for _ in formulas]
+        failures: List[int] = [0 for _ in formulas]
+        alive: List[int] = list(range(len(formulas)))
+
+        position = 0
+        batch_size = self.initial_batch_size
+        while alive and position < num_inputs:
+            batch = columns[position:position + batch_size]
+            position += len(batch)
+
+            for idx, bits in zip(alive, self.__evaluate_columns([formulas[idx] for idx in alive], batch)):
+                results[idx] |= bits
+                failures[idx] += len(batch) - bits.bit_count()
+
+            self.num_evaluations += len(alive) * len(batch)
+
+            num_alive_before = len(alive)
+            alive = [idx for idx in alive if not self.eliminated(failures[idx], position)]
+            self.num_eliminated += num_alive_before - len(alive)
+
+            logger.debug(
+                "Evaluated %d candidates on %d of %d inputs, %d candidates remain",
+                num_alive_before, position, num_inputs, len(alive))
+
+            batch_size = max(batch_size + 1, int(batch_size * self.growth_factor))
+
+        return results
+
+    def eliminated(self, num_failures: int, num_samples: int) -> bool:
+        if num_failures > len(self.inputs) * (1 - self.min_recall):
+            return True
+
+        if self.confidence is None or num_samples >= len(self.inputs):
+            return False
+
+        estimated_recall = 1 - num_failures / num_samples
+        deviation = math.sqrt(math.log(1 / (1 - self.confidence)) / (2 * num_samples))
+        return estimated_recall + deviation < self.min_recall
+
+    def __evaluate_columns(self, formulas: Sequence[language.Formula], columns: Sequence[int]) -> List[int]:
+        if self.evaluation_pool is not None:
+            corpus_name = self.evaluation_pool.corpus_of(self.inputs)
+            assert corpus_name is not None, "The evaluation pool does not hold the inputs of this filter"
+            return self.evaluation_pool.evaluate(formulas, corpus_name, columns=columns)
+
+        if self.__tree_indices is None:
+            self.__tree_indices = [TreeIndex(inp) for inp in self.inputs]
+
+        return [
+            evaluate_formula_on_inputs(
+                formula, self.inputs, self.graph, columns=columns, tree_indices=self.__tree_indices)
+            for formula in formulas]
+
+
+class FalsifierFirstOrdering:
+    """
+    Learns, while candidates are evaluated, an order of inputs such that inputs that recently
+    falsified many candidates come first. Falsifications are recorded per quantifier skeleton
+    (see `quantifier_skeleton`), since candidates instantiated from the same pattern with the
+    same quantified nonterminals tend to be falsified by the same inputs; a global record serves
+    as a tie breaker. Scores decay with each recorded rejection, such that recent falsifiers
+    are preferred. With a lazy evaluation of recall, failing candidates thus reach the cutoff
+    after a few evaluations.
+
+    Orders are cached per skeleton until the next rejection is recorded. Then, they are sorted
+    again starting from the previous order, which is nearly sorted since only the scores of
+    the new falsifiers increased (decay preserves the order).
+    """
+
+    def __init__(self, num_inputs: int, decay: float = .9):
+        assert 0 < decay <= 1
+        self.num_inputs = num_inputs
+        self.decay = decay
+
+        self.scores: Dict[Tuple[str, ...], List[float]] = {}
+        self.global_scores: List[float] = [0.0 for _ in range(num_inputs)]
+
+        self.num_rejected = 0
+        self.num_evaluations_for_rejected = 0
+
+        # Cached orders by skeleton (None for skeletons without scores) with the number of
+        # rejections they reflect
+        self.__orders: Dict[Optional[Tuple[str, ...]], Tuple[int, List[int]]] = {}
+
+    def order(self, formula: language.Formula) -> List[int]:
+        """Returns the indices of all inputs in the order in which to evaluate `formula`. The
+        returned list is shared and must not be modified."""
+        skeleton = quantifier_skeleton(formula)
+        scores = self.scores.get(skeleton)
+        if scores is None:
+            skeleton = None
+
+        cached = self.__orders.get(skeleton)
+        if cached is not None and cached[0] == self.num_rejected:
+            return cached[1]
+
+        previous = cached or self.__orders.get(None)
+        order = list(range(self.num_inputs)) if previous is None else previous[1]
+
+        # Ties are broken by index, such that the result does not depend on the previous order.
+        if scores is None:
+            order = sorted(order, key=lambda idx: (-self.global_scores[idx], idx))
+        else:
+            order = sorted(order, key=lambda idx: (-scores[idx], -self.global_scores[idx], idx))
+
+        self.__orders[skeleton] = (self.num_rejected, order)
+        return order
+
+    def record(
+            self,
+            formula: language.Formula,
+            bits: int,
+            evaluated: int,
+            max_failures: float) -> None:
+        """
+        Records the results of `formula` on the inputs whose bit is set in `evaluated`, which
+        were evaluated in the order suggested by `order` (or were known before). If there are
+        more than `max_failures` falsifying inputs among them, the formula counts as rejected.
+        """
+
+        falsifiers = evaluated & ~bits
+        if falsifiers.bit_count() <= max_failures:
+            return
+
+        self.num_rejected += 1
+        self.num_evaluations_for_rejected += evaluated.bit_count()
+
+        scores = self.scores.setdefault(quantifier_skeleton(formula), [0.0 for _ in range(self.num_inputs)])
+        for idx in range(self.num_inputs):
+            scores[idx] *= self.decay
+            self.global_scores[idx] *= self.decay
+
+            if falsifiers >> idx & 1:
+                scores[idx] += 1
+                self.global_scores[idx] += 1
+
+    def average_evaluations_per_rejection(self) -> float:
+        if not self.num_rejected:
+            return 0.0
+
+        return self.num_evaluations_for_rejected / self.num_rejected
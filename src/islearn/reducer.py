@@ -8,12 +8,14 @@ from isla.language import DerivationTree
 from isla.type_defs import Grammar, Path
 from pathos import multiprocessing as pmp
 
+from islearn.oracle import PropertyOracle
+
 
 class InputReducer:
     def __init__(self, grammar: Grammar, property: Callable[[DerivationTree], bool], k: int = 3):
         self.grammar = grammar
         self.graph = gg.GrammarGraph.from_grammar(grammar)
-        self.property = property
+        self.property = PropertyOracle.of(property)
         self.logger = logging.getLogger(__name__)
         self.k = k
 
@@ -41,21 +43,32 @@ class InputReducer:
 
                 matches = sorted(matches, key=DerivationTree.__len__)
 
-                for match in matches:
-                    # Don't replace subtree by match if it contains a k-path that will vanish otherwise
-                    potential_replacement = result.replace_path(path, match)
+                def replacements():
+                    for match in matches:
+                        # Don't replace subtree by match if it contains a k-path that will vanish otherwise
+                        potential_replacement = result.replace_path(path, match)
+
+                        k_paths_in_replacement = {
+                            path for path in potential_replacement.k_paths(self.graph, k=self.k)
+                            if (not isinstance(path[-1], gg.TerminalNode) or
+                                (not isinstance(path[-1], gg.TerminalNode) and len(path[-1].symbol) > 1))}
 
-                    k_paths_in_replacement = {
-                        path for path in potential_replacement.k_paths(self.graph, k=self.k)
-                        if (not isinstance(path[-1], gg.TerminalNode) or
-                            (not isinstance(path[-1], gg.TerminalNode) and len(path[-1].symbol) > 1))}
+                        if any(path not in k_paths_in_replacement for path in k_paths_in_inp):
+                            continue
 
-                    if any(path not in k_paths_in_replacement for path in k_paths_in_inp):
-                        continue
+                        # self.logger.debug("Replacing %s with %s", subtree, match)
+                        yield potential_replacement
 
-                    # self.logger.debug("Replacing %s with %s", subtree, match)
+                if self.property.is_async:
+                    # Check all replacements concurrently; the first (smallest) valid one is chosen.
+                    potential_replacements = list(replacements())
+                    verdicts = self.property.check_all(potential_replacements)
+                else:
+                    potential_replacements = replacements()
+                    verdicts = None
 
-                    if self.property(potential_replacement):
+                for idx, potential_replacement in enumerate(potential_replacements):
+                    if verdicts[idx] if verdicts is not None else self.property(potential_replacement):
                         result = potential_replacement
                         return
 
@@ -0,0 +1,120 @@
+import itertools
+import math
+from typing import Sequence, Tuple, Callable, Optional, Iterator, List, Set
+
+from isla import language
+
+from islearn.language import PlaceholderVariable
+
+
+class DisjunctionEnumerator:
+    """
+    Lazily enumerates the disjunctions (tuples of strings) of up to `max_width` of the given
+    strings which pass a check (usually, an approximate evaluation of a pattern instantiated
+    with the disjunction). Narrower disjunctions come first; disjunctions of the same width are
+    ordered lexicographically, with strings ordered by their length first. Disjunctions are
+    grown incrementally from narrower ones, exploiting the `polarity` of the check:
+
+    - If `polarity` is True, the check is monotone: A disjunction passes if one of its
+      sub-disjunctions passes. Disjunctions containing a passing one are thus yielded
+      without checking them.
+    - If `polarity` is False, the check is antitone: A disjunction fails if one of its
+      sub-disjunctions fails. Disjunctions are thus only grown from passing ones.
+    - Otherwise, all disjunctions are checked.
+
+    The numbers of checked disjunctions, of disjunctions that passed without checking them,
+    and of disjunctions that failed without checking them are counted in `num_checked`,
+    `num_inferred`, and `num_pruned`.
+    """
+
+    def __init__(self, strings: Sequence[str], polarity: Optional[bool] = None, max_width: Optional[int] = None):
+        self.strings: List[str] = sorted(set(strings), key=lambda s: (len(s), s))
+        self.polarity = polarity
+        self.max_width = len(self.strings) if max_width is None else min(max_width, len(self.strings))
+
+        self.num_checked = 0
+        self.num_inferred = 0
+        self.num_pruned = 0
+
+    def disjunctions(
+            self,
+            check: Callable[[Tuple[str, ...]], bool],
+            stop: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[str, ...]]:
+        """Yields all disjunctions passing `check`. Stops as soon as `stop` (if any) returns True."""
+        # Bit sets of the indices of passing disjunctions none of whose sub-disjunctions passed
+        minimal_passing: List[int] = []
+        # Index tuples of the passing disjunctions of the previous width
+        passing: Set[Tuple[int, ...]] = set()
+
+        for width in range(1, self.max_width + 1):
+            if self.polarity is False and width > 1:
+                candidates = self.__grow(passing, width)
+                self.num_pruned += math.comb(len(self.strings), width) - len(candidates)
+            else:
+                candidates = itertools.combinations(range(len(self.strings)), width)
+
+            passing = set()
+            for indices in candidates:
+                if stop is not None and stop():
+                    return
+
+                disjunction = tuple(self.strings[idx] for idx in indices)
+                bits = sum(1 << idx for idx in indices)
+
+                if self.polarity is True and any(other & bits == other for other in minimal_passing):
+                    self.num_inferred += 1
+                    yield disjunction
+                    continue
+
+                self.num_checked += 1
+                if not check(disjunction):
+                    continue
+
+                if self.polarity is True:
+                    minimal_passing.append(bits)
+                elif self.polarity is False:
+                    passing.add(indices)
+
+                yield disjunction
+
+            if self.polarity is False and not passing:
+                self.num_pruned += sum(
+                    math.comb(len(self.strings), larger_width)
+                    for larger_width in range(width + 1, self.max_width + 1))
+                return
+
+    def __grow(self, passing: Set[Tuple[int, ...]], width: int) -> List[Tuple[int, ...]]:
+        """Extends the passing disjunctions of width `width - 1` by one string each, keeping only
+        extensions all of whose sub-disjunctions of width `width - 1` passed."""
+        return [
+            indices + (idx,)
+            for indices in sorted(passing)
+            for idx in range(indices[-1] + 1, len(self.strings))
+            if all(indices[:pos] + indices[pos + 1:] + (idx,) in passing for pos in range(width - 1))]
+
+
+def placeholder_polarity(formula: language.Formula, placeholder: PlaceholderVariable) -> Optional[bool]:
+    """
+    True if all occurrences of `placeholder` in `formula` are positive (i.e., below an even
+    number of negations), False if all of them are negative, and None if there are positive
+    and negative occurrences, or none at all. A disjunctive strings placeholder in an atom is
+    replaced by a disjunction of instantiations of the whole atom (see
+    `learner.substitute_string_placeholder`), such that its polarity only depends on the
+    negations *around* the atom.
+    """
+
+    polarities: Set[bool] = set()
+
+    def collect(subformula: language.Formula, positive: bool) -> None:
+        if isinstance(subformula, language.NegatedFormula):
+            collect(subformula.args[0], not positive)
+        elif isinstance(subformula, (language.ConjunctiveFormula, language.DisjunctiveFormula)):
+            for arg in subformula.args:
+                collect(arg, positive)
+        elif isinstance(subformula, (language.QuantifiedFormula, language.NumericQuantifiedFormula)):
+            collect(subformula.inner_formula, positive)
+        elif placeholder in subformula.free_variables():
+            polarities.add(positive)
+
+    collect(formula, True)
+    return next(iter(polarities)) if len(polarities) == 1 else None
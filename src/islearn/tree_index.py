@@ -0,0 +1,122 @@
+import bisect
+from typing import List, Dict, Optional, Tuple, Generic, TypeVar
+
+import datrie
+from isla import language
+from isla.trie import path_to_trie_key
+from isla.type_defs import Path
+
+from islearn.parse_tree_utils import Tree
+
+T = TypeVar("T", language.DerivationTree, Tree)
+
+
+class TreeIndex(Generic[T]):
+    """
+    An immutable index of the nodes of a derivation tree (or parse tree). The nodes are stored in
+    flat arrays in preorder; the subtree of the node at position `pos` spans the positions
+    `pos` until `ends[pos]` (exclusive). For each node label, `positions` holds the (sorted)
+    positions of all nodes with that label. Consequently, all nodes with a given label inside
+    a subtree can be obtained by a binary search, without copying any nodes. Different from
+    datrie-based indices, there is no limit on the number of children of a node.
+    """
+
+    def __init__(self, tree: T):
+        self.tree = tree
+        self.paths: List[Path] = []
+        self.subtrees: List[T] = []
+        self.labels: List[str] = []
+        self.parents: List[int] = []
+        self.ends: List[int] = []
+        self.positions: Dict[str, List[int]] = {}
+
+        stack: List[Tuple[T, Path, int]] = [(tree, (), -1)]
+        while stack:
+            subtree, path, parent = stack.pop()
+            label, children = (
+                (subtree.value, subtree.children) if isinstance(subtree, language.DerivationTree)
+                else subtree)
+
+            pos = len(self.paths)
+            self.paths.append(path)
+            self.subtrees.append(subtree)
+            self.labels.append(label)
+            self.parents.append(parent)
+            self.ends.append(pos + 1)
+            self.positions.setdefault(label, []).append(pos)
+
+            stack.extend(
+                (child, path + (idx,), pos)
+                for idx, child in reversed(list(enumerate(children or []))))
+
+        # Children succeed their parents in preorder, so a reverse pass propagates subtree ends.
+        for pos in range(len(self.paths) - 1, 0, -1):
+            parent = self.parents[pos]
+            self.ends[parent] = max(self.ends[parent], self.ends[pos])
+
+        self.__position_of_path: Dict[Path, int] = {path: pos for pos, path in enumerate(self.paths)}
+        self.__position_of_id: Optional[Dict[int, int]] = None
+
+    @staticmethod
+    def of(tree: 'TreeIndex | datrie.Trie | language.DerivationTree') -> 'TreeIndex':
+        """Returns the index for a derivation tree or a subtrees trie of a derivation tree. Indices are returned
+        as they are."""
+        if isinstance(tree, TreeIndex):
+            return tree
+        if isinstance(tree, datrie.Trie):
+            return TreeIndex(tree[path_to_trie_key(())][1])
+        return TreeIndex(tree)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def node(self, pos: int) -> Tuple[Path, T]:
+        return self.paths[pos], self.subtrees[pos]
+
+    def position(self, path: Path) -> Optional[int]:
+        return self.__position_of_path.get(path)
+
+    def position_of(self, tree: language.DerivationTree) -> Optional[int]:
+        """Returns the position of the given subtree of the indexed derivation tree, which is identified by its ID."""
+        if self.__position_of_id is None:
+            self.__position_of_id = {subtree.id: pos for pos, subtree in enumerate(self.subtrees)}
+        return self.__position_of_id.get(tree.id)
+
+    def descendants(self, pos: int, label: str) -> List[int]:
+        """The positions of all nodes labeled `label` in the subtree at `pos`, including `pos` itself."""
+        return self.__range(label, pos, self.ends[pos])
+
+    def descendants_of_all(self, positions: List[int], label: str) -> List[int]:
+        """The positions of all nodes labeled `label` in any of the subtrees at the (sorted) `positions`.
+        Subtrees nested in other ones are skipped, such that each position is contained once."""
+        result: List[int] = []
+        end = 0
+        for pos in positions:
+            if pos >= end:
+                result.extend(self.descendants(pos, label))
+                end = self.ends[pos]
+        return result
+
+    def count(self, pos: int, label: str) -> int:
+        """The number of nodes labeled `label` in the subtree at `pos`, including `pos` itself."""
+        positions = self.positions.get(label, [])
+        return bisect.bisect_left(positions, self.ends[pos]) - bisect.bisect_left(positions, pos)
+
+    def successors(self, pos: int, within: int, label: str) -> List[int]:
+        """The positions of all nodes labeled `label` in the subtree at `within` which succeed the subtree
+        at `pos` in preorder."""
+        return self.__range(label, self.ends[pos], self.ends[within])
+
+    def outermost(self, label: str) -> List[int]:
+        """The positions of all nodes labeled `label` which are not nested in another node with that label."""
+        result: List[int] = []
+        end = 0
+        for pos in self.positions.get(label, []):
+            if pos >= end:
+                result.append(pos)
+                end = self.ends[pos]
+        return result
+
+    def __range(self, label: str, start: int, end: int) -> List[int]:
+        positions = self.positions.get(label, [])
+        return positions[bisect.bisect_left(positions, start):bisect.bisect_left(positions, end)]
@@ -5,6 +5,7 @@ import subprocess
 import sys
 import tempfile
 from subprocess import PIPE
+from typing import Optional
 
 import graphviz
 # NOTE: To make this a PEG grammar, we need to escape single quotes within
@@ -14,6 +15,8 @@ from isla import language
 from isla.helpers import srange, crange
 from isla.type_defs import Grammar
 
+from islearn.oracle_server import ValidatorPool
+
 toml_grammar = {
     "<start>": ["<document>"],
     "<document>": ["<expressions>"],
@@ -488,7 +491,70 @@ RACKET_BSL_GRAMMAR = {
 }
 
 
-def load_racket(tree: language.DerivationTree | str) -> bool | str:
+# A validator for `ValidatorPool` (see `islearn.oracle_server`) loading each program into a fresh
+# namespace of a long-lived racket process, approximating `racket -f` in `load_racket`.
+RACKET_VALIDATOR = r"""
+(define out (current-output-port))
+(define in (current-input-port))
+(namespace-require 'racket)
+(define base-namespace (current-namespace))
+
+(define (respond-error message)
+  (define data (string->bytes/utf-8 message))
+  (write-string (format "ERR ~a\n" (bytes-length data)) out)
+  (write-bytes data out))
+
+(define (check program)
+  (define err (open-output-bytes))
+  (define message
+    (with-handlers ([(lambda (e) #t) (lambda (e) (if (exn? e) (exn-message e) (format "~a" e)))])
+      (parameterize ([current-namespace (make-base-empty-namespace)]
+                     [current-output-port (open-output-nowhere)]
+                     [current-error-port err]
+                     [current-input-port (open-input-bytes #"")]
+                     [read-accept-reader #t]
+                     [read-accept-lang #t])
+        (namespace-attach-module base-namespace 'racket)
+        (namespace-require 'racket)
+        (define port (open-input-bytes program))
+        (port-count-lines! port)
+        (let loop ()
+          (define form (read-syntax 'program port))
+          (unless (eof-object? form)
+            (eval form)
+            (loop))))
+      #f))
+  (define err-msg (bytes->string/utf-8 (get-output-bytes err) #\?))
+  (cond
+    [message (respond-error message)]
+    [(regexp-match? #rx"read-syntax" err-msg) (respond-error err-msg)]
+    [else (write-string "OK\n" out)]))
+
+(let loop ()
+  (define header (read-line in 'linefeed))
+  (unless (eof-object? header)
+    (cond
+      [(string=? header "PING") (write-string "PONG\n" out)]
+      [(regexp-match #rx"^CHECK ([0-9]+)$" header)
+       => (lambda (m) (check (read-bytes (string->number (cadr m)) in)))]
+      [else (error 'validator "unexpected request ~a" header)])
+    (flush-output out)
+    (loop)))
+"""
+
+RACKET_VALIDATOR_COMMAND = ["racket", "-l", "racket/base", "-e", RACKET_VALIDATOR]
+
+
+def load_racket(tree: language.DerivationTree | str, pool: Optional[ValidatorPool] = None) -> bool | str:
+    """
+    Loads the program `tree` with racket. If a `pool` of validators started with
+    `RACKET_VALIDATOR_COMMAND` is passed, the program is loaded by a long-lived racket process
+    of that pool; otherwise, a new racket process is started.
+    """
+
+    if pool is not None:
+        return pool.validate(tree)
+
     with tempfile.NamedTemporaryFile(suffix=".rk") as tmp:
         tmp.write(str(tree).encode())
         tmp.flush()
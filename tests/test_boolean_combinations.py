@@ -0,0 +1,101 @@
+import functools
+import itertools
+import random
+import unittest
+
+from islearn.boolean_combinations import CombinationEngine
+
+
+class TestBooleanCombinations(unittest.TestCase):
+    def test_disjunctions_match_naive_enumeration(self):
+        rng = random.Random(0)
+        num_columns = 20
+        rows = [rng.getrandbits(num_columns) for _ in range(12)]
+        engine = CombinationEngine(rows, num_columns, prune_subsumed=False)
+
+        for level in [2, 3]:
+            expected = []
+            for indices in itertools.combinations(range(len(rows)), level):
+                bits = functools.reduce(int.__or__, [rows[idx] for idx in indices])
+                count = bits.bit_count()
+                if (count / num_columns >= .7 and
+                        all(count > rows[idx].bit_count() for idx in indices)):
+                    expected.append((indices, tuple(False for _ in indices)))
+
+            self.assertEqual(expected, list(engine.disjunctions(level, .7)))
+
+    def test_disjunctions_with_negations(self):
+        # A row together with its complement covers all columns
+        engine = CombinationEngine([0b0011, 0b0011, 0b0100], 4, prune_subsumed=False)
+
+        self.assertEqual(
+            [((0, 2), (False, False)), ((1, 2), (False, False))],
+            list(engine.disjunctions(2, .75)))
+        self.assertEqual(
+            [((0, 1), (False, True)),
+             ((0, 1), (True, False)),
+             ((0, 2), (False, False)),
+             ((1, 2), (False, False))],
+            list(engine.disjunctions(2, .75, max_num_negations=1)))
+
+    def test_only_rows_of_medium_ratio_are_negated(self):
+        # The first row holds for 10% of the columns only; its negation would be overly specific.
+        engine = CombinationEngine([0b0000000001, 0b0000011111], 10, prune_subsumed=False)
+        self.assertEqual(
+            [((0, 1), (False, True))],
+            list(engine.disjunctions(2, .6, max_num_negations=1)))
+
+    def test_conjunctions_match_naive_enumeration(self):
+        rng = random.Random(1)
+        num_columns = 16
+        rows = [rng.getrandbits(num_columns) for _ in range(10)]
+        engine = CombinationEngine(rows, num_columns, prune_subsumed=False)
+
+        for level in [2, 3]:
+            expected = []
+            for indices in itertools.combinations(range(len(rows)), level):
+                bits = functools.reduce(int.__and__, [rows[idx] for idx in indices])
+                count = bits.bit_count()
+                if (1 - count / num_columns >= .8 and
+                        all(count < rows[idx].bit_count() for idx in indices)):
+                    expected.append(indices)
+
+            self.assertEqual(expected, list(engine.conjunctions(level, .8)))
+
+
+    def test_pruning_keeps_non_redundant_combinations(self):
+        rng = random.Random(2)
+        num_columns = 12
+        rows = [rng.getrandbits(num_columns) for _ in range(10)]
+        rows += [rows[1], rows[4], rows[1] & rows[7]]
+
+        naive_engine = CombinationEngine(rows, num_columns, prune_subsumed=False)
+        pruning_engine = CombinationEngine(rows, num_columns)
+
+        def redundant(indices) -> bool:
+            return any(rows[i] & rows[j] in (rows[i], rows[j]) for i, j in itertools.combinations(indices, 2))
+
+        for level in [2, 3]:
+            self.assertEqual(
+                [(indices, negations) for indices, negations in naive_engine.disjunctions(level, .8)
+                 if not redundant(indices)],
+                pruning_engine.disjunctions(level, .8))
+
+            self.assertEqual(
+                [indices for indices in naive_engine.conjunctions(level, .8) if not redundant(indices)],
+                pruning_engine.conjunctions(level, .8))
+
+        self.assertGreater(pruning_engine.num_pruned, 0)
+        self.assertEqual(0, naive_engine.num_pruned)
+
+    def test_identical_columns_are_scored_once(self):
+        rows = [0b0011, 0b0011, 0b1100, 0b1100]
+        engine = CombinationEngine(rows, 4)
+
+        self.assertEqual([(0, 2), (0, 3), (1, 2), (1, 3)], [indices for indices, _ in engine.disjunctions(2, 1)])
+        self.assertEqual(1, engine.num_scored)
+        self.assertEqual(5, engine.num_pruned)
+
+
+if __name__ == '__main__':
+    unittest.main()
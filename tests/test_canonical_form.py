@@ -0,0 +1,86 @@
+import unittest
+
+from isla import language
+from isla.isla_predicates import STANDARD_STRUCTURAL_PREDICATES, STANDARD_SEMANTIC_PREDICATES
+from isla.language import parse_isla
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.canonical_form import canonical_key, add_representatives
+from islearn.learner import InvariantLearner
+
+
+def parse(formula: str) -> language.Formula:
+    return parse_isla(formula, csv.CSV_GRAMMAR, STANDARD_STRUCTURAL_PREDICATES, STANDARD_SEMANTIC_PREDICATES)
+
+
+class TestCanonicalForm(unittest.TestCase):
+    def test_equivalent_formulas(self):
+        equivalence_classes = [
+            [
+                'forall <csv-record> r in start: exists <raw-field> f in r: (= f "a")',
+                'forall <csv-record> q in start: exists <raw-field> g in q: (= "a" g)',
+            ],
+            [
+                'forall <raw-field> f in start: (> (str.len f) 0)',
+                'forall <raw-field> x in start: (< 0 (str.len x))',
+            ],
+            [
+                '(forall <raw-field> f in start: (= f "a")) and (exists <raw-field> g in start: (= g "b"))',
+                '(exists <raw-field> f in start: (= f "b")) and (forall <raw-field> f in start: (= f "a"))',
+            ],
+            [
+                'forall <csv-string-list> l="{<raw-field> f1};{<csv-string-list> rest}" in start: '
+                'exists <raw-field> f2 in rest: (= f1 f2)',
+                'forall <csv-string-list> m="{<raw-field> a};{<csv-string-list> b}" in start: '
+                'exists <raw-field> c in b: (= c a)',
+            ],
+            [
+                'forall <csv-string-list> m="{<raw-field> a};{<csv-string-list> b}" in start: '
+                'exists <raw-field> c in m: (= c a)',
+            ],
+            [
+                'forall <csv-record> r in start: exists <raw-field> f in r: (= f "b")',
+            ],
+        ]
+
+        keys = [{canonical_key(parse(formula)) for formula in formulas} for formulas in equivalence_classes]
+        self.assertTrue(all(len(class_keys) == 1 for class_keys in keys))
+        self.assertEqual(len(equivalence_classes), len(set.union(*keys)))
+
+    def test_add_representatives(self):
+        formulas = [
+            parse('forall <raw-field> g in start: (= g "a")'),
+            parse('forall <raw-field> f in start: (= "a" f)'),
+            parse('forall <raw-field> f in start: (= f "b")'),
+        ]
+
+        representatives = {}
+        self.assertEqual(1, add_representatives(representatives, formulas))
+        self.assertEqual(2, len(representatives))
+        self.assertIn(min(formulas[:2], key=str), representatives.values())
+
+    def test_generate_candidates_collapses_equivalent_candidates(self):
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ["a;b\nc;d\n", "x\n"]]
+
+        pattern = """
+forall <?NONTERMINAL> container in start:
+  exists <?NONTERMINAL> elem in container:
+    (= elem <?STRING>)"""
+        renamed_pattern = """
+forall <?NONTERMINAL> outer in start:
+  exists <?NONTERMINAL> inner in outer:
+    (= <?STRING> inner)"""
+
+        learner = InvariantLearner(csv.CSV_GRAMMAR)
+        candidates = learner.generate_candidates([pattern], inputs)
+        self.assertEqual([0], learner.num_collapsed_candidates)
+
+        self.assertEqual(candidates, learner.generate_candidates([pattern, renamed_pattern], inputs))
+        self.assertEqual([0, len(candidates)], learner.num_collapsed_candidates)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+
+from grammar_graph import gg
+from isla import language
+from isla.language import parse_isla
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.evaluation_cache import EvaluationCache
+from islearn.evaluation_pool import evaluate_formula_on_inputs
+from islearn.learner import TruthTable, TruthTableRow
+
+
+class TestEvaluationCache(unittest.TestCase):
+    def setUp(self):
+        raw_inputs = [f"a;{i}\n" for i in range(8)] + ["x\n", "y;z\n"]
+        self.inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in raw_inputs]
+        self.graph = gg.GrammarGraph.from_grammar(csv.CSV_GRAMMAR)
+        self.formulas = [
+            parse_isla(formula, csv.CSV_GRAMMAR)
+            for formula in [
+                'forall <csv-record> r in start: exists <raw-field> f in r: (= f "a")',
+                'exists <raw-field> f in start: (= f "x")',
+                'forall <raw-field> f in start: (> (str.len f) 0)',
+            ]]
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_only_new_inputs_are_evaluated(self):
+        expected = [evaluate_formula_on_inputs(formula, self.inputs, self.graph) for formula in self.formulas]
+
+        with EvaluationCache(csv.CSV_GRAMMAR, self.cache_dir.name) as cache:
+            TruthTable([
+                TruthTableRow(formula, self.inputs[:6]) for formula in self.formulas
+            ]).evaluate(self.graph, evaluation_cache=cache)
+            self.assertEqual(0, cache.hits)
+            self.assertEqual(18, cache.misses)
+
+        # A new cache instance reads the results persisted by the first one
+        with EvaluationCache(csv.CSV_GRAMMAR, self.cache_dir.name) as cache:
+            table = TruthTable([
+                TruthTableRow(formula, self.inputs) for formula in self.formulas
+            ]).evaluate(self.graph, evaluation_cache=cache)
+            self.assertEqual(18, cache.hits)
+            self.assertEqual(12, cache.misses)
+
+        self.assertEqual(expected, [row.bits for row in table])
+
+    def test_lazily_evaluated_results_are_cached(self):
+        formula = self.formulas[1]
+
+        with EvaluationCache(csv.CSV_GRAMMAR, self.cache_dir.name) as cache:
+            TruthTable([TruthTableRow(formula, self.inputs)]).evaluate(
+                self.graph, lazy=True, result_threshold=.85, evaluation_cache=cache)
+
+            # Only the two inputs evaluated before the cutoff are known
+            bits, known = cache.lookup(formula, self.inputs)
+            self.assertEqual(0, bits)
+            self.assertEqual(0b11, known)
+
+            table = TruthTable([TruthTableRow(formula, self.inputs)]).evaluate(
+                self.graph, evaluation_cache=cache)
+            self.assertEqual(0b0100000000, table[0].bits)
+
+        with EvaluationCache(csv.CSV_GRAMMAR, self.cache_dir.name) as cache:
+            self.assertEqual((0b0100000000, 0b1111111111), cache.lookup(formula, self.inputs))
+
+        with EvaluationCache({"<start>": [["x"]]}, self.cache_dir.name) as cache:
+            self.assertEqual((0, 0), cache.lookup(formula, self.inputs))
+
+
+if __name__ == '__main__':
+    unittest.main()
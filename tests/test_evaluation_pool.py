@@ -0,0 +1,83 @@
+import unittest
+
+from grammar_graph import gg
+from isla import language
+from isla.language import parse_isla
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.evaluation_pool import EvaluationPool, evaluate_formula_on_inputs
+from islearn.learner import TruthTable, TruthTableRow
+
+
+class TestEvaluationPool(unittest.TestCase):
+    def setUp(self):
+        raw_inputs = ["a;b\nc;d\n", "a;b;c\n", "1;2\n3;4\n5;6\n", "x\n"]
+        self.inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in raw_inputs]
+        self.graph = gg.GrammarGraph.from_grammar(csv.CSV_GRAMMAR)
+        self.formulas = [
+            parse_isla(formula, csv.CSV_GRAMMAR)
+            for formula in [
+                'forall <csv-record> r in start: exists <raw-field> f in r: (= f "a")',
+                'exists <raw-field> f in start: (= f "x")',
+                'forall <raw-field> f in start: (> (str.len f) 0)',
+            ]]
+
+    def test_pool_results_match_sequential_evaluation(self):
+        expected = [evaluate_formula_on_inputs(formula, self.inputs, self.graph) for formula in self.formulas]
+
+        with EvaluationPool(csv.CSV_GRAMMAR, {"positive": self.inputs}, processes=2, batch_size=2) as pool:
+            self.assertEqual("positive", pool.corpus_of(self.inputs))
+            self.assertIsNone(pool.corpus_of(self.inputs[:2]))
+            self.assertEqual(expected, pool.evaluate(self.formulas, "positive"))
+
+    def test_added_corpora(self):
+        expected = [evaluate_formula_on_inputs(formula, self.inputs[1:], self.graph) for formula in self.formulas]
+
+        with EvaluationPool(csv.CSV_GRAMMAR, {"positive": self.inputs[:1]}, processes=2, batch_size=2) as pool:
+            name = pool.add_corpus(self.inputs[1:])
+            self.assertEqual(name, pool.corpus_of(self.inputs[1:]))
+            self.assertEqual(expected, pool.evaluate(self.formulas, name))
+
+            pool.remove_corpus(name)
+            self.assertIsNone(pool.corpus_of(self.inputs[1:]))
+            self.assertNotEqual(name, pool.add_corpus(self.inputs[1:]))
+
+    def test_formulas_with_quoted_strings(self):
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ['"a";b\n', 'a;b\n']]
+        formula = parse_isla('exists <raw-field> f in start: (= f "\\"a\\"")', csv.CSV_GRAMMAR)
+        self.assertEqual(0b01, evaluate_formula_on_inputs(formula, inputs, self.graph))
+
+        with EvaluationPool(csv.CSV_GRAMMAR, {"positive": inputs}, processes=2) as pool:
+            self.assertEqual([0b01], pool.evaluate([formula], "positive"))
+
+    def test_truth_table_evaluation_with_pool(self):
+        sequential_table = TruthTable([
+            TruthTableRow(formula, self.inputs) for formula in self.formulas
+        ]).evaluate(self.graph)
+
+        with EvaluationPool(csv.CSV_GRAMMAR, {"positive": self.inputs}, processes=2) as pool:
+            pooled_table = TruthTable([
+                TruthTableRow(formula, self.inputs) for formula in self.formulas
+            ]).evaluate(self.graph, evaluation_pool=pool)
+
+        self.assertEqual(
+            [row.eval_results for row in sequential_table],
+            [row.eval_results for row in pooled_table])
+
+    def test_evaluation_stops_after_max_true_results(self):
+        always_true = parse_isla('forall <raw-field> f in start: (>= (str.len f) 0)', csv.CSV_GRAMMAR)
+        self.assertEqual(0b1111, evaluate_formula_on_inputs(always_true, self.inputs, self.graph))
+        self.assertEqual(0b0011, evaluate_formula_on_inputs(
+            always_true, self.inputs, self.graph, max_true_results=1))
+
+        with EvaluationPool(csv.CSV_GRAMMAR, {"negative": self.inputs}, processes=2) as pool:
+            self.assertEqual([0b0111], pool.evaluate([always_true], "negative", max_true_results=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from grammar_graph import gg
+from isla import language
+from isla.evaluator import evaluate
+from isla.isla_predicates import STANDARD_SEMANTIC_PREDICATES, STANDARD_STRUCTURAL_PREDICATES
+from isla.language import parse_isla
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.formula_compiler import compile_formula, evaluate_formula, evaluate_formulas
+from islearn.tree_index import TreeIndex
+
+
+class TestFormulaCompiler(unittest.TestCase):
+    def setUp(self):
+        raw_inputs = ["a;b\nc;d\n", "a;b;c\n", "1;2\n3;4\n5;6\n", "x\n", "1;\"2\"\n10;11\n"]
+        self.inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in raw_inputs]
+        self.graph = gg.GrammarGraph.from_grammar(csv.CSV_GRAMMAR)
+
+    def test_plans_agree_with_isla_evaluator(self):
+        formulas = [
+            'forall <csv-record> r in start: exists <raw-field> f in r: (= f "a")',
+            'exists <raw-field> f in start: (= f "x")',
+            'forall <raw-field> f in start: (> (str.len f) 0)',
+            'forall <raw-field> f in start: (>= (str.to.int f) 1)',
+            'forall <csv-record> r in start: not (exists <raw-field> f in r: (= f "c") or (= r "x\n"))',
+            'forall <csv-record> r in start: count(r, "<raw-field>", "2")',
+            'forall <csv-record> r1 in start: forall <csv-record> r2 in start: '
+            '(before(r1, r2) implies (<= (str.len r1) (str.len r2)))',
+            'forall <csv-string-list> l="{<raw-field> f1};{<csv-string-list> rest}" in start: '
+            'exists <raw-field> f2 in rest: (= f1 f2)',
+            'forall <csv-record> r in start: exists <raw-field> f in r: nth("2", f, r)',
+        ]
+
+        for formula in [
+                parse_isla(formula, csv.CSV_GRAMMAR, STANDARD_STRUCTURAL_PREDICATES, STANDARD_SEMANTIC_PREDICATES)
+                for formula in formulas]:
+            self.assertIsNotNone(compile_formula(formula))
+            for inp in self.inputs:
+                self.assertEqual(
+                    evaluate(formula, inp, csv.CSV_GRAMMAR, graph=self.graph),
+                    evaluate_formula(formula, inp, self.graph, TreeIndex(inp)),
+                    f"Different results for {formula} on input {inp}")
+
+    def test_formulas_share_quantifier_matches(self):
+        formulas = [
+            parse_isla(
+                f'forall <csv-string-list> l="{{<raw-field> {x}}};{{<csv-string-list> rest}}" in start: '
+                f'exists <raw-field> {y} in rest: {constraint}', csv.CSV_GRAMMAR)
+            for x, y, constraint in [
+                ("f1", "f2", '(= f1 f2)'),
+                ("g1", "g2", '(not (= g1 g2))'),
+                ("f1", "f2", '(<= (str.len f1) (str.len f2))')]]
+
+        inp = self.inputs[2]
+        tree_index = TreeIndex(inp)
+        matches = {}
+        for formula in formulas:
+            compile_formula(formula).evaluate(tree_index, self.graph, matches)
+
+        # One entry per <csv-string-list> node quantified in, computed for the first formula only.
+        self.assertEqual(1, len({key[2] for key in matches}))
+        self.assertEqual(
+            [evaluate(formula, inp, csv.CSV_GRAMMAR, graph=self.graph) for formula in formulas],
+            evaluate_formulas(formulas, inp, self.graph, tree_index))
+
+    def test_fallback_for_numeric_quantifiers(self):
+        formula = parse_isla(
+            'exists int num: forall <csv-record> r in start: '
+            '((>= (str.to.int num) 1) and count(r, "<raw-field>", num))',
+            csv.CSV_GRAMMAR, semantic_predicates=STANDARD_SEMANTIC_PREDICATES)
+        self.assertIsNone(compile_formula(formula))
+        self.assertEqual(
+            [evaluate(formula, inp, csv.CSV_GRAMMAR, graph=self.graph) for inp in self.inputs],
+            [evaluate_formula(formula, inp, self.graph) for inp in self.inputs])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from isla import language
+from isla.helpers import is_nonterminal
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.fragment_index import FragmentIndex
+from islearn.mutation import MutationFuzzer
+from islearn.tree_index import TreeIndex
+
+
+class TestFragmentIndex(unittest.TestCase):
+    def setUp(self):
+        self.tree = language.DerivationTree.from_parse_tree(
+            next(EarleyParser(csv.CSV_GRAMMAR).parse("a;1.5\nc;d;\"e\"\n")))
+
+    def test_node_strings(self):
+        tree_index = TreeIndex(self.tree)
+        fragment_index = FragmentIndex(tree_index)
+        self.assertEqual(str(self.tree), fragment_index.text)
+        self.assertEqual([str(subtree) for subtree in tree_index.subtrees],
+                         [fragment_index.string(pos) for pos in range(len(tree_index))])
+
+        open_tree = language.DerivationTree("<csv-record>", [
+            language.DerivationTree("<csv-string-list>", None),
+            language.DerivationTree("\n", [])])
+        self.assertEqual(str(open_tree), FragmentIndex(TreeIndex(open_tree)).text)
+
+    def test_fragments(self):
+        tree_index = TreeIndex(self.tree)
+        fragments = FragmentIndex.of(tree_index).fragments
+        self.assertIs(FragmentIndex.of(tree_index), FragmentIndex.of(tree_index))
+
+        self.assertEqual({"a", "1.5", "c", "d", "\"e\"", "1", "2", "3"}, fragments["<raw-field>"])
+        # Nested string lists are not included
+        self.assertEqual({"a;1.5", "c;d;\"e\"", "5", "7"}, fragments["<csv-string-list>"])
+
+        for nonterminal in fragments:
+            expected = set()
+            for pos in tree_index.outermost(nonterminal):
+                expected.update({str(tree_index.subtrees[pos]), str(len(str(tree_index.subtrees[pos])))})
+            self.assertTrue(expected.issubset(fragments[nonterminal]))
+
+    def test_mutation_fuzzer_fragments(self):
+        fuzzer = MutationFuzzer(csv.CSV_GRAMMAR, [self.tree])
+        expected = {}
+        for _, subtree in self.tree.paths():
+            expected.setdefault(subtree.value, set()).add(subtree)
+        self.assertEqual(expected, fuzzer.fragments)
+        self.assertTrue(all(is_nonterminal(label) for label in FragmentIndex(TreeIndex(self.tree)).fragments))
+
+
+if __name__ == '__main__':
+    unittest.main()
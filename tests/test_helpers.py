@@ -1,9 +1,14 @@
+import pickle
 import unittest
 from time import sleep, time
 
 import pytest
+from grammar_graph import gg
+from isla.language import DerivationTree
+from isla.parser import EarleyParser
+from isla_formalizations import csv
 
-from islearn.helpers import parallel_all, parallel_any
+from islearn.helpers import parallel_all, parallel_any, make_trees_picklable
 
 
 class TestHelpers(unittest.TestCase):
@@ -67,6 +72,17 @@ class TestHelpers(unittest.TestCase):
 
         self.assertGreater(any_time, 8 * parallel_any_time)
 
+    def test_pickled_trees_keep_k_paths(self):
+        make_trees_picklable()
+        graph = gg.GrammarGraph.from_grammar(csv.CSV_GRAMMAR)
+        tree = DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse("a;b\n")))
+        k_paths = tree.k_paths(graph, 3)
+
+        copy = pickle.loads(pickle.dumps(tree))
+        self.assertEqual(tree, copy)
+        self.assertEqual(k_paths, tree.k_paths(graph, 3))
+        self.assertEqual(k_paths, copy.k_paths(graph, 3))
+
 
 if __name__ == '__main__':
     unittest.main()
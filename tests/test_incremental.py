@@ -0,0 +1,89 @@
+import unittest
+
+from isla import language
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.incremental import IncrementalLearningSession
+from islearn.learner import InvariantLearner, TruthTable, TruthTableRow
+
+
+def parse_csv(inp: str) -> language.DerivationTree:
+    return language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+
+
+class TestIncrementalLearningSession(unittest.TestCase):
+    def setUp(self):
+        self.learner = InvariantLearner(
+            csv.CSV_GRAMMAR,
+            None,
+            activated_patterns={"String Existence"},
+            positive_examples=[parse_csv(inp) for inp in ["a;b\nc;d\n", "a;x\n", "b;a\n"]],
+            negative_examples=[parse_csv("x;y\n")],
+            min_recall=.6,
+            min_specificity=.6,
+        )
+
+    def assert_truth_table_is_complete(self, truth_table: TruthTable, inputs):
+        expected = TruthTable([TruthTableRow(row.formula, inputs) for row in truth_table]).evaluate(self.learner.graph)
+        self.assertEqual(
+            {row.formula: row.bits for row in expected},
+            {row.formula: row.bits for row in truth_table})
+
+    def test_new_columns_are_evaluated(self):
+        session = IncrementalLearningSession(self.learner)
+        invariants = session.learn()
+        self.assertTrue(invariants)
+        num_candidates = len(session.candidates)
+
+        # Does not extend the input reachability relation
+        self.assertIs(invariants, session.add_positive(parse_csv("a;a\n"), parse_csv("a;b\nc;d\n")))
+        self.assertEqual(4, len(self.learner.positive_examples))
+        self.assertEqual(1, session.num_candidate_generations)
+        self.assertEqual(num_candidates, len(session.candidates))
+        self.assert_truth_table_is_complete(session.recall_truth_table, self.learner.positive_examples)
+
+        session.add_negative(parse_csv("y\n"), parse_csv("b;z\n"))
+        self.assertEqual(3, len(self.learner.negative_examples))
+        self.assert_truth_table_is_complete(session.precision_truth_table, self.learner.negative_examples)
+
+        self.assertEqual(
+            self.learner._combine_and_score(
+                TruthTable([TruthTableRow.from_bits(row.formula, row.inputs, row.bits)
+                            for row in session.recall_truth_table]),
+                TruthTable([TruthTableRow.from_bits(row.formula, row.inputs, row.bits)
+                            for row in session.precision_truth_table])),
+            invariants)
+
+    def test_candidates_are_generated_for_new_nonterminal_relations(self):
+        session = IncrementalLearningSession(self.learner)
+        session.learn()
+        num_candidates = len(session.candidates)
+
+        # Quoted fields have not been seen so far
+        session.add_positive(parse_csv('"a";b\n'))
+        self.assertEqual(2, session.num_candidate_generations)
+        self.assertGreater(len(session.candidates), num_candidates)
+        self.assertEqual(len(session.candidates), len(session.recall_truth_table))
+        self.assertEqual(len(session.candidates), len(session.precision_truth_table))
+        self.assert_truth_table_is_complete(session.recall_truth_table, self.learner.positive_examples)
+        self.assert_truth_table_is_complete(session.precision_truth_table, self.learner.negative_examples)
+
+    def test_one_evaluation_pool_per_session(self):
+        self.learner.num_evaluation_processes = 2
+        with IncrementalLearningSession(self.learner) as session:
+            session.learn()
+            evaluation_pool = session.evaluation_pool
+            self.assertIsNotNone(evaluation_pool)
+
+            session.add_positive(parse_csv("a;a\n"), parse_csv('"a";b\n'))
+            session.add_negative(parse_csv("y\n"))
+            self.assertIs(evaluation_pool, session.evaluation_pool)
+            self.assert_truth_table_is_complete(session.recall_truth_table, self.learner.positive_examples)
+            self.assert_truth_table_is_complete(session.precision_truth_table, self.learner.negative_examples)
+
+        self.assertIsNone(session.evaluation_pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import copy
 import json
 import math
@@ -23,11 +24,15 @@ from isla_formalizations import scriptsizec, csv, xml_lang, rest
 from isla_formalizations.csv import CSV_HEADERBODY_GRAMMAR
 from pythonping import icmp
 
+from islearn.generation_budget import GenerationBudget
 from islearn.islearn_predicates import hex_to_bytes, bytes_to_hex
 from islearn.language import parse_abstract_isla, NonterminalPlaceholderVariable, ISLEARN_STANDARD_SEMANTIC_PREDICATES, \
     AbstractISLaUnparser, unparse_abstract_isla
-from islearn.learner import patterns_from_file, InvariantLearner, \
-    create_input_reachability_relation, InVisitor, approximately_evaluate_abst_for, PatternRepository
+from islearn.learner import patterns_from_file, InvariantLearner, ApproximateEvaluationMemo, \
+    create_input_reachability_relation, InVisitor, approximately_evaluate_abst_for, PatternRepository, \
+    TruthTable, TruthTableRow
+from islearn.oracle import PropertyOracle
+from islearn.tree_index import TreeIndex
 from islearn_example_languages import toml_grammar, JSON_GRAMMAR, ICMP_GRAMMAR, IPv4_GRAMMAR, DOT_GRAMMAR, render_dot, \
     RACKET_BSL_GRAMMAR, load_racket
 
@@ -286,6 +291,150 @@ exists int num:
 
         self.assertIn(correct_property.strip(), list(map(lambda f: ISLaUnparser(f).unparse(), candidates)))
 
+    def test_disjunction_with_negation_and_specificity_bound(self):
+        def parse(inp: str) -> language.DerivationTree:
+            return language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+
+        has_a = parse_isla('exists <raw-field> f in start: (= f "a")', csv.CSV_GRAMMAR)
+        has_b = parse_isla('exists <raw-field> f in start: (= f "b")', csv.CSV_GRAMMAR)
+
+        # Only `has_a or not has_b` meets the recall and specificity requirements; `has_b` holds
+        # for all negative examples, which exceeds the bound of one true result.
+        learner = InvariantLearner(
+            csv.CSV_GRAMMAR,
+            positive_examples=[parse(inp) for inp in ["a\n", "c\n", "a;b\n"]],
+            negative_examples=[parse(inp) for inp in ["b\n", "b;c\n", "b;d\n", "b;e\n"]],
+            max_disjunction_size=2,
+            max_conjunction_size=1,
+            include_negations_in_disjunctions=True,
+            min_recall=.9,
+            min_specificity=.6)
+
+        recall_truth_table, precision_truth_table = learner._evaluate_candidates([has_a, has_b])
+        result = learner._combine_and_score(
+            recall_truth_table, precision_truth_table, ensure_unique_var_names=False)
+
+        self.assertEqual(
+            {ISLaUnparser(has_a | -has_b).unparse(): (1.0, 1.0)},
+            {ISLaUnparser(formula).unparse(): scores for formula, scores in result.items()})
+
+    def test_evaluation_pool_per_learning_run(self):
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ["a;b\n", "a\n"]]
+        learner = InvariantLearner(
+            csv.CSV_GRAMMAR,
+            positive_examples=inputs,
+            patterns=['exists <?NONTERMINAL> elem in start: (= elem <?STRING>)'],
+            num_evaluation_processes=2)
+
+        pools = []
+        generate_candidates = learner.generate_candidates
+
+        def generate_candidates_in_run(*args):
+            pools.append(learner.evaluation_pool)
+            if len(pools) == 1:
+                raise RuntimeError("failed")
+            return generate_candidates(*args)
+
+        learner.generate_candidates = generate_candidates_in_run
+        with self.assertRaises(RuntimeError):
+            learner.learn_invariants()
+        self.assertIsNone(learner.evaluation_pool)
+
+        self.assertTrue(learner.learn_invariants())
+        self.assertIsNotNone(pools[1])
+        self.assertIsNone(learner.evaluation_pool)
+
+    def test_generate_candidates_in_parallel(self):
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ["a;b\nc;d\n", "1;\"2\"\n", "x\n"]]
+
+        def candidates(num_generation_processes: int) -> Set[language.Formula]:
+            learner = InvariantLearner(
+                csv.CSV_GRAMMAR,
+                activated_patterns={"Equal Count", "String Existence", "Value Type is Integer (CSV)"},
+                num_generation_processes=num_generation_processes)
+            return learner.generate_candidates(learner.patterns, inputs)
+
+        sequential_candidates = candidates(1)
+        self.assertTrue(sequential_candidates)
+        self.assertEqual(sequential_candidates, candidates(2))
+
+    def test_memoized_approximate_evaluation(self):
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ["a;b\nc;d\n", "1;\"2\"\n", "x\n"]]
+
+        learner = InvariantLearner(csv.CSV_GRAMMAR)
+        pattern = next(iter(patterns_from_file()["String Existence"]))
+        partial_instantiations = learner._instantiate_nonterminal_placeholders(
+            pattern, create_input_reachability_relation(inputs))
+        tree_indices = [TreeIndex(inp) for inp in inputs]
+
+        memo = ApproximateEvaluationMemo()
+        expected = learner._filter_partial_instantiations(partial_instantiations, tree_indices)
+        self.assertEqual(expected, learner._filter_partial_instantiations(partial_instantiations, tree_indices, memo))
+        self.assertEqual(0, memo.truth_value_hits)
+        self.assertGreater(memo.match_hit_rate(), 0)
+
+        # Instantiations are evaluated again in later steps; this time, all results are memoized
+        truth_value_misses = memo.truth_value_misses
+        self.assertEqual(expected, learner._filter_partial_instantiations(partial_instantiations, tree_indices, memo))
+        self.assertEqual(truth_value_misses, memo.truth_value_misses)
+        self.assertGreater(memo.truth_value_hit_rate(), 0)
+
+    def test_pruned_nonterminal_placeholder_instantiation(self):
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ["a;b\nc;d\n", "1;\"2\"\n", "x\n", "1.5;2\n3;4\n"]]
+        input_reachability_relation = create_input_reachability_relation(inputs)
+        tree_indices = [TreeIndex(inp) for inp in inputs]
+
+        learner = InvariantLearner(csv.CSV_GRAMMAR)
+        filters = learner._instantiation_filters(input_reachability_relation)
+        pattern = next(iter(patterns_from_file()["Existence Strings Relative Order"]))
+
+        unpruned_instantiations = learner._instantiate_nonterminal_placeholders(pattern, input_reachability_relation)
+        self.assertEqual(0, learner.num_pruned_instantiation_branches)
+        instantiations = learner._instantiate_nonterminal_placeholders(
+            pattern, input_reachability_relation, tree_indices=tree_indices)
+        self.assertGreater(learner.num_pruned_instantiation_branches, 0)
+        self.assertLess(len(instantiations), len(unpruned_instantiations))
+
+        self.assertEqual(
+            learner._complete_partial_instantiations(pattern, unpruned_instantiations, filters, tree_indices),
+            learner._complete_partial_instantiations(pattern, instantiations, filters, tree_indices))
+
+    def test_iterate_candidates_with_budget(self):
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ["a;b\nc;d\n", "1;\"2\"\n", "x\n"]]
+
+        repo = patterns_from_file()
+        patterns = [next(iter(repo["String Existence"])), next(iter(repo["Value Type is Integer (CSV)"]))]
+        learner = InvariantLearner(csv.CSV_GRAMMAR)
+
+        candidates = learner.generate_candidates(patterns, inputs)
+        self.assertEqual(candidates, set(learner.iterate_candidates(patterns, inputs)))
+
+        budget = GenerationBudget(max_candidates_per_pattern=2)
+        budgeted_candidates = list(learner.iterate_candidates(patterns, inputs, budget))
+        self.assertEqual(4, len(budgeted_candidates))
+        self.assertTrue(set(budgeted_candidates).issubset(candidates))
+        self.assertEqual([0, 1], budget.truncated_patterns)
+
+        budget = GenerationBudget(max_candidates=3)
+        with self.assertLogs("learner", level="WARNING"):
+            learner = InvariantLearner(csv.CSV_GRAMMAR, generation_budget=budget, num_generation_processes=2)
+        self.assertEqual(3, len(learner.generate_candidates(patterns, inputs)))
+        self.assertEqual(1, budget.truncated_patterns[-1])
+
+        budget.max_candidates = 0
+        self.assertFalse(learner.generate_candidates(patterns, inputs))
+        self.assertEqual([0, 1], budget.truncated_patterns)
+
     def test_learn_invariants_simple_csv_colno(self):
         correct_property = """
 exists int num:
@@ -396,6 +545,47 @@ forall <json> container in start:
             correct_property.strip(),
             list(map(lambda f: ISLaUnparser(f).unparse(), [r for r, p in result.items() if p[0] > .0])))
 
+    def test_string_existence_async(self):
+        correct_property = r'''
+forall <json> container in start:
+  exists <string> elem in container:
+    (= elem "\"key\"")'''
+
+        in_flight = 0
+        max_in_flight = 0
+
+        async def prop(tree: language.DerivationTree) -> bool:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(.01)
+            in_flight -= 1
+
+            json_obj = json.loads(str(tree))
+            return isinstance(json_obj, dict) and "key" in json_obj
+
+        trees = [language.DerivationTree.from_parse_tree(PEGParser(JSON_GRAMMAR).parse(inp)[0])
+                 for inp in [' { "key" : 13 } ', ' { "asdf" : [ 26 ] , "key" : "x" } ']]
+
+        async def learn_concurrently():
+            learners = [
+                InvariantLearner(
+                    JSON_GRAMMAR,
+                    PropertyOracle(prop, max_concurrency=4),
+                    activated_patterns={"String Existence"},
+                    positive_examples=trees,
+                    max_conjunction_size=1)
+                for _ in range(2)]
+            return await asyncio.gather(*[learner.learn_invariants_async() for learner in learners])
+
+        for result in asyncio.run(learn_concurrently()):
+            self.assertIn(
+                correct_property.strip(),
+                [ISLaUnparser(f).unparse() for f, p in result.items() if p[0] > .0])
+
+        self.assertGreater(max_in_flight, 1)
+        self.assertLessEqual(max_in_flight, 8)
+
     @pytest.mark.flaky(reruns=5, reruns_delay=2)
     def test_alhazen_sqrt_example(self):
         correct_property_1_a = """
@@ -1494,6 +1684,7 @@ forall <expr> attribute="<maybe_comments><MWSS>{<name> prefix_use}" in start:
 
         instantiations = InvariantLearner(
             RACKET_BSL_GRAMMAR,
+            max_string_disjunction_width=5,
         )._instantiate_string_placeholders(
             {parse_abstract_isla(property, RACKET_BSL_GRAMMAR)},
             [tree.trie().trie])
@@ -1703,6 +1894,7 @@ forall <expr> attribute="<maybe_comments><MWSS>{<name> prefix_use}" in start:
         candidates = InvariantLearner(
             RACKET_BSL_GRAMMAR,
             prop,
+            max_string_disjunction_width=5,
             mexpr_expansion_limit=1,
             max_nonterminals_in_mexpr=9,
             positive_examples={positive_trees[0]},  # 8
@@ -1763,6 +1955,56 @@ forall <expr> attribute="<maybe_comments><MWSS>{<name> prefix_use}" in start:
         self.assertIn("Def-Use (XML-Attr)", patterns)
         self.assertNotIn("Def-Use (...)", patterns)
 
+    def test_truth_table_row_boolean_combinations(self):
+        formula_1 = parse_isla('forall <csv-record> r in start: (= r "a")', csv.CSV_GRAMMAR)
+        formula_2 = parse_isla('exists <csv-record> r in start: (= r "b")', csv.CSV_GRAMMAR)
+        inputs = [language.DerivationTree("<start>", None) for _ in range(5)]
+
+        row_1 = TruthTableRow(formula_1, inputs, [True, False, True, True, False])
+        row_2 = TruthTableRow(formula_2, inputs, [False, False, True, False, True])
+
+        self.assertEqual(0b01101, row_1.bits)
+        self.assertEqual(3, row_1.num_true)
+        self.assertAlmostEqual(.6, row_1.eval_result())
+
+        self.assertEqual([False, False, True, False, False], (row_1 & row_2).eval_results)
+        self.assertEqual([True, False, True, True, True], (row_1 | row_2).eval_results)
+        self.assertEqual([False, True, False, False, True], (-row_1).eval_results)
+        self.assertAlmostEqual(.4, (-row_1).eval_result())
+        self.assertEqual(formula_1 | formula_2, (row_1 | row_2).formula)
+        self.assertEqual(row_1.eval_results, copy.copy(row_1).eval_results)
+
+    def test_truth_table_removal(self):
+        inputs = [language.DerivationTree("<start>", None) for _ in range(4)]
+        formulas = [
+            parse_isla(f'exists <csv-record> r in start: (= r "{i}")', csv.CSV_GRAMMAR)
+            for i in range(10)]
+        rows = [TruthTableRow.from_bits(formula, inputs, i % 5) for i, formula in enumerate(formulas)]
+
+        table = TruthTable(rows + rows[:3])
+        self.assertEqual(10, len(table))
+        self.assertIs(rows[4], table[formulas[4]])
+
+        for row in table:
+            if row.bits < 3:
+                table.remove(row)
+
+        self.assertEqual([rows[idx] for idx in [3, 4, 8, 9]], list(table))
+        self.assertIs(rows[8], table[2])
+        self.assertNotIn(formulas[0], table)
+        self.assertRaises(KeyError, lambda: table[formulas[0]])
+
+        other_table = TruthTable(rows[5:])
+        other_table.filter(lambda row: row.bits != 0)
+        self.assertEqual(4, len(other_table))
+
+        mask = [row.bits != 3 for row in table]
+        table.retain(mask)
+        other_table.retain(mask)
+        self.assertEqual([rows[4], rows[9]], list(table))
+        self.assertEqual([rows[7], rows[9]], list(other_table))
+        self.assertIs(rows[9], table[formulas[9]])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -4,6 +4,7 @@ import math
 import string
 import unittest
 
+import pathos.threading
 from isla.evaluator import evaluate
 from isla.helpers import srange
 from isla.language import DerivationTree
@@ -11,6 +12,7 @@ from isla.parser import EarleyParser
 from isla_formalizations import scriptsizec
 
 from islearn.mutation import MutationFuzzer
+from islearn.oracle import PropertyOracle
 from islearn_example_languages import JSON_GRAMMAR
 
 
@@ -96,6 +98,32 @@ class TestMutator(unittest.TestCase):
             self.assertTrue(prop(inp))
             logging.getLogger(type(self).__name__).info(inp)
 
+    def test_batched_run(self):
+        def prop(tree: DerivationTree) -> bool:
+            json_obj = json.loads(str(tree))
+            return isinstance(json_obj, dict) and "key" in json_obj
+
+        trees = [DerivationTree.from_parse_tree(next(EarleyParser(JSON_GRAMMAR).parse(' { "key" : 13 } ')))]
+
+        oracle = PropertyOracle(prop)
+        mutation_fuzzer = MutationFuzzer(JSON_GRAMMAR, trees, oracle, k=4)
+        result = list(mutation_fuzzer.run(num_iterations=20, alpha=0, yield_negative=True, jobs=4))
+        self.assertEqual(20, len(result))
+        self.assertEqual(20, oracle.calls)
+        self.assertTrue(all(inp in result for inp in mutation_fuzzer.population - set(trees)))
+        self.assertTrue(all(prop(inp) for inp in mutation_fuzzer.population))
+
+        mutation_fuzzer = MutationFuzzer(JSON_GRAMMAR, trees, prop, k=4)
+        for inp in mutation_fuzzer.run(num_iterations=8, jobs=2, use_processes=True):
+            self.assertTrue(prop(inp))
+
+        # Pools are closed and removed from pathos' cache, also if the generator is stopped early
+        run = mutation_fuzzer.run(num_iterations=None, alpha=0, yield_negative=True, jobs=3)
+        next(run)
+        self.assertIn(3, vars(pathos.threading)["__STATE"])
+        run.close()
+        self.assertNotIn(3, vars(pathos.threading)["__STATE"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,207 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from isla import language
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.learner import InvariantLearner
+from islearn.mutation import MutationFuzzer
+from islearn.oracle import PropertyOracle
+from islearn.reducer import InputReducer
+
+
+def has_semicolon(tree: language.DerivationTree) -> bool:
+    return ";" in str(tree)
+
+
+class TestPropertyOracle(unittest.TestCase):
+    def setUp(self):
+        self.inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in ["a;b\n", "a;b;c\n", "a\n", "a;b\n"]]
+        self.called_with = []
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def prop(self, tree: language.DerivationTree) -> bool:
+        self.called_with.append(str(tree))
+        return ";" in str(tree)
+
+    def test_verdicts_are_memoized_by_input_string(self):
+        oracle = PropertyOracle(self.prop, max_size=2)
+        self.assertEqual([True, True, True], [oracle(inp) for inp in [self.inputs[0], self.inputs[1], self.inputs[3]]])
+        self.assertEqual(["a;b\n", "a;b;c\n"], self.called_with)
+        self.assertEqual((3, 1), (oracle.calls, oracle.hits))
+
+        # "a;b;c\n" is the least recently used verdict and evicted from the cache
+        self.assertFalse(oracle(self.inputs[2]))
+        self.assertTrue(oracle(self.inputs[1]))
+        self.assertEqual(["a;b\n", "a;b;c\n", "a\n", "a;b;c\n"], self.called_with)
+        self.assertIs(oracle, PropertyOracle.of(oracle))
+        self.assertIs(oracle, PropertyOracle.of(oracle, cache_dir=None, max_size=2))
+        with self.assertRaises(ValueError):
+            PropertyOracle.of(oracle, cache_dir=self.cache_dir.name)
+
+    def test_check_all(self):
+        batches = []
+
+        def batch_property(trees):
+            batches.append([str(tree) for tree in trees])
+            return [self.prop(tree) for tree in trees]
+
+        oracle = PropertyOracle(self.prop, batch_property=batch_property)
+        oracle(self.inputs[2])
+        self.assertEqual([True, True, False, True], oracle.check_all(self.inputs))
+        self.assertEqual([["a;b\n", "a;b;c\n"]], batches)
+        self.assertEqual(.4, oracle.hit_rate())
+
+    def test_persisted_verdicts(self):
+        with PropertyOracle(self.prop, cache_dir=self.cache_dir.name, name="semicolon") as oracle:
+            oracle.check_all(self.inputs)
+            self.assertEqual(3, len(self.called_with))
+
+        with PropertyOracle(lambda tree: False, cache_dir=self.cache_dir.name, name="semicolon") as oracle:
+            self.assertEqual([True, True, False, True], oracle.check_all(self.inputs))
+            self.assertEqual(0.0, oracle.seconds)
+
+        with PropertyOracle(lambda tree: False, cache_dir=self.cache_dir.name, name="other") as oracle:
+            self.assertEqual([False] * 4, oracle.check_all(self.inputs))
+
+        # Copies (e.g., in worker processes) open their own connection
+        oracle = PropertyOracle(has_semicolon, cache_dir=self.cache_dir.name)
+        oracle.check_all(self.inputs)
+        copy = pickle.loads(pickle.dumps(oracle))
+        self.assertEqual([True, True, False, True], copy.check_all(self.inputs))
+        self.assertEqual(4, copy.hits - oracle.hits)
+        oracle.close()
+
+    def test_lambdas_sharing_a_cache_dir_need_names(self):
+        has_a, has_c = (lambda tree: "a" in str(tree)), (lambda tree: "c" in str(tree))
+        with self.assertRaises(ValueError):
+            PropertyOracle(has_a, cache_dir=self.cache_dir.name)
+
+        with PropertyOracle(has_a, cache_dir=self.cache_dir.name, name="has_a") as oracle:
+            self.assertEqual([True] * 4, oracle.check_all(self.inputs))
+        with PropertyOracle(has_c, cache_dir=self.cache_dir.name, name="has_c") as oracle:
+            self.assertEqual([False, True, False, False], oracle.check_all(self.inputs))
+
+        # Without persistence, the qualified name of a lambda is fine
+        self.assertEqual([True] * 4, PropertyOracle(has_a).check_all(self.inputs))
+
+    def test_pending_verdicts_are_written_in_batches(self):
+        def num_stored() -> int:
+            with sqlite3.connect(os.path.join(self.cache_dir.name, PropertyOracle.FILE_NAME)) as connection:
+                return connection.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+        oracle = PropertyOracle(self.prop, max_size=1, cache_dir=self.cache_dir.name, batch_size=3)
+        self.assertEqual([True, True], [oracle(self.inputs[0]), oracle(self.inputs[1])])
+
+        # The evicted verdict is not yet written, but found without calling the property
+        self.assertTrue(oracle(self.inputs[0]))
+        self.assertEqual(["a;b\n", "a;b;c\n"], self.called_with)
+        self.assertEqual(0, num_stored())
+
+        self.assertFalse(oracle(self.inputs[2]))
+        self.assertEqual(3, num_stored())
+        oracle.close()
+
+    def test_cached_oracle_used_from_threads(self):
+        results = []
+        with PropertyOracle(has_semicolon, max_size=1, cache_dir=self.cache_dir.name, batch_size=2) as oracle:
+            oracle.check_all(self.inputs)
+
+            def check():
+                results.append([oracle(inp) for inp in self.inputs] + oracle.check_all(self.inputs))
+
+            threads = [threading.Thread(target=check) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(4 + 2 * 8, oracle.calls)
+            self.assertEqual(oracle.calls - 3, oracle.hits)
+
+        self.assertEqual([[True, True, False, True] * 2] * 2, results)
+        with PropertyOracle(lambda tree: False, cache_dir=self.cache_dir.name, name=oracle.name) as oracle:
+            self.assertEqual([True, True, False, True], oracle.check_all(self.inputs))
+
+    def test_async_property(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def prop(tree: language.DerivationTree) -> bool:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(.01)
+            in_flight -= 1
+            return self.prop(tree)
+
+        inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(f"a;{i}\n")))
+            for i in range(10)]
+
+        oracle = PropertyOracle(prop, max_concurrency=3)
+        self.assertTrue(oracle.is_async)
+        self.assertEqual([True, True, False, True], oracle.check_all(self.inputs))
+        self.assertEqual([True] * 10, oracle.check_all(inputs))
+        self.assertEqual(3, max_in_flight)
+        self.assertTrue(oracle(self.inputs[0]))
+        self.assertEqual(13, len(self.called_with))
+
+        async def check_in_loop():
+            return await oracle.acheck_all(inputs + self.inputs), await oracle.acheck(inputs[0])
+
+        self.assertEqual(([True] * 10 + [True, True, False, True], True), asyncio.run(check_in_loop()))
+        self.assertEqual(13, len(self.called_with))
+
+    def test_running_in_event_loop(self):
+        async def prop(tree: language.DerivationTree) -> bool:
+            return self.prop(tree)
+
+        oracle = PropertyOracle(prop)
+        loop, other_loop = asyncio.new_event_loop(), asyncio.new_event_loop()
+        with oracle.running_in(loop):
+            with oracle.running_in(loop):
+                self.assertIs(loop, oracle.loop)
+            self.assertIs(loop, oracle.loop)
+
+            with self.assertRaises(RuntimeError):
+                with oracle.running_in(other_loop):
+                    pass
+            self.assertIs(loop, oracle.loop)
+
+        self.assertIsNone(oracle.loop)
+        self.assertEqual([True, True, False, True], oracle.check_all(self.inputs))
+        loop.close()
+        other_loop.close()
+
+    def test_shared_by_fuzzer_and_reducer(self):
+        oracle = PropertyOracle(self.prop)
+        fuzzer = MutationFuzzer(csv.CSV_GRAMMAR, self.inputs[:2], oracle)
+        reducer = InputReducer(csv.CSV_GRAMMAR, oracle)
+        self.assertIs(oracle, fuzzer.property)
+        self.assertIs(oracle, reducer.property)
+
+        # The learner does not silently drop its oracle settings for a shared oracle
+        self.assertIs(oracle, InvariantLearner(csv.CSV_GRAMMAR, oracle).prop)
+        with self.assertRaises(ValueError):
+            InvariantLearner(csv.CSV_GRAMMAR, oracle, oracle_cache_dir=self.cache_dir.name)
+
+        for _ in range(2):
+            reducer.reduce_by_smallest_subtree_replacement(self.inputs[1])
+        self.assertEqual(len(self.called_with), oracle.calls - oracle.hits)
+        self.assertEqual(len(set(self.called_with)), len(self.called_with))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import pytest
+from isla.language import DerivationTree
+from isla.parser import EarleyParser, PEGParser
+
+from islearn.oracle_server import ValidatorPool, ValidatorError
+from islearn_example_languages import JSON_GRAMMAR, RACKET_BSL_GRAMMAR, load_racket
+from islearn_example_languages.languages import RACKET_VALIDATOR_COMMAND
+
+STUB_VALIDATOR = """
+import json, os, sys, time
+from islearn.oracle_server import serve
+
+if os.path.exists(sys.argv[1]):
+    sys.exit(1)
+
+def check(inp):
+    if "crash" in inp:
+        os._exit(1)
+    if "hang" in inp:
+        time.sleep(60)
+    if "slow" in inp:
+        time.sleep(1)
+    json_obj = json.loads(inp)
+    return isinstance(json_obj, dict) and "key" in json_obj or f"missing key in {inp.strip()}"
+
+serve(check)
+"""
+
+# A plain command accepting JSON objects with a key "key" on its standard input
+PLAIN_VALIDATOR = """
+import json, sys, time
+inp = sys.stdin.read()
+if "hang" in inp:
+    time.sleep(60)
+json_obj = json.loads(inp)
+sys.exit(0 if isinstance(json_obj, dict) and "key" in json_obj else 1)
+"""
+
+
+class TestValidatorPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        stub_file = os.path.join(self.tmp_dir.name, "stub_validator.py")
+        with open(stub_file, "w") as f:
+            f.write(STUB_VALIDATOR)
+        # Validators do not start while the file `broken` exists
+        self.broken_file = os.path.join(self.tmp_dir.name, "broken")
+        self.command = [sys.executable, stub_file, self.broken_file]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_validate(self):
+        tree = DerivationTree.from_parse_tree(next(EarleyParser(JSON_GRAMMAR).parse(' { "key" : 13 } ')))
+        with ValidatorPool(self.command) as pool:
+            self.assertIs(True, pool.validate(tree))
+            self.assertTrue(pool(tree))
+            self.assertEqual('missing key in { "other" : 13 }', pool.validate(' { "other" : 13 } '))
+            self.assertFalse(pool(' { "other" : 13 } '))
+            self.assertIn("Expecting value", pool.validate('{ "key" : '))
+            self.assertEqual(0, pool.num_restarts)
+
+            # Health checks of idle validators
+            pool.health_check_interval = 0
+            self.assertTrue(pool('{"key": "\\u00e4\\n"}'))
+            self.assertEqual(0, pool.num_restarts)
+
+    def test_restarts(self):
+        with ValidatorPool(self.command, timeout=.5) as pool:
+            self.assertTrue(pool('{"key": 1}'))
+
+            self.assertIn("terminated", pool.validate('"crash"'))
+            self.assertEqual(2, pool.num_restarts)
+            self.assertTrue(pool('{"key": 1}'))
+
+            self.assertIn("Timeout", pool.validate('"hang"'))
+            self.assertEqual(3, pool.num_restarts)
+            self.assertTrue(pool('{"key": 1}'))
+
+            copy = pickle.loads(pickle.dumps(pool))
+            self.assertTrue(copy('{"key": 1}'))
+            copy.close()
+
+    def test_failed_restart(self):
+        with ValidatorPool(self.command, startup_timeout=5) as pool:
+            self.assertTrue(pool('{"key": 1}'))
+
+            open(self.broken_file, "w").close()
+            with self.assertRaises(ValidatorError):
+                pool.validate('"crash"')
+            self.assertEqual(1, pool.num_restarts)
+
+            # The killed validator is not reused; a new one is started
+            os.remove(self.broken_file)
+            self.assertTrue(pool('{"key": 1}'))
+            self.assertEqual(1, pool.num_restarts)
+
+    def test_close_waits_for_calls_in_flight(self):
+        results = []
+        pool = ValidatorPool(self.command)
+        self.assertTrue(pool('{"key": 1}'))
+
+        slow_call = threading.Thread(target=lambda: results.append(pool.validate('{"slow": 1}')))
+        slow_call.start()
+        time.sleep(.2)
+        close = threading.Thread(target=pool.close)
+        close.start()
+        time.sleep(.2)
+
+        with self.assertRaises(ValidatorError):
+            pool.validate('{"key": 1}')
+
+        close.join()
+        slow_call.join()
+        self.assertEqual(['missing key in {"slow": 1}'], results)
+
+        self.assertTrue(pool('{"key": 1}'))
+        pool.close()
+
+    def test_plain_commands(self):
+        with ValidatorPool([sys.executable, "-c", PLAIN_VALIDATOR], size=2, timeout=2, framed=False) as pool:
+            self.assertIs(True, pool.validate('{"key": 1}'))
+            self.assertEqual("Exit code 1", pool.validate('{"other": 1}'))
+            self.assertIn("JSONDecodeError", pool.validate('{"key": '))
+            self.assertIn("Timeout", pool.validate('"hang"'))
+
+            copy = pickle.loads(pickle.dumps(pool))
+            self.assertTrue(copy('{"key": 1}'))
+
+    @pytest.mark.skipif(shutil.which("racket") is None, reason="racket is not installed")
+    def test_racket_validator(self):
+        def parse(program: str) -> DerivationTree:
+            return DerivationTree.from_parse_tree(list(PEGParser(RACKET_BSL_GRAMMAR).parse(program))[0])
+
+        valid = parse("(define (f x) (+ x 1))")
+        invalid = parse("(define (f x) (g x 1))\n(f 1)")
+        with ValidatorPool(RACKET_VALIDATOR_COMMAND, timeout=60) as pool:
+            for tree in [valid, invalid]:
+                self.assertEqual(load_racket(tree) is True, load_racket(tree, pool) is True)
+            self.assertIs(True, load_racket(valid, pool))
+            self.assertIsInstance(load_racket(invalid, pool), str)
+
+    def test_concurrent_calls(self):
+        results = {}
+
+        def validate(i: int):
+            results[i] = pool(f'{{"key": {i}}}' if i % 2 else f'{{"other": {i}}}')
+
+        with ValidatorPool(self.command, size=3) as pool:
+            threads = [threading.Thread(target=validate, args=(i,)) for i in range(12)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual({i: bool(i % 2) for i in range(12)}, results)
+
+
+if __name__ == '__main__':
+    unittest.main()
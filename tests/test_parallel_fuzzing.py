@@ -0,0 +1,47 @@
+import json
+import unittest
+
+from isla.language import DerivationTree
+from isla.parser import EarleyParser
+
+from islearn.oracle import PropertyOracle
+from islearn.parallel_fuzzing import ParallelMutationFuzzer
+from islearn_example_languages import JSON_GRAMMAR
+
+
+def has_key(tree: DerivationTree) -> bool:
+    json_obj = json.loads(str(tree))
+    return isinstance(json_obj, dict) and "key" in json_obj
+
+
+class TestParallelMutationFuzzer(unittest.TestCase):
+    def setUp(self):
+        self.trees = [DerivationTree.from_parse_tree(next(EarleyParser(JSON_GRAMMAR).parse(inp)))
+                      for inp in [' { "key" : 13 } ', ' { "key" : [ 1 , 2 ] } ']]
+
+    def test_run(self):
+        oracle = PropertyOracle(has_key)
+        fuzzer = ParallelMutationFuzzer(JSON_GRAMMAR, self.trees, oracle, k=4, num_workers=2)
+        result = list(fuzzer.run(num_iterations=24, alpha=0, yield_negative=True, sync_interval=4))
+
+        # Inputs are deduplicated by their strings
+        self.assertGreater(len(result), 0)
+        self.assertLessEqual(len(result), 24)
+        self.assertEqual(len(result), len({str(inp) for inp in result}))
+        self.assertFalse({str(inp) for inp in result}.intersection(map(str, self.trees)))
+
+        # Verdicts of the workers are recorded in the coordinator's oracle
+        calls = oracle.calls
+        self.assertEqual([has_key(inp) for inp in result], oracle.check_all(result))
+        self.assertEqual(len(result), oracle.hits)
+        self.assertEqual(calls + len(result), oracle.calls)
+
+        new_members = fuzzer.fuzzer.population - set(self.trees)
+        self.assertTrue(all(inp in result and has_key(inp) for inp in new_members))
+
+        for inp in fuzzer.run(num_iterations=8, sync_interval=2):
+            self.assertTrue(has_key(inp))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from grammar_graph import gg
+from isla import language
+from isla.language import parse_isla
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.evaluation_pool import evaluate_formula_on_inputs
+from islearn.learner import TruthTable, TruthTableRow
+from islearn.recall_filtering import SequentialSamplingFilter, FalsifierFirstOrdering, quantifier_skeleton
+
+
+class TestRecallFiltering(unittest.TestCase):
+    def setUp(self):
+        raw_inputs = [f"a;{i}\n" for i in range(10)] + ["x\n", "y;z;w\n"]
+        self.inputs = [
+            language.DerivationTree.from_parse_tree(next(EarleyParser(csv.CSV_GRAMMAR).parse(inp)))
+            for inp in raw_inputs]
+        self.graph = gg.GrammarGraph.from_grammar(csv.CSV_GRAMMAR)
+        self.formulas = [
+            parse_isla(formula, csv.CSV_GRAMMAR)
+            for formula in [
+                'forall <csv-record> r in start: exists <raw-field> f in r: (= f "a")',
+                'exists <raw-field> f in start: (= f "x")',
+                'forall <raw-field> f in start: (> (str.len f) 0)',
+            ]]
+
+    def test_survivors_are_evaluated_exactly(self):
+        recall_filter = SequentialSamplingFilter(self.graph, self.inputs, min_recall=.8)
+        results = recall_filter.evaluate(self.formulas)
+
+        exact_results = [evaluate_formula_on_inputs(formula, self.inputs, self.graph) for formula in self.formulas]
+
+        # The first formula holds for 10 of 12 inputs, the last one for all inputs.
+        self.assertEqual(exact_results[0], results[0])
+        self.assertEqual(exact_results[2], results[2])
+        self.assertEqual(1, recall_filter.num_eliminated)
+        self.assertLess(results[1].bit_count() / len(self.inputs), .8)
+        self.assertLess(recall_filter.num_evaluations, len(self.formulas) * len(self.inputs))
+
+    def test_statistical_bound_eliminates_early(self):
+        exact_filter = SequentialSamplingFilter(self.graph, self.inputs, min_recall=.9, initial_batch_size=2)
+        statistical_filter = SequentialSamplingFilter(
+            self.graph, self.inputs, min_recall=.9, confidence=.5, initial_batch_size=2)
+
+        formula = self.formulas[1]
+        exact_filter.evaluate([formula])
+        statistical_filter.evaluate([formula])
+
+        self.assertEqual(1, statistical_filter.num_eliminated)
+        self.assertLessEqual(statistical_filter.num_evaluations, exact_filter.num_evaluations)
+        self.assertFalse(statistical_filter.eliminated(0, 2))
+
+    def test_falsifiers_are_evaluated_first(self):
+        # Both formulas have the same quantifiers and fail for the last two inputs only
+        formulas = [
+            self.formulas[0],
+            parse_isla(
+                'forall <csv-record> r in start: exists <raw-field> f in r: (= "a" f)',
+                csv.CSV_GRAMMAR)]
+        self.assertEqual(quantifier_skeleton(formulas[0]), quantifier_skeleton(formulas[1]))
+
+        ordering = FalsifierFirstOrdering(len(self.inputs))
+        table = TruthTable([TruthTableRow(formula, self.inputs) for formula in formulas]).evaluate(
+            self.graph, lazy=True, result_threshold=.9, input_ordering=ordering)
+
+        self.assertTrue(all(row.eval_result() < .9 for row in table))
+        self.assertEqual(2, ordering.num_rejected)
+        # 12 evaluations for the first formula, 2 for the second one
+        self.assertEqual(7, ordering.average_evaluations_per_rejection())
+        self.assertEqual([10, 11], ordering.order(formulas[0])[:2])
+        self.assertEqual([10, 11], ordering.order(self.formulas[1])[:2])
+
+
+    def test_cached_orders(self):
+        num_inputs = 50
+        ordering = FalsifierFirstOrdering(num_inputs)
+        order = ordering.order(self.formulas[0])
+        self.assertEqual(list(range(num_inputs)), order)
+        self.assertIs(order, ordering.order(self.formulas[0]))
+
+        for falsifiers in [0b1100, 1 << 40 | 1 << 7, 0b1000]:
+            for formula in self.formulas[:2]:
+                ordering.record(formula, 0, falsifiers, 1)
+
+                for other_formula in self.formulas:
+                    scores = ordering.scores.get(quantifier_skeleton(other_formula), [0.0] * num_inputs)
+                    self.assertEqual(
+                        sorted(range(num_inputs), key=lambda idx: (-scores[idx], -ordering.global_scores[idx])),
+                        ordering.order(other_formula))
+
+if __name__ == '__main__':
+    unittest.main()
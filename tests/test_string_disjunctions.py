@@ -0,0 +1,68 @@
+import itertools
+import unittest
+
+from isla import language
+from isla_formalizations import csv
+
+from islearn.language import parse_abstract_isla, DisjunctiveStringsPlaceholderVariable
+from islearn.learner import get_placeholders
+from islearn.string_disjunctions import DisjunctionEnumerator, placeholder_polarity
+
+
+class TestStringDisjunctions(unittest.TestCase):
+    def setUp(self):
+        self.strings = ["sqrt", "*", "+", "xmlns", "define"]
+        self.all_disjunctions = [
+            disjunction
+            for width in range(1, len(self.strings) + 1)
+            for disjunction in itertools.combinations(sorted(self.strings, key=lambda s: (len(s), s)), width)]
+
+    def test_monotone_check(self):
+        # All uses have to be covered by the disjunction
+        def check(disjunction):
+            return {"sqrt", "*", "+"}.issubset(disjunction)
+
+        enumerator = DisjunctionEnumerator(self.strings, polarity=True)
+        result = list(enumerator.disjunctions(check))
+        self.assertEqual([d for d in self.all_disjunctions if check(d)], result)
+        self.assertEqual(("*", "+", "sqrt"), result[0])
+        self.assertEqual(3, enumerator.num_inferred)
+        self.assertEqual(len(self.all_disjunctions) - 3, enumerator.num_checked)
+
+    def test_antitone_check(self):
+        # No string of the disjunction must be used
+        def check(disjunction):
+            return not {"sqrt", "*"}.intersection(disjunction)
+
+        enumerator = DisjunctionEnumerator(self.strings, polarity=False)
+        result = list(enumerator.disjunctions(check))
+        self.assertEqual([d for d in self.all_disjunctions if check(d)], result)
+        self.assertEqual(len(self.all_disjunctions), enumerator.num_checked + enumerator.num_pruned)
+        self.assertEqual(len(self.strings) + 4, enumerator.num_checked)
+
+    def test_max_width(self):
+        enumerator = DisjunctionEnumerator(self.strings, max_width=2)
+        result = list(enumerator.disjunctions(lambda _: True))
+        self.assertEqual(len(self.strings) + 10, len(result))
+        self.assertTrue(all(len(disjunction) <= 2 for disjunction in result))
+
+        result = list(enumerator.disjunctions(lambda _: True, stop=lambda: enumerator.num_checked >= 17))
+        self.assertEqual(2, len(result))
+
+    def test_placeholder_polarity(self):
+        formula = parse_abstract_isla('forall <raw-field> f in start: ((= f <?DSTRINGS>) or (= f "a"))', csv.CSV_GRAMMAR)
+        placeholder = next(iter(get_placeholders(formula)))
+
+        self.assertTrue(placeholder_polarity(formula, placeholder))
+        self.assertFalse(placeholder_polarity(language.NegatedFormula(formula), placeholder))
+        self.assertIsNone(placeholder_polarity(formula & language.NegatedFormula(formula), placeholder))
+        self.assertIsNone(placeholder_polarity(
+            formula, DisjunctiveStringsPlaceholderVariable("DSTRINGS_X")))
+
+        # Negations in SMT formulas are instantiated for each string of the disjunction
+        formula = parse_abstract_isla('forall <raw-field> f in start: (not (= f <?DSTRINGS>))', csv.CSV_GRAMMAR)
+        self.assertTrue(placeholder_polarity(formula, next(iter(get_placeholders(formula)))))
+
+
+if __name__ == '__main__':
+    unittest.main()
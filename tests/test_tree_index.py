@@ -0,0 +1,70 @@
+import unittest
+
+from isla import language
+from isla.parser import EarleyParser
+from isla_formalizations import csv
+
+from islearn.tree_index import TreeIndex
+
+
+class TestTreeIndex(unittest.TestCase):
+    def setUp(self):
+        self.tree = language.DerivationTree.from_parse_tree(
+            next(EarleyParser(csv.CSV_GRAMMAR).parse("a;b\nc;d;e\n")))
+
+    def test_descendants(self):
+        index = TreeIndex(self.tree)
+        self.assertEqual([path for path, _ in self.tree.paths()], index.paths)
+
+        for pos, (path, subtree) in enumerate(self.tree.paths()):
+            self.assertEqual(pos, index.position(path))
+            self.assertEqual(pos, index.position_of(subtree))
+
+            for label in ["<csv-record>", "<raw-field>", ";"]:
+                expected = [
+                    path + sub_path for sub_path, sub_subtree in subtree.paths()
+                    if sub_subtree.value == label]
+                self.assertEqual(expected, [index.paths[p] for p in index.descendants(pos, label)])
+                self.assertEqual(len(expected), index.count(pos, label))
+
+    def test_successors_and_outermost(self):
+        index = TreeIndex(self.tree)
+        first_record, second_record = index.positions["<csv-record>"]
+        first_field = index.descendants(second_record, "<raw-field>")[0]
+
+        self.assertEqual(
+            ["d", "e"],
+            [str(index.subtrees[pos]) for pos in index.successors(first_field, second_record, "<raw-field>")])
+        self.assertEqual(
+            ["a;b\n", "c;d;e\n"],
+            [str(index.subtrees[index.parents[pos]]) for pos in index.outermost("<csv-string-list>")])
+        self.assertEqual(
+            ["<csv-header>", "<csv-records>"],
+            [index.labels[index.parents[pos]] for pos in (first_record, second_record)])
+
+        # Nested string lists are only considered once
+        string_lists = index.positions["<csv-string-list>"]
+        self.assertEqual(
+            index.positions["<raw-field>"],
+            index.descendants_of_all(string_lists, "<raw-field>"))
+        self.assertEqual(
+            index.descendants(second_record, "<raw-field>"),
+            index.descendants_of_all([second_record], "<raw-field>"))
+
+    def test_nodes_with_many_children(self):
+        tree = ("<start>", [("<x>", [(str(i), [])]) for i in range(40)])
+        index = TreeIndex(tree)
+
+        self.assertEqual(81, len(index))
+        self.assertEqual(81, index.ends[0])
+        self.assertEqual((39,), index.paths[index.positions["<x>"][-1]])
+        self.assertEqual(40, index.count(0, "<x>"))
+
+    def test_from_trie(self):
+        index = TreeIndex.of(self.tree.trie().trie)
+        self.assertIs(self.tree, index.tree)
+        self.assertIs(index, TreeIndex.of(index))
+
+
+if __name__ == '__main__':
+    unittest.main()